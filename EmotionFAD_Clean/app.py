@@ -5,266 +5,84 @@ AI-powered fraud detection using emotion analysis and sentiment detection
 
 from flask import Flask, render_template, request, jsonify, send_from_directory
 from flask_cors import CORS
-import cv2
-import numpy as np
-import base64
-from deepface import DeepFace
-import io
-from PIL import Image
 import json
 from datetime import datetime
 import os
-from textblob import TextBlob
-import re
+import secrets
 import threading
 import webbrowser
+from engine import engine
+from facial_workers import FacialWorkerPool, PoolSaturated, PoolTimeout, WorkerCrashed
+from report_fusion import Mailbox, sse_event, session_token, valid_session_token, SSE_PREAMBLE, SSE_KEEPALIVE
+from face_detectors import DETECTOR_NAMES
+from model_manager import models
+from model_stubs import model_backend
+from metrics import metrics, stage, instrument_flask, metrics_response
+import profiling
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
 
 # Configuration
-app.config['SECRET_KEY'] = 'fad-fraud-detection-2025'
+# Signs /events tokens; set SECRET_KEY so they stay valid across workers and restarts
+app.config['SECRET_KEY'] = os.getenv('SECRET_KEY') or secrets.token_hex(32)
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['MAX_BATCH_SIZE'] = int(os.environ.get('FAD_MAX_BATCH_SIZE', 10000))
 
-# Fraud detection keywords and patterns
-FRAUD_KEYWORDS = [
-    'steal', 'hack', 'fraud', 'scam', 'cheat', 'lie', 'deceive', 'manipulate',
-    'fake', 'forge', 'embezzle', 'launder', 'bribe', 'extort', 'blackmail',
-    'phishing', 'identity theft', 'credit card', 'bank account', 'password',
-    'social security', 'illegal', 'crime', 'criminal', 'money transfer',
-    'wire transfer', 'western union', 'gift card', 'bitcoin', 'cryptocurrency'
-]
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
 
-SUSPICIOUS_PATTERNS = [
-    r'\b(give|send|transfer)\s+(me|us)\s+(money|cash|bitcoin|crypto)',
-    r'\b(bank|credit\s+card|account)\s+(details|number|info)',
-    r'\b(urgent|emergency|immediately|right\s+now)\b.*\b(money|payment)',
-    r'\b(secret|don\'t\s+tell|keep\s+quiet|confidential)\b',
-    r'\b(guaranteed|100%|risk-free)\s+(profit|return|money)',
-    r'\b(act\s+now|limited\s+time|expires\s+soon)\b',
-]
+# Facial inference worker processes (0 runs DeepFace inline in the request thread)
+app.config['FACIAL_WORKERS'] = int(os.environ.get('FAD_FACIAL_WORKERS', 0))
+app.config['FACIAL_QUEUE_SIZE'] = int(os.environ.get('FAD_FACIAL_QUEUE_SIZE', 0)) or None
+app.config['FACIAL_TIMEOUT'] = float(os.environ.get('FAD_FACIAL_TIMEOUT', 30))
 
-class FraudDetectionSystem:
-    def __init__(self):
-        self.session_data = {}
-        self.fraud_threshold = 0.6
-        print("✅ Fraud Detection System initialized")
-        
-    def analyze_facial_expression(self, image_data):
-        """Analyze facial expressions and detect emotions"""
-        try:
-            # Decode base64 image
-            if ',' in image_data:
-                image_data = image_data.split(',')[1]
-            
-            img_bytes = base64.b64decode(image_data)
-            img = Image.open(io.BytesIO(img_bytes))
-            img_array = np.array(img)
-            
-            # Convert RGB to BGR for OpenCV
-            if len(img_array.shape) == 3 and img_array.shape[2] == 3:
-                img_bgr = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
-            else:
-                img_bgr = img_array
-            
-            # Analyze emotions using DeepFace
-            print("🔍 Analyzing facial expression...")
-            analysis = DeepFace.analyze(img_bgr, actions=['emotion'], enforce_detection=False, silent=True)
-            
-            if isinstance(analysis, list):
-                analysis = analysis[0]
-            
-            emotions = analysis['emotion']
-            dominant_emotion = analysis['dominant_emotion']
-            
-            # Calculate stress and deception indicators
-            stress_level = self._calculate_stress_level(emotions)
-            deception_risk = self._calculate_deception_risk(emotions)
-            mental_health_score = self._calculate_mental_health_score(emotions)
-            
-            print(f"✅ Analysis complete: {dominant_emotion} ({emotions[dominant_emotion]:.1f}%)")
-            
-            return {
-                'success': True,
-                'emotions': emotions,
-                'dominant_emotion': dominant_emotion,
-                'stress_level': stress_level,
-                'deception_risk': deception_risk,
-                'mental_health_score': mental_health_score,
-                'timestamp': datetime.now().isoformat()
-            }
-        except Exception as e:
-            print(f"❌ Facial analysis error: {str(e)}")
-            return {
-                'success': False,
-                'error': str(e),
-                'message': 'Could not detect face. Please ensure your face is clearly visible with good lighting.'
-            }
-    
-    def _calculate_stress_level(self, emotions):
-        """Calculate stress level based on emotions"""
-        stress_indicators = {
-            'angry': 0.8,
-            'fear': 0.9,
-            'sad': 0.6,
-            'disgust': 0.7,
-            'surprise': 0.3,
-            'neutral': 0.1,
-            'happy': 0.0
-        }
-        
-        stress = sum(emotions.get(emotion, 0) * weight 
-                    for emotion, weight in stress_indicators.items())
-        return min(stress / 100, 1.0)
-    
-    def _calculate_deception_risk(self, emotions):
-        """Calculate deception risk based on emotional patterns"""
-        fear = emotions.get('fear', 0)
-        happy = emotions.get('happy', 0)
-        surprise = emotions.get('surprise', 0)
-        angry = emotions.get('angry', 0)
-        
-        deception_score = (fear * 0.4 + surprise * 0.2 + angry * 0.3 - happy * 0.1) / 100
-        return max(0, min(deception_score, 1.0))
-    
-    def _calculate_mental_health_score(self, emotions):
-        """Calculate mental health score (0-100, higher is better)"""
-        positive_emotions = emotions.get('happy', 0) + emotions.get('neutral', 0) * 0.5
-        negative_emotions = (emotions.get('sad', 0) + emotions.get('angry', 0) + 
-                           emotions.get('fear', 0) + emotions.get('disgust', 0))
-        
-        score = (positive_emotions - negative_emotions * 0.5) 
-        return max(0, min(score, 100))
-    
-    def analyze_text_sentiment(self, text):
-        """Analyze text for sentiment and fraud indicators"""
-        try:
-            print(f"🔍 Analyzing text: {text[:50]}...")
-            
-            # Sentiment analysis
-            blob = TextBlob(text)
-            sentiment_polarity = blob.sentiment.polarity
-            sentiment_subjectivity = blob.sentiment.subjectivity
-            
-            # Fraud keyword detection
-            text_lower = text.lower()
-            fraud_keywords_found = [kw for kw in FRAUD_KEYWORDS if kw in text_lower]
-            
-            # Pattern matching for suspicious phrases
-            suspicious_patterns_found = []
-            for pattern in SUSPICIOUS_PATTERNS:
-                if re.search(pattern, text_lower):
-                    suspicious_patterns_found.append(pattern)
-            
-            # Calculate fraud risk score
-            fraud_risk = self._calculate_fraud_risk(
-                sentiment_polarity,
-                len(fraud_keywords_found),
-                len(suspicious_patterns_found),
-                sentiment_subjectivity
-            )
-            
-            # Determine sentiment category
-            if sentiment_polarity > 0.3:
-                sentiment_category = 'positive'
-            elif sentiment_polarity < -0.3:
-                sentiment_category = 'negative'
-            else:
-                sentiment_category = 'neutral'
-            
-            print(f"✅ Text analysis complete: {sentiment_category}, risk: {fraud_risk:.2f}")
-            
-            return {
-                'success': True,
-                'text': text,
-                'sentiment_polarity': sentiment_polarity,
-                'sentiment_subjectivity': sentiment_subjectivity,
-                'sentiment_category': sentiment_category,
-                'fraud_keywords_found': fraud_keywords_found,
-                'suspicious_patterns_count': len(suspicious_patterns_found),
-                'fraud_risk_score': fraud_risk,
-                'is_suspicious': fraud_risk > self.fraud_threshold,
-                'timestamp': datetime.now().isoformat()
-            }
-        except Exception as e:
-            print(f"❌ Text analysis error: {str(e)}")
-            return {
-                'success': False,
-                'error': str(e)
-            }
-    
-    def _calculate_fraud_risk(self, sentiment, keyword_count, pattern_count, subjectivity):
-        """Calculate overall fraud risk score"""
-        keyword_score = min(keyword_count * 0.2, 0.5)
-        pattern_score = min(pattern_count * 0.25, 0.4)
-        sentiment_score = max(0, -sentiment * 0.3)
-        subjectivity_score = subjectivity * 0.1
-        
-        total_risk = keyword_score + pattern_score + sentiment_score + subjectivity_score
-        return min(total_risk, 1.0)
-    
-    def generate_comprehensive_report(self, facial_data, text_data):
-        """Generate comprehensive fraud detection report"""
-        try:
-            overall_risk = 0
-            risk_factors = []
-            
-            # Analyze facial data
-            if facial_data and facial_data.get('success'):
-                facial_risk = (facial_data['deception_risk'] * 0.4 + 
-                             facial_data['stress_level'] * 0.3)
-                overall_risk += facial_risk * 0.5
-                
-                if facial_data['deception_risk'] > 0.6:
-                    risk_factors.append('High deception indicators in facial expression')
-                if facial_data['stress_level'] > 0.7:
-                    risk_factors.append('Elevated stress levels detected')
-                if facial_data['mental_health_score'] < 40:
-                    risk_factors.append('Poor mental health indicators')
-            
-            # Analyze text data
-            if text_data and text_data.get('success'):
-                overall_risk += text_data['fraud_risk_score'] * 0.5
-                
-                if text_data['fraud_keywords_found']:
-                    risk_factors.append(f"Fraud-related keywords detected: {', '.join(text_data['fraud_keywords_found'][:3])}")
-                if text_data['suspicious_patterns_count'] > 0:
-                    risk_factors.append('Suspicious communication patterns detected')
-                if text_data['sentiment_polarity'] < -0.5:
-                    risk_factors.append('Highly negative sentiment detected')
-            
-            # Determine risk level
-            if overall_risk > 0.7:
-                risk_level = 'HIGH'
-                recommendation = '🚨 ALERT: High fraud risk detected. Immediate investigation recommended.'
-            elif overall_risk > 0.4:
-                risk_level = 'MEDIUM'
-                recommendation = '⚠️ WARNING: Moderate fraud risk. Monitor closely and verify information.'
-            else:
-                risk_level = 'LOW'
-                recommendation = '✅ Low fraud risk. Continue normal interaction.'
-            
-            print(f"📊 Comprehensive report: {risk_level} risk ({overall_risk:.2f})")
-            
-            return {
-                'success': True,
-                'overall_risk_score': overall_risk,
-                'risk_level': risk_level,
-                'risk_factors': risk_factors,
-                'recommendation': recommendation,
-                'facial_analysis': facial_data,
-                'text_analysis': text_data,
-                'timestamp': datetime.now().isoformat()
-            }
-        except Exception as e:
-            print(f"❌ Report generation error: {str(e)}")
-            return {
-                'success': False,
-                'error': str(e)
-            }
+# Per-session report fusion, shared through the analysis engine; reports are pushed on /events/<session_id>.
+# The analyzers behind the routes are only built once a route (or require() below) needs them
+fusion = engine.fusion
+app.config['SSE_KEEPALIVE_SECONDS'] = float(os.environ.get('FAD_SSE_KEEPALIVE', 15))
+
+# Request counts and timings, pipeline stage histograms and component stats on /metrics (FAD_METRICS=1)
+instrument_flask(app)
+metrics.register_stats('deepface_frame_cache', lambda: engine.component_stats('frame_cache', 'deepface'),
+                       counters=('hits', 'near_hits', 'misses', 'evictions'), gauges=('entries', 'bytes', 'hit_rate'))
+metrics.register_stats('text_cache', lambda: engine.component_stats('text_cache', 'text'),
+                       counters=('memory_hits', 'disk_hits', 'misses', 'disk_evictions'),
+                       gauges=('memory_entries', 'disk_entries', 'hit_rate'))
+metrics.register_stats('deepface_microbatch', lambda: engine.component_stats('batcher', 'deepface'),
+                       counters=('errors',), gauges=('pending',),
+                       histograms=('batch_size', 'queue_latency_ms', 'batch_latency_ms'))
+metrics.register_stats('timeline', lambda: engine.component_stats('session_data', 'deepface'),
+                       counters=('evictions',), gauges=('sessions',))
+metrics.register_stats('report_fusion', fusion.stats, counters=('published',), gauges=('sessions', 'subscribers'))
+
+# cProfile a sample of analysis requests and capture stacks of slow ones (FAD_PROFILE_*); read on /admin/profiles
+profiling.instrument_flask(app)
 
-# Initialize fraud detection system
-fds = FraudDetectionSystem()
+# Load and warm DeepFace and TextBlob at boot rather than on the first request
+engine.require('deepface', 'text')
+
+# Started on first use so spawned worker processes that re-import this module don't start pools of their own
+facial_pool = None
+facial_pool_lock = threading.Lock()
+
+def get_facial_pool():
+    """Return the shared facial worker pool, or None when workers are disabled"""
+    global facial_pool
+    if app.config['FACIAL_WORKERS'] <= 0:
+        return None
+    with facial_pool_lock:
+        if facial_pool is None:
+            facial_pool = FacialWorkerPool(
+                num_workers=app.config['FACIAL_WORKERS'],
+                queue_size=app.config['FACIAL_QUEUE_SIZE'],
+                timeout=app.config['FACIAL_TIMEOUT']
+            )
+            facial_pool.start()
+            metrics.register_stats('facial_workers', facial_pool.stats,
+                                   counters=('completed', 'rejected', 'timed_out', 'crashed'),
+                                   gauges=('ready_workers', 'queue_depth', 'in_flight'))
+            print(f"✅ Started {app.config['FACIAL_WORKERS']} facial analysis workers")
+    return facial_pool
 
 @app.route('/')
 def index():
@@ -277,12 +95,31 @@ def analyze_facial():
     try:
         data = request.json
         image_data = data.get('image')
+        detector = data.get('detector')
+        # Frame cache and timeline scope; without a session_id the request is analyzed on its own
+        session_id = data.get('session_id')
         
         if not image_data:
             return jsonify({'success': False, 'error': 'No image data provided'}), 400
+        if detector is not None and detector not in DETECTOR_NAMES:
+            return jsonify({'success': False, 'error': f'Unknown detector, choose from {", ".join(DETECTOR_NAMES)}'}), 400
         
-        result = fds.analyze_facial_expression(image_data)
-        return jsonify(result)
+        pool = get_facial_pool()
+        if pool is not None:
+            result = pool.analyze(image_data, detector=detector, session_id=session_id)
+        elif not engine.available('deepface'):
+            return jsonify({'success': False, 'error': 'Facial analyzer not initialized'}), 503
+        else:
+            result = engine.analyze_facial(image_data, detector=detector, session_id=session_id)
+        result = engine.track_facial(session_id, result)
+        with stage('serialize'):
+            return jsonify(result)
+    except PoolSaturated as e:
+        return jsonify({'success': False, 'error': str(e)}), 503, {'Retry-After': str(e.retry_after)}
+    except PoolTimeout as e:
+        return jsonify({'success': False, 'error': str(e)}), 504
+    except WorkerCrashed as e:
+        return jsonify({'success': False, 'error': str(e)}), 502
     except Exception as e:
         print(f"❌ Facial endpoint error: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -293,16 +130,72 @@ def analyze_text():
     try:
         data = request.json
         text = data.get('text')
+        session_id = data.get('session_id')
         
         if not text:
             return jsonify({'success': False, 'error': 'No text provided'}), 400
+        if not engine.available('text'):
+            return jsonify({'success': False, 'error': 'Text analyzer not initialized'}), 503
         
-        result = fds.analyze_text_sentiment(text)
-        return jsonify(result)
+        result = engine.analyze_text(text, session_id=session_id)
+        with stage('serialize'):
+            return jsonify(result)
     except Exception as e:
         print(f"❌ Text endpoint error: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/analyze/text/batch', methods=['POST'])
+def analyze_text_batch():
+    """Endpoint for scoring many messages in one request (JSON array or NDJSON body)"""
+    try:
+        parse_errors = {}
+        if request.mimetype in NDJSON_MIMETYPES:
+            # A malformed line only fails its own slot, not the batch
+            items = []
+            for number, line in enumerate(request.get_data(as_text=True).splitlines(), 1):
+                if not line.strip():
+                    continue
+                try:
+                    items.append(json.loads(line))
+                except ValueError as e:
+                    parse_errors[len(items)] = f'Invalid JSON on line {number}: {str(e)}'
+                    items.append(None)
+        else:
+            items = request.get_json(silent=True)
+            if isinstance(items, dict):
+                items = items.get('messages', items.get('texts'))
+        
+        if not isinstance(items, list) or not items:
+            return jsonify({'success': False, 'error': 'Expected a non-empty list of messages'}), 400
+        if len(items) > app.config['MAX_BATCH_SIZE']:
+            return jsonify({
+                'success': False,
+                'error': f"Batch too large (max {app.config['MAX_BATCH_SIZE']} messages)"
+            }), 413
+        
+        if not engine.available('text'):
+            return jsonify({'success': False, 'error': 'Text analyzer not initialized'}), 503
+        
+        # Items may be plain strings or objects carrying an optional id
+        ids = [item.get('id') if isinstance(item, dict) else None for item in items]
+        texts = [item.get('text') if isinstance(item, dict) else item for item in items]
+        
+        results = engine.analyze_text_batch(texts)
+        for index, error in parse_errors.items():
+            results[index] = {'success': False, 'error': error}
+        for item_id, result in zip(ids, results):
+            if item_id is not None:
+                result['id'] = item_id
+        
+        if request.accept_mimetypes.best == 'application/x-ndjson':
+            body = ''.join(json.dumps(result) + '\n' for result in results)
+            return app.response_class(body, mimetype='application/x-ndjson')
+        
+        return jsonify({'success': True, 'count': len(results), 'results': results})
+    except Exception as e:
+        print(f"❌ Batch text endpoint error: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/analyze/comprehensive', methods=['POST'])
 def analyze_comprehensive():
     """Endpoint for comprehensive analysis"""
@@ -310,22 +203,98 @@ def analyze_comprehensive():
         data = request.json
         facial_data = data.get('facial_data')
         text_data = data.get('text_data')
+        # Same session scope as /analyze/facial, whose smoothed history the report uses
+        session_id = data.get('session_id')
         
-        result = fds.generate_comprehensive_report(facial_data, text_data)
+        result = engine.report(facial_data, text_data, session_id=session_id,
+                               voice_data=data.get('voice_data'))
         return jsonify(result)
     except Exception as e:
         print(f"❌ Comprehensive endpoint error: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/sessions', methods=['POST'])
+def create_session():
+    """Start a report session: a fresh session_id plus the token its owner subscribes to /events with"""
+    session_id = secrets.token_urlsafe(16)
+    return jsonify({
+        'success': True,
+        'session_id': session_id,
+        'events_token': session_token(app.config['SECRET_KEY'], session_id)
+    })
+
+def events_authorized(session_id, token):
+    """Whether token (from POST /sessions) lets its holder subscribe to session_id's reports"""
+    return valid_session_token(app.config['SECRET_KEY'], session_id, token)
+
+@app.route('/events/<session_id>', methods=['GET'])
+def session_events(session_id):
+    """Server-sent events: the session's comprehensive report whenever its facial or text analysis changes
+    
+    Only the session's owner may subscribe: pass the events_token from POST /sessions as ?token=.
+    """
+    if not events_authorized(session_id, request.args.get('token')):
+        return jsonify({'success': False, 'error': 'Invalid or missing events token'}), 403
+    
+    mailbox = Mailbox()
+    token = fusion.subscribe(session_id, mailbox.put)
+    latest = fusion.latest(session_id)
+    
+    def stream():
+        try:
+            yield SSE_PREAMBLE
+            if latest is not None:
+                yield sse_event(latest)
+            while True:
+                report = mailbox.get(timeout=app.config['SSE_KEEPALIVE_SECONDS'])
+                # Keep-alives also surface a closed connection, which ends the stream
+                yield sse_event(report) if report is not None else SSE_KEEPALIVE
+        finally:
+            fusion.unsubscribe(session_id, token)
+    
+    return app.response_class(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+# Extra /health sections from servers that mount this app (asgi.py adds its inference pool and live video state)
+health_sections = {}
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """Health check endpoint; returns 503 while models are loading or if one failed"""
+    healthy = models.healthy
     return jsonify({
-        'status': 'healthy',
+        'status': 'healthy' if healthy else 'unavailable',
+        'ready': models.ready,
+        'models': models.status(),
+        'model_backend': model_backend(),
         'service': 'EmotionFAD - Fraud Activity Detection',
         'version': '2.0',
+        'facial_workers': facial_pool.stats() if facial_pool else None,
+        'microbatch': engine.component_stats('batcher', 'deepface'),
+        'frame_cache': engine.component_stats('frame_cache', 'deepface'),
+        'text_cache': engine.component_stats('text_cache', 'text'),
+        'sessions': engine.component_stats('session_data', 'deepface'),
+        'report_fusion': fusion.stats(),
+        **{name: section() for name, section in health_sections.items()},
         'timestamp': datetime.now().isoformat()
-    })
+    }), 200 if healthy else 503
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus metrics for this process (404 unless FAD_METRICS=1)"""
+    return metrics_response()
+
+@app.route('/admin/profiles', methods=['GET'])
+def admin_profiles():
+    """Recent request profiles (?slow=1 for slow requests only); 404 unless FAD_ADMIN_TOKEN is sent"""
+    return profiling.admin_profiles_response(request.args, request.headers)
+
+@app.route('/admin/profiles/<profile_id>', methods=['GET'])
+def admin_profile(profile_id):
+    """One request profile with its stage timings (?format=pstats|collapsed for the raw profile)"""
+    return profiling.admin_profile_response(profile_id, request.args, request.headers)
 
 def open_browser():
     """Open browser automatically"""
@@ -4,11 +4,19 @@ EmotionFAD - Main Application with Emotion Analysis
 
 from flask import Flask, render_template, request, jsonify
 from flask_socketio import SocketIO, emit
-from emotion_analysis import EmotionAnalyzer
-import base64
+from engine import engine
+import emotion_api
+from model_manager import models
+from model_stubs import model_backend
+from metrics import metrics, stage, instrument_flask, metrics_response
+import profiling
+from profiling import profiler
+from frame_scheduler import FrameScheduler
+from client_state import AnalysisSessions
+from message_queue import create_client_manager, socketio_transports
 import os
+import threading
 import logging
-import json
 from datetime import datetime
 
 # Configure logging
@@ -24,6 +32,20 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 # Get port from environment variable or use default
 port = int(os.environ.get('PORT', 5000))
 
+# Per-client analysis rate limit and number of frame analysis loops
+app.config['MAX_CLIENT_FPS'] = float(os.environ.get('FAD_MAX_CLIENT_FPS', 10))
+app.config['FRAME_WORKERS'] = int(os.environ.get('FAD_FRAME_WORKERS', 1))
+
+# Face tracking: full detection every N frames, tracked boxes in between (0 = off unless a client asks)
+app.config['TRACK_DETECT_EVERY'] = int(os.environ.get('FAD_TRACK_DETECT_EVERY', 0))
+
+# Multi-worker mode: emits travel through FAD_MESSAGE_QUEUE (e.g. redis://) so they
+# reach the worker holding the socket; FAD_SOCKETIO_TRANSPORTS=websocket drops the
+# long-polling transport, which otherwise needs sticky sessions at the load balancer
+socketio_options = {}
+if socketio_transports():
+    socketio_options['transports'] = socketio_transports()
+
 # Initialize SocketIO with appropriate settings for production
 socketio = SocketIO(
     app,
@@ -33,22 +55,67 @@ socketio = SocketIO(
     engineio_logger=True,
     ping_timeout=60,
     ping_interval=25,
-    max_http_buffer_size=1e8  # 100MB max for file uploads
+    max_http_buffer_size=1e8,  # 100MB max for file uploads
+    client_manager=create_client_manager(),
+    **socketio_options
 )
 
-# Initialize emotion analyzer (lazy loading)
-analyzer = None
+# /api/analyze; importing emotion_api also loads and warms the emotion analyzer (FER + MTCNN + Haar cascade)
+app.register_blueprint(emotion_api.api)
+
+# Keeps only the newest frame per client; analysis loops drain it round-robin
+frame_scheduler = FrameScheduler(max_fps=app.config['MAX_CLIENT_FPS'])
+frame_workers_started = False
+frame_workers_lock = threading.Lock()
+
+# Request counts and timings, pipeline stage histograms and component stats on /metrics (FAD_METRICS=1)
+instrument_flask(app)
+metrics.register_stats('frame_scheduler', frame_scheduler.stats,
+                       counters=('received', 'dispatched', 'dropped'), gauges=('clients_waiting', 'in_flight'))
+metrics.register_stats('fer_frame_cache', lambda: engine.component_stats('frame_cache'),
+                       counters=('hits', 'near_hits', 'misses', 'evictions'), gauges=('entries', 'bytes', 'hit_rate'))
+metrics.register_stats('fer_microbatch', lambda: engine.component_stats('batcher'),
+                       counters=('errors',), gauges=('pending',),
+                       histograms=('batch_size', 'queue_latency_ms', 'batch_latency_ms'))
+
+# cProfile a sample of frames and API requests and capture stacks of slow ones (FAD_PROFILE_*); read on /admin/profiles
+profiling.instrument_flask(app)
+
+# Per-connection analysis options, keyed by request.sid; shared through FAD_STATE_URL
+# (or a Redis message queue), while face trackers stay on the worker owning the socket
+client_sessions = AnalysisSessions()
+
+def ensure_frame_workers():
+    """Start the background analysis loops on first use."""
+    global frame_workers_started
+    with frame_workers_lock:
+        if frame_workers_started:
+            return
+        for _ in range(app.config['FRAME_WORKERS']):
+            socketio.start_background_task(process_scheduled_frames)
+        frame_workers_started = True
 
-def get_analyzer():
-    global analyzer
-    if analyzer is None:
+def process_scheduled_frames():
+    """Analyze queued frames forever, one client at a time."""
+    while True:
+        sid, message, queued_seconds = frame_scheduler.next_frame()
+        if sid is None:
+            # Nothing ready: sleep until the next rate-limited client is due
+            socketio.sleep(min(queued_seconds, 0.05) if queued_seconds else 0.01)
+            continue
+        
         try:
-            analyzer = EmotionAnalyzer()
-            logger.info("Emotion analyzer initialized successfully")
-        except Exception as e:
-            logger.error(f"Failed to initialize emotion analyzer: {str(e)}")
-            return None
-    return analyzer
+            with profiler.profile('socketio', 'video_frame', sid=sid, frame_id=message.get('frame_id'),
+                                  queued_ms=round(queued_seconds * 1000, 1)):
+                event, payload = emotion_api.analyze_frame(client_sessions, frame_scheduler, sid, message,
+                                                           queued_seconds)
+                with stage('emit'):
+                    socketio.emit(event, payload, to=sid)
+        finally:
+            frame_scheduler.done(sid)
+        
+        # Let the hub service other sockets between analyses
+        socketio.sleep(0)
 
 # Routes
 @app.route('/')
@@ -58,98 +125,74 @@ def index():
 
 # WebSocket event handlers
 @socketio.on('connect')
-def handle_connect():
-    """Handle new WebSocket connection."""
-    logger.info(f'Client connected: {request.sid}')
-    emit('connection_response', {'status': 'connected', 'analyzer_ready': analyzer is not None})
+def handle_connect(auth=None):
+    """Handle new WebSocket connection and agree on a frame encoding."""
+    emit(*emotion_api.connect(client_sessions, request.sid, auth))
 
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handle WebSocket disconnection."""
+    frame_scheduler.remove(request.sid)
+    client_sessions.remove(request.sid)
+    engine.end_session(request.sid)
     logger.info(f'Client disconnected: {request.sid}')
 
 @socketio.on('start_analysis')
-def handle_start_analysis():
-    """Handle request to start emotion analysis."""
-    try:
-        if analyzer is None:
-            emit('analysis_error', {'error': 'Emotion analyzer not initialized'})
-            return
-        
-        emit('analysis_started', {'status': 'success'})
-        logger.info('Emotion analysis started')
-        
-    except Exception as e:
-        error_msg = f'Error starting analysis: {str(e)}'
-        logger.error(error_msg)
-        emit('analysis_error', {'error': error_msg})
+def handle_start_analysis(options=None):
+    """Handle request to start emotion analysis (options: see emotion_api.start_analysis)."""
+    emit(*emotion_api.start_analysis(client_sessions, request.sid, options, app.config['TRACK_DETECT_EVERY']))
 
 @socketio.on('video_frame')
 def handle_video_frame(data):
-    """Process video frame for emotion analysis."""
+    """Queue a video frame for emotion analysis; stale frames from the same client are dropped.
+    
+    An optional frame_id in the message is echoed back on its analysis_result.
+    """
     try:
-        if analyzer is None:
-            emit('analysis_error', {'error': 'Emotion analyzer not initialized'})
-            return
-        
-        # Process the frame
-        result = analyzer.process_frame(data['frame'])
-        
-        # Add timestamp
-        result['timestamp'] = datetime.now().isoformat()
-        
-        # Send the result back to the client
-        emit('analysis_result', result)
+        frame_scheduler.offer(request.sid, emotion_api.frame_message(data))
+        ensure_frame_workers()
         
     except Exception as e:
-        error_msg = f'Error processing video frame: {str(e)}'
+        error_msg = f'Error queueing video frame: {str(e)}'
         logger.error(error_msg)
         emit('analysis_error', {'error': error_msg})
 
-# API endpoint for single image analysis
-@app.route('/api/analyze', methods=['POST'])
-def analyze_image():
-    """API endpoint for analyzing a single image."""
-    try:
-        if 'image' not in request.files and 'image' not in request.json:
-            return jsonify({'error': 'No image provided'}), 400
-            
-        if 'image' in request.files:
-            # Handle file upload
-            file = request.files['image']
-            if file.filename == '':
-                return jsonify({'error': 'No selected file'}), 400
-                
-            # Read image file
-            image_data = file.read()
-            nparr = np.frombuffer(image_data, np.uint8)
-            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            
-        else:
-            # Handle base64 encoded image
-            image_data = request.json['image']
-            if ',' in image_data:
-                image_data = image_data.split(',')[1]
-            
-            img_data = base64.b64decode(image_data)
-            nparr = np.frombuffer(img_data, np.uint8)
-            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if image is None:
-            return jsonify({'error': 'Failed to decode image'}), 400
-        
-        # Analyze emotions
-        result = analyzer.analyze_emotions(image)
-        
-        # Add visualization if faces were detected
-        if result["status"] == "success" and result["faces_detected"] > 0:
-            result["frame_with_boxes"] = analyzer.draw_boxes(image, result["analysis"])
-        
-        return jsonify(result)
-        
-    except Exception as e:
-        logger.error(f'Error in analyze_image: {str(e)}')
-        return jsonify({'error': str(e)}), 500
+@app.route('/health', methods=['GET'])
+def health_check():
+    """Readiness check; returns 503 while models are loading or if one failed."""
+    healthy = models.healthy
+    return jsonify({
+        'status': 'healthy' if healthy else 'unavailable',
+        'ready': models.ready,
+        'models': models.status(),
+        'model_backend': model_backend(),
+        'timestamp': datetime.now().isoformat()
+    }), 200 if healthy else 503
+
+@app.route('/api/stats', methods=['GET'])
+def analyzer_stats():
+    """Micro-batching histograms, frame cache hit rates, frame scheduler drop counters and connected clients (all workers when state is shared)."""
+    return jsonify({
+        'microbatch': engine.component_stats('batcher'),
+        'frame_cache': engine.component_stats('frame_cache'),
+        'frame_scheduler': frame_scheduler.stats(),
+        'connected_clients': client_sessions.count()
+    })
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus metrics for this process (404 unless FAD_METRICS=1)."""
+    return metrics_response()
+
+@app.route('/admin/profiles', methods=['GET'])
+def admin_profiles():
+    """Recent frame and request profiles (?slow=1 for slow ones only); 404 unless FAD_ADMIN_TOKEN is sent."""
+    return profiling.admin_profiles_response(request.args, request.headers)
+
+@app.route('/admin/profiles/<profile_id>', methods=['GET'])
+def admin_profile(profile_id):
+    """One profile with its stage timings (?format=pstats|collapsed for the raw profile)."""
+    return profiling.admin_profile_response(profile_id, request.args, request.headers)
 
 if __name__ == '__main__':
     # Create necessary directories
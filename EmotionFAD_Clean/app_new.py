@@ -16,60 +16,129 @@ import webbrowser
 import pyngrok.ngrok as ngrok
 from datetime import datetime
 from dotenv import load_dotenv
+from client_state import create_state_store, AnalysisSessions
+from message_queue import create_client_manager, socketio_transports
+from emotion_analysis import overlay_options
+from engine import engine
+from live_video import LiveVideo
+from face_detectors import DETECTOR_NAMES
+import logging
+
+# Frame analysis errors are logged (see live_video.py)
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'emotion-fad-secret-key-2025'
-socketio = SocketIO(app, cors_allowed_origins="*")
+# Live video: per-client analysis rate, analysis loops and face tracking, as in app_emotion.py
+app.config['MAX_CLIENT_FPS'] = float(os.environ.get('FAD_MAX_CLIENT_FPS', 10))
+app.config['FRAME_WORKERS'] = int(os.environ.get('FAD_FRAME_WORKERS', 1))
+app.config['TRACK_DETECT_EVERY'] = int(os.environ.get('FAD_TRACK_DETECT_EVERY', 0))
+# FAD_MESSAGE_QUEUE lets several workers share clients; see app_emotion.py
+socketio_options = {}
+if socketio_transports():
+    socketio_options['transports'] = socketio_transports()
+socketio = SocketIO(app, cors_allowed_origins="*", client_manager=create_client_manager(), **socketio_options)
 
-# Global variables
-clients = {}
+# Per-client state, shared by all workers when FAD_STATE_URL points at Redis
+clients = create_state_store()
 ngrok_url = None
 
+# Video analysis options are kept in clients too; face trackers stay on this worker
+client_sessions = AnalysisSessions(clients)
+
+# The emotion analyzer behind app_emotion.py, shared by every socket
+engine.require('fer')
+
+# Latest frame per client wins; older queued frames are dropped, not analyzed late
+live_video = LiveVideo(socketio, client_sessions, max_fps=app.config['MAX_CLIENT_FPS'],
+                       workers=app.config['FRAME_WORKERS'])
+
+# Face and voice stress both feed the session's comprehensive risk report (engine.fusion)
+# Audio ring buffers and prosody baselines per connection; like face trackers,
+# they stay on the worker owning the socket
+voice_streams = {}
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
 @socketio.on('connect')
 def handle_connect():
-    clients[request.sid] = {'type': None}
+    clients.set(request.sid, {'type': None})
+    client_sessions.connect(request.sid)
     print(f'Client connected: {request.sid}')
 
 @socketio.on('disconnect')
 def handle_disconnect():
-    if request.sid in clients:
-        del clients[request.sid]
+    live_video.remove(request.sid)
+    client_sessions.remove(request.sid)
+    voice_streams.pop(request.sid, None)
+    engine.end_session(request.sid)
     print(f'Client disconnected: {request.sid}')
 
 @socketio.on('start_video')
-def handle_start_video():
-    clients[request.sid]['type'] = 'video'
+def handle_start_video(options=None):
+    # options: detector, tracking/detect_every and overlay, as for start_analysis in app_emotion.py
+    options = options or {}
+    detector = options.get('detector')
+    if detector is not None and detector not in DETECTOR_NAMES:
+        emit('error', {'error': f'Unknown detector, choose from {", ".join(DETECTOR_NAMES)}'})
+        return
+    try:
+        overlay = overlay_options(options.get('overlay'))
+    except ValueError as e:
+        emit('error', {'error': str(e)})
+        return
+    detect_every = int(options.get('detect_every') or app.config['TRACK_DETECT_EVERY'] or 5)
+    tracking = options.get('tracking', app.config['TRACK_DETECT_EVERY'] > 0)
+    client_sessions.start(request.sid, tracking=tracking, detect_every=detect_every, detector=detector, overlay=overlay)
+    clients.update(request.sid, type='video')
     print(f'Video streaming started for client: {request.sid}')
 
 @socketio.on('start_audio')
-def handle_start_audio():
-    clients[request.sid]['type'] = 'audio'
-    print(f'Audio streaming started for client: {request.sid}')
+def handle_start_audio(options=None):
+    # options: sample_rate, format (pcm16/float32/opus) and channels of the chunks that follow
+    options = options or {}
+    try:
+        stream = engine.voice_stream(options.get('sample_rate'), options.get('format'), options.get('channels'))
+    except (ImportError, ValueError) as e:
+        print(f'Error starting audio: {str(e)}')
+        emit('error', {'error': str(e)})
+        return
+    voice_streams[request.sid] = stream
+    clients.update(request.sid, type='audio', sample_rate=stream.sample_rate, audio_format=stream.audio_format)
+    print(f'Audio streaming started for client: {request.sid} ({stream.audio_format}, {stream.sample_rate} Hz)')
 
 @socketio.on('video_frame')
 def handle_video_frame(data):
+    # A binary frame, or {'frame' (or 'image'): base64/bytes, 'frame_id': optional id echoed back}
     try:
-        # Process video frame here
-        # For now, just echo back the frame
-        emit('processed_frame', data)
+        error = live_video.offer(request.sid, data)
+        if error:
+            emit('error', {'error': error})
     except Exception as e:
-        print(f'Error processing video frame: {str(e)}')
+        logger.error(f'Error queueing video frame: {str(e)}')
+        emit('error', {'error': 'Failed to process video frame'})
 
 @socketio.on('audio_data')
 def handle_audio_data(data):
     try:
-        # Process audio data here
-        # For now, just echo back the data
-        emit('processed_audio', data)
+        stream = voice_streams.get(request.sid)
+        if stream is None:
+            # No start_audio yet: assume the default format
+            stream = voice_streams[request.sid] = engine.voice_stream()
+        result, report = engine.analyze_voice(stream, data, session_id=request.sid)
+        result['timestamp'] = datetime.now().isoformat()
+        emit('processed_audio', result)
+        if report is not None:
+            emit('risk_report', report)
     except Exception as e:
         print(f'Error processing audio data: {str(e)}')
+        emit('error', {'error': f'Failed to process audio data: {str(e)}'})
 
 def start_ngrok():
     global ngrok_url
@@ -16,6 +16,12 @@ import webbrowser
 import pyngrok.ngrok as ngrok
 from datetime import datetime
 from dotenv import load_dotenv
+from client_state import create_state_store, AnalysisSessions
+from message_queue import create_client_manager, socketio_transports
+from emotion_analysis import overlay_options
+from engine import engine
+from live_video import LiveVideo
+from face_detectors import DETECTOR_NAMES
 import logging
 
 # Configure logging
@@ -31,6 +37,16 @@ app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'emotion-fad-secret-key-2025'
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
+# Live video: per-client analysis rate, analysis loops and face tracking, as in app_emotion.py
+app.config['MAX_CLIENT_FPS'] = float(os.environ.get('FAD_MAX_CLIENT_FPS', 10))
+app.config['FRAME_WORKERS'] = int(os.environ.get('FAD_FRAME_WORKERS', 1))
+app.config['TRACK_DETECT_EVERY'] = int(os.environ.get('FAD_TRACK_DETECT_EVERY', 0))
+
+# FAD_MESSAGE_QUEUE lets several workers share clients; see app_emotion.py
+socketio_options = {}
+if socketio_transports():
+    socketio_options['transports'] = socketio_transports()
+
 # Configure SocketIO
 socketio = SocketIO(
     app,
@@ -39,13 +55,30 @@ socketio = SocketIO(
     logger=True,
     engineio_logger=True,
     ping_timeout=60,
-    ping_interval=25
+    ping_interval=25,
+    client_manager=create_client_manager(),
+    **socketio_options
 )
 
-# Global variables
-clients = {}
+# Per-client state, shared by all workers when FAD_STATE_URL points at Redis
+clients = create_state_store()
 ngrok_url = None
 
+# Video analysis options are kept in clients too; face trackers stay on this worker
+client_sessions = AnalysisSessions(clients)
+
+# The emotion analyzer behind app_emotion.py, shared by every socket
+engine.require('fer')
+
+# Latest frame per client wins; older queued frames are dropped, not analyzed late
+live_video = LiveVideo(socketio, client_sessions, max_fps=app.config['MAX_CLIENT_FPS'],
+                       workers=app.config['FRAME_WORKERS'])
+
+# Face and voice stress both feed the session's comprehensive risk report (engine.fusion)
+# Audio ring buffers and prosody baselines per connection; like face trackers,
+# they stay on the worker owning the socket
+voice_streams = {}
+
 @app.route('/')
 def index():
     """Render the main application page."""
@@ -55,7 +88,8 @@ def index():
 def handle_connect():
     """Handle new WebSocket connection."""
     try:
-        clients[request.sid] = {'type': None}
+        clients.set(request.sid, {'type': None})
+        client_sessions.connect(request.sid)
         logger.info(f'Client connected: {request.sid}')
         emit('connection_response', {'data': 'Connected successfully'})
     except Exception as e:
@@ -66,54 +100,104 @@ def handle_connect():
 def handle_disconnect():
     """Handle WebSocket disconnection."""
     try:
-        if request.sid in clients:
-            del clients[request.sid]
+        live_video.remove(request.sid)
+        client_sessions.remove(request.sid)
+        voice_streams.pop(request.sid, None)
+        engine.end_session(request.sid)
         logger.info(f'Client disconnected: {request.sid}')
     except Exception as e:
         logger.error(f'Error in handle_disconnect: {str(e)}')
 
 @socketio.on('start_video')
-def handle_start_video():
-    """Handle video streaming start request."""
+def handle_start_video(options=None):
+    """Handle video streaming start request.
+    
+    options may set the detector, tracking/detect_every and overlay, as for
+    start_analysis in app_emotion.py.
+    """
     try:
-        if request.sid in clients:
-            clients[request.sid]['type'] = 'video'
-        emit('video_started', {'status': 'success'})
+        options = options or {}
+        detector = options.get('detector')
+        if detector is not None and detector not in DETECTOR_NAMES:
+            emit('error', {'error': f'Unknown detector, choose from {", ".join(DETECTOR_NAMES)}'})
+            return
+        detect_every = int(options.get('detect_every') or app.config['TRACK_DETECT_EVERY'] or 5)
+        tracking = options.get('tracking', app.config['TRACK_DETECT_EVERY'] > 0)
+        session = client_sessions.start(
+            request.sid, tracking=tracking, detect_every=detect_every,
+            detector=detector, overlay=overlay_options(options.get('overlay'))
+        )
+        clients.update(request.sid, type='video')
+        emit('video_started', {
+            'status': 'success',
+            'tracking': bool(tracking),
+            'detector': detector,
+            'overlay': session['overlay'],
+            'analyzer_ready': engine.fer_ready()
+        })
         logger.info(f'Video streaming started for client: {request.sid}')
+    except ValueError as e:
+        emit('error', {'error': str(e)})
     except Exception as e:
         logger.error(f'Error in handle_start_video: {str(e)}')
         emit('error', {'error': 'Failed to start video'})
 
 @socketio.on('start_audio')
-def handle_start_audio():
-    """Handle audio streaming start request."""
+def handle_start_audio(options=None):
+    """Handle audio streaming start request.
+    
+    options gives the sample_rate, format (pcm16/float32/opus) and channels
+    of the audio_data chunks that follow; the defaults are 16 kHz mono pcm16.
+    """
     try:
-        if request.sid in clients:
-            clients[request.sid]['type'] = 'audio'
-        emit('audio_started', {'status': 'success'})
+        options = options or {}
+        stream = engine.voice_stream(options.get('sample_rate'), options.get('format'), options.get('channels'))
+        voice_streams[request.sid] = stream
+        clients.update(request.sid, type='audio', sample_rate=stream.sample_rate, audio_format=stream.audio_format)
+        emit('audio_started', {'status': 'success', 'sample_rate': stream.sample_rate, 'format': stream.audio_format})
         logger.info(f'Audio streaming started for client: {request.sid}')
+    except (ImportError, ValueError) as e:
+        logger.error(f'Error in handle_start_audio: {str(e)}')
+        emit('error', {'error': str(e)})
     except Exception as e:
         logger.error(f'Error in handle_start_audio: {str(e)}')
         emit('error', {'error': 'Failed to start audio'})
 
 @socketio.on('video_frame')
 def handle_video_frame(data):
-    """Process video frame from client."""
+    """Queue a video frame for analysis; stale frames from the same client are dropped.
+    
+    The frame is binary, or {'frame' (or 'image'): base64/bytes, 'frame_id'}
+    with an optional frame_id echoed back on its processed_frame.
+    """
     try:
-        # Process frame here (placeholder)
-        # For now, just echo back the frame
-        emit('processed_frame', data)
+        error = live_video.offer(request.sid, data)
+        if error:
+            emit('error', {'error': error})
     except Exception as e:
-        logger.error(f'Error processing video frame: {str(e)}')
+        logger.error(f'Error queueing video frame: {str(e)}')
         emit('error', {'error': 'Failed to process video frame'})
 
 @socketio.on('audio_data')
 def handle_audio_data(data):
-    """Process audio data from client."""
+    """Analyze one audio chunk and send back prosody, voice stress and the session's risk report.
+    
+    Only the chunk's new samples are analyzed; the client's ring buffer
+    supplies the overlap with the previous chunk.
+    """
     try:
-        # Process audio data here (placeholder)
-        # For now, just echo back the data
-        emit('processed_audio', data)
+        stream = voice_streams.get(request.sid)
+        if stream is None:
+            # No start_audio yet: assume the default format
+            stream = voice_streams[request.sid] = engine.voice_stream()
+        result, report = engine.analyze_voice(stream, data, session_id=request.sid)
+        result['timestamp'] = datetime.now().isoformat()
+        emit('processed_audio', result)
+        if report is not None:
+            emit('risk_report', report)
+    except ValueError as e:
+        logger.error(f'Error processing audio data: {str(e)}')
+        emit('error', {'error': str(e)})
     except Exception as e:
         logger.error(f'Error processing audio data: {str(e)}')
         emit('error', {'error': 'Failed to process audio data'})
@@ -0,0 +1,341 @@
+"""
+EmotionFAD - ASGI Server
+Asyncio serving mode: Socket.IO, health checks and the analysis endpoints share one
+event loop, and CPU-bound inference runs in a thread pool so it never blocks it.
+
+Run with:
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+or under gunicorn:
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn -c gunicorn.conf.py asgi:application
+
+HTTP routes are app.py's Flask app (plus /api/analyze from emotion_api.py),
+mounted with a2wsgi: analysis routes run on the inference threads behind an
+admission cap, everything else on a few threads of its own. The Socket.IO
+events are app_emotion.py's, on python-socketio's AsyncServer.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import parse_qs
+
+import socketio
+from a2wsgi import WSGIMiddleware
+from flask import render_template
+
+from app import app as flask_app, events_authorized, fusion, health_sections
+import emotion_api
+from engine import engine
+from client_state import AnalysisSessions
+from facial_workers import PoolSaturated
+from frame_scheduler import FrameScheduler
+from message_queue import create_client_manager, socketio_transports
+from report_fusion import sse_event, SSE_PREAMBLE, SSE_KEEPALIVE
+from metrics import metrics, stage, record_request
+from profiling import profiler
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('emotion_fad_asgi')
+
+# Inference threads; requests beyond threads + queue are turned away with 503
+INFERENCE_THREADS = int(os.environ.get('FAD_INFERENCE_THREADS', os.cpu_count() or 4))
+INFERENCE_QUEUE = int(os.environ.get('FAD_INFERENCE_QUEUE', INFERENCE_THREADS * 4))
+MAX_CLIENT_FPS = float(os.environ.get('FAD_MAX_CLIENT_FPS', 10))
+FRAME_WORKERS = int(os.environ.get('FAD_FRAME_WORKERS', INFERENCE_THREADS))
+TRACK_DETECT_EVERY = int(os.environ.get('FAD_TRACK_DETECT_EVERY', 0))
+SSE_KEEPALIVE_SECONDS = flask_app.config['SSE_KEEPALIVE_SECONDS']
+
+# Routes whose requests run model inference, and so count against the admission cap
+INFERENCE_ROUTES = ('/analyze/facial', '/analyze/text', '/analyze/text/batch', '/api/analyze')
+
+
+class InferenceOffloader:
+    """Run blocking inference in a thread pool with a cap on queued work.
+
+    The event loop only awaits the result, so Socket.IO heartbeats and health
+    checks keep being answered while every inference thread is busy.
+    """
+
+    def __init__(self, threads, max_pending, executor=None):
+        self.threads = threads
+        self.max_pending = max_pending
+        self.executor = executor or ThreadPoolExecutor(max_workers=threads, thread_name_prefix='fad-inference')
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self._avg_latency = 1.0
+
+    def retry_after(self):
+        return max(1, math.ceil(self.in_flight * self._avg_latency / self.threads))
+
+    def admit(self, bounded=True):
+        """Count a job in flight and return its start time; raises PoolSaturated when threads and queue are full."""
+        if bounded and self.in_flight >= self.threads + self.max_pending:
+            self.rejected += 1
+            raise PoolSaturated(self.retry_after())
+        self.in_flight += 1
+        return time.perf_counter()
+
+    def release(self, started):
+        self.in_flight -= 1
+        self.completed += 1
+        self._avg_latency = 0.9 * self._avg_latency + 0.1 * (time.perf_counter() - started)
+
+    async def run(self, fn, *args, bounded=True, profile=None, **kwargs):
+        """Await fn(*args, **kwargs) on an inference thread; raises PoolSaturated when full.
+
+        profile is a (kind, name) label under which the call may be profiled
+        (see profiling.py); only the thread's work is covered, not the wait.
+        """
+        started = self.admit(bounded)
+        work = partial(fn, *args, **kwargs)
+        if profile is not None and profiler.enabled:
+            work = partial(profiler.call, profile[0], profile[1], work)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, work)
+        finally:
+            self.release(started)
+
+    def stats(self):
+        return {
+            'threads': self.threads,
+            'max_pending': self.max_pending,
+            'in_flight': self.in_flight,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'avg_latency_seconds': round(self._avg_latency, 4)
+        }
+
+
+# /api/analyze as in app_emotion.py, and its live video page (app.py's page is at /)
+flask_app.register_blueprint(emotion_api.api)
+flask_app.add_url_rule('/emotion', 'emotion_page', lambda: render_template('emotion_analysis.html'))
+
+# Analysis requests and video frames share the inference threads; pages, /health and
+# /metrics get threads of their own so they answer while inference is saturated
+inference_wsgi = WSGIMiddleware(flask_app, workers=INFERENCE_THREADS)
+inference = InferenceOffloader(INFERENCE_THREADS, INFERENCE_QUEUE, executor=inference_wsgi.executor)
+other_wsgi = WSGIMiddleware(flask_app, workers=4)
+
+# Flask routes are counted by app.py's hooks; requests turned away here by http_app below
+metrics.register_stats('inference', inference.stats, counters=('completed', 'rejected'), gauges=('in_flight',))
+metrics.register_stats('fer_frame_cache', lambda: engine.component_stats('frame_cache'),
+                       counters=('hits', 'near_hits', 'misses', 'evictions'), gauges=('entries', 'bytes', 'hit_rate'))
+metrics.register_stats('fer_microbatch', lambda: engine.component_stats('batcher'),
+                       counters=('errors',), gauges=('pending',),
+                       histograms=('batch_size', 'queue_latency_ms', 'batch_latency_ms'))
+
+
+# ---------------------------------------------------------------------------
+# HTTP
+# ---------------------------------------------------------------------------
+
+async def send_json(send, status, payload, headers=None):
+    body = json.dumps(payload).encode('utf-8')
+    raw_headers = [
+        (b'content-type', b'application/json'),
+        (b'content-length', str(len(body)).encode('latin-1')),
+        (b'access-control-allow-origin', b'*')
+    ]
+    raw_headers += [(key.lower().encode('latin-1'), str(value).encode('latin-1')) for key, value in (headers or {}).items()]
+    await send({'type': 'http.response.start', 'status': status, 'headers': raw_headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def wait_for_disconnect(receive):
+    # Any leftover (empty) request messages come first
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def stream_session_events(session_id, receive, send):
+    """/events/<session_id> as a native stream, so idle subscribers hold no thread; inference threads wake it."""
+    loop = asyncio.get_running_loop()
+    ready = asyncio.Event()
+    pending = [fusion.latest(session_id)]
+    if pending[0] is not None:
+        ready.set()
+
+    def deliver(report):
+        pending[0] = report
+        loop.call_soon_threadsafe(ready.set)
+
+    token = fusion.subscribe(session_id, deliver)
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+            (b'access-control-allow-origin', b'*')
+        ]})
+        await send({'type': 'http.response.body', 'body': SSE_PREAMBLE.encode(), 'more_body': True})
+        while not disconnected.done():
+            woken = asyncio.ensure_future(ready.wait())
+            await asyncio.wait({woken, disconnected}, timeout=SSE_KEEPALIVE_SECONDS, return_when=asyncio.FIRST_COMPLETED)
+            woken.cancel()
+            if disconnected.done():
+                break
+            if ready.is_set():
+                ready.clear()
+                chunk = sse_event(pending[0])
+            else:
+                chunk = SSE_KEEPALIVE
+            await send({'type': 'http.response.body', 'body': chunk.encode(), 'more_body': True})
+    finally:
+        disconnected.cancel()
+        fusion.unsubscribe(session_id, token)
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def http_app(scope, receive, send):
+    if scope['type'] != 'http':
+        return
+
+    if scope['path'].startswith('/events/') and scope['method'] == 'GET':
+        session_id = scope['path'][len('/events/'):]
+        token = parse_qs(scope['query_string'].decode('latin-1')).get('token', [None])[0]
+        if not events_authorized(session_id, token):
+            await send_json(send, 403, {'success': False, 'error': 'Invalid or missing events token'})
+            return
+        await stream_session_events(session_id, receive, send)
+        return
+
+    if scope['path'] not in INFERENCE_ROUTES or scope['method'] != 'POST':
+        await other_wsgi(scope, receive, send)
+        return
+
+    started = time.perf_counter()
+    try:
+        admitted = inference.admit()
+    except PoolSaturated as e:
+        await send_json(send, 503, {'success': False, 'error': str(e)}, headers={'Retry-After': e.retry_after})
+        record_request(scope['path'], scope['method'], 503, time.perf_counter() - started)
+        return
+    try:
+        await inference_wsgi(scope, receive, send)
+    finally:
+        inference.release(admitted)
+
+
+# ---------------------------------------------------------------------------
+# Socket.IO (same events as app_emotion.py)
+# ---------------------------------------------------------------------------
+
+# FAD_MESSAGE_QUEUE / FAD_SOCKETIO_TRANSPORTS as in app_emotion.py
+sio_options = {}
+if socketio_transports():
+    sio_options['transports'] = socketio_transports()
+
+sio = socketio.AsyncServer(
+    async_mode='asgi',
+    cors_allowed_origins='*',
+    ping_timeout=60,
+    ping_interval=25,
+    max_http_buffer_size=1e8,
+    client_manager=create_client_manager(async_mode=True),
+    **sio_options
+)
+
+frame_scheduler = FrameScheduler(max_fps=MAX_CLIENT_FPS)
+metrics.register_stats('frame_scheduler', frame_scheduler.stats,
+                       counters=('received', 'dispatched', 'dropped'), gauges=('clients_waiting', 'in_flight'))
+frames_ready = None  # asyncio.Event, created on the server's loop by ensure_frame_workers
+frame_workers_started = False
+# Store calls may hit Redis, so they run off the event loop
+client_sessions = AnalysisSessions()
+
+health_sections.update(
+    inference=inference.stats,
+    frame_scheduler=frame_scheduler.stats,
+    connected_clients=client_sessions.local_count
+)
+
+
+def ensure_frame_workers():
+    global frame_workers_started, frames_ready
+    if frame_workers_started:
+        return
+    frames_ready = asyncio.Event()
+    for _ in range(FRAME_WORKERS):
+        sio.start_background_task(process_scheduled_frames)
+    frame_workers_started = True
+
+
+async def process_scheduled_frames():
+    """Analyze queued frames on inference threads, one client at a time."""
+    while True:
+        sid, message, queued_seconds = frame_scheduler.next_frame()
+        if sid is None:
+            if queued_seconds is None:
+                # Nothing pending; video_frame wakes us up
+                frames_ready.clear()
+                await frames_ready.wait()
+            else:
+                await asyncio.sleep(queued_seconds)
+            continue
+
+        try:
+            # The scheduler hands out one frame per client at a time, so frames bypass the HTTP admission cap
+            event, payload = await inference.run(
+                emotion_api.analyze_frame, client_sessions, frame_scheduler, sid, message, queued_seconds,
+                bounded=False, profile=('socketio', 'video_frame')
+            )
+            with stage('emit'):
+                await sio.emit(event, payload, to=sid)
+        finally:
+            frame_scheduler.done(sid)
+            # The client's next frame (if one arrived meanwhile) may now be handed out
+            frames_ready.set()
+
+
+@sio.event
+async def connect(sid, environ, auth=None):
+    event, payload = await asyncio.to_thread(emotion_api.connect, client_sessions, sid, auth)
+    await sio.emit(event, payload, to=sid)
+
+
+@sio.event
+async def disconnect(sid, *args):
+    frame_scheduler.remove(sid)
+    await asyncio.to_thread(client_sessions.remove, sid)
+    engine.end_session(sid)
+    logger.info(f'Client disconnected: {sid}')
+
+
+@sio.on('start_analysis')
+async def start_analysis(sid, options=None):
+    event, payload = await asyncio.to_thread(emotion_api.start_analysis, client_sessions, sid, options,
+                                             TRACK_DETECT_EVERY)
+    await sio.emit(event, payload, to=sid)
+
+
+@sio.on('video_frame')
+async def video_frame(sid, data):
+    """Queue a frame (latest wins) and wake a frame worker; a frame_id is echoed on its result."""
+    try:
+        frame_scheduler.offer(sid, emotion_api.frame_message(data))
+        ensure_frame_workers()
+        frames_ready.set()
+    except Exception as e:
+        error_msg = f'Error queueing video frame: {str(e)}'
+        logger.error(error_msg)
+        await sio.emit('analysis_error', {'error': error_msg}, to=sid)
+
+
+def shutdown():
+    inference.executor.shutdown(wait=False)
+    other_wsgi.executor.shutdown(wait=False)
+
+
+application = socketio.ASGIApp(sio, other_asgi_app=http_app, on_shutdown=shutdown)
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(application, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
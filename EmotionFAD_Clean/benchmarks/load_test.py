@@ -0,0 +1,651 @@
+"""
+EmotionFAD - Load Test
+Simulated webcam clients and text chatters against a local server, for sizing workers and checking scheduler changes
+
+Usage:
+    python benchmarks/load_test.py --server app_emotion --webcams 20 --fps 5 --duration 60
+    python benchmarks/load_test.py --server app --transport http --webcams 8 --chatters 20 -o load.json
+    python benchmarks/load_test.py --url http://127.0.0.1:5000 --server-pid 4242 --webcams 10
+
+The server is started with FAD_MODEL_BACKEND=stub (see model_stubs.py), so
+every analysis costs a fixed, configurable time and the numbers measure the
+serving path (queues, workers, transport) rather than model speed; pass
+--real-models to load FER/DeepFace instead. Webcam clients send frames at a
+fixed rate over Socket.IO (video_frame, results matched back by frame_id) or
+HTTP; chatters post to /analyze/text. The report has end-to-end latency
+distributions, queueing delay, dropped frames and the server's CPU and memory
+sampled from /proc (the server process plus its children).
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+import requests  # noqa: E402
+
+import synthetic  # noqa: E402
+from run_benchmarks import environment_info, percentile  # noqa: E402
+
+# How each server is started (it reads PORT), how webcams reach it by default, and its endpoints
+SERVERS = {
+    'app': {
+        'command': [sys.executable, '-c', "import os; from app import app; "
+                    "app.run(host='127.0.0.1', port=int(os.environ['PORT']), threaded=True)"],
+        'transport': 'http', 'facial_path': '/analyze/facial', 'text_path': '/analyze/text'
+    },
+    'app_emotion': {
+        'command': [sys.executable, '-c', "import eventlet; eventlet.monkey_patch(); import os; "
+                    "from app_emotion import app, socketio; "
+                    "socketio.run(app, host='127.0.0.1', port=int(os.environ['PORT']), log_output=False)"],
+        'transport': 'socketio', 'facial_path': '/api/analyze', 'text_path': None
+    },
+    'asgi': {
+        'command': [sys.executable, '-m', 'uvicorn', 'asgi:application', '--host', '127.0.0.1',
+                    '--port', '{port}', '--log-level', 'warning'],
+        'transport': 'socketio', 'facial_path': '/analyze/facial', 'text_path': '/analyze/text'
+    },
+    'gunicorn': {
+        'command': [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+                    '--bind', '127.0.0.1:{port}', 'wsgi:application'],
+        'transport': 'socketio', 'facial_path': '/api/analyze', 'text_path': None
+    }
+}
+
+
+# ---------------------------------------------------------------------------
+# Server process
+# ---------------------------------------------------------------------------
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(name, port, env, log_path):
+    """Start a server preset from the repository root; its output goes to log_path."""
+    command = [part.replace('{port}', str(port)) for part in SERVERS[name]['command']]
+    log = open(log_path, 'w', encoding='utf-8')
+    proc = subprocess.Popen(command, cwd=ROOT_DIR, env=dict(env, PORT=str(port)),
+                            stdout=log, stderr=subprocess.STDOUT)
+    log.close()
+    return proc
+
+
+def wait_until_healthy(base_url, proc, timeout):
+    """Poll /health until it answers 200; returns the health JSON."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f'server exited with code {proc.returncode}')
+        try:
+            response = requests.get(f'{base_url}/health', timeout=2)
+            if response.status_code == 200:
+                return response.json()
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f'server not healthy after {timeout:.0f}s')
+
+
+def stop_server(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def fetch_health(base_url):
+    try:
+        return requests.get(f'{base_url}/health', timeout=5).json()
+    except (requests.RequestException, ValueError):
+        return None
+
+
+class ResourceSampler(threading.Thread):
+    """Samples CPU and RSS of a process and all its descendants from /proc (Linux only)."""
+
+    def __init__(self, pid, interval=0.5):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._stop_event = threading.Event()
+        self._ticks_per_second = os.sysconf('SC_CLK_TCK')
+        self._page_mb = os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+    @staticmethod
+    def available():
+        return os.path.exists('/proc/self/stat')
+
+    def _process_tree(self):
+        parents = {}
+        for entry in os.listdir('/proc'):
+            if entry.isdigit():
+                try:
+                    with open(f'/proc/{entry}/stat') as f:
+                        # The command name may contain spaces; fields after it are fixed
+                        parents[int(entry)] = int(f.read().rsplit(')', 1)[1].split()[1])
+                except (OSError, IndexError, ValueError):
+                    continue
+        tree = {self.pid}
+        added = True
+        while added:
+            added = False
+            for pid, ppid in parents.items():
+                if ppid in tree and pid not in tree:
+                    tree.add(pid)
+                    added = True
+        return tree
+
+    def _read(self):
+        ticks = 0
+        rss_pages = 0
+        processes = 0
+        for pid in self._process_tree():
+            try:
+                with open(f'/proc/{pid}/stat') as f:
+                    fields = f.read().rsplit(')', 1)[1].split()
+                with open(f'/proc/{pid}/statm') as f:
+                    rss_pages += int(f.read().split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            # utime and stime
+            ticks += int(fields[11]) + int(fields[12])
+            processes += 1
+        return ticks, rss_pages * self._page_mb, processes
+
+    def run(self):
+        last_ticks, _, _ = self._read()
+        last_time = time.monotonic()
+        while not self._stop_event.wait(self.interval):
+            ticks, rss_mb, processes = self._read()
+            now = time.monotonic()
+            cpu = 100.0 * (ticks - last_ticks) / self._ticks_per_second / (now - last_time)
+            self.samples.append((now, max(cpu, 0.0), rss_mb, processes))
+            last_ticks, last_time = ticks, now
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def summary(self, since):
+        samples = [sample for sample in self.samples if sample[0] >= since]
+        if not samples:
+            return None
+        cpu = [sample[1] for sample in samples]
+        rss = [sample[2] for sample in samples]
+        return {
+            'samples': len(samples),
+            'processes': max(sample[3] for sample in samples),
+            'cpu_percent': distribution(cpu),
+            'rss_mb': distribution(rss)
+        }
+
+
+# ---------------------------------------------------------------------------
+# Results
+# ---------------------------------------------------------------------------
+
+def distribution(values):
+    if not values:
+        return None
+    values = sorted(values)
+    return {
+        'count': len(values),
+        'p50': round(percentile(values, 0.50), 2),
+        'p90': round(percentile(values, 0.90), 2),
+        'p95': round(percentile(values, 0.95), 2),
+        'p99': round(percentile(values, 0.99), 2),
+        'mean': round(sum(values) / len(values), 2),
+        'max': round(values[-1], 2)
+    }
+
+
+class Collector:
+    """Thread-safe tallies; anything sent before measure_from (the warm-up) is left out."""
+
+    def __init__(self, measure_from):
+        self.measure_from = measure_from
+        self.latency_ms = {'webcam': [], 'text': []}
+        self.queued_ms = []
+        self.counts = {'webcam': {}, 'text': {}}
+        self.server_dropped = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def count(self, kind, key, sent_at, amount=1):
+        if sent_at < self.measure_from:
+            return
+        with self._lock:
+            self.counts[kind][key] = self.counts[kind].get(key, 0) + amount
+
+    def completed(self, kind, sent_at, latency_seconds, queued_ms=None):
+        if sent_at < self.measure_from:
+            return
+        with self._lock:
+            self.counts[kind]['completed'] = self.counts[kind].get('completed', 0) + 1
+            self.latency_ms[kind].append(latency_seconds * 1000)
+            if queued_ms is not None:
+                self.queued_ms.append(queued_ms)
+
+    def error(self, kind, message):
+        with self._lock:
+            key = f'{kind}: {message}'[:200]
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+    def report_dropped(self, client, dropped):
+        with self._lock:
+            self.server_dropped[client] = max(self.server_dropped.get(client, 0), dropped)
+
+
+def sleep_until(moment):
+    delay = moment - time.perf_counter()
+    if delay > 0:
+        time.sleep(delay)
+
+
+# ---------------------------------------------------------------------------
+# Simulated clients
+# ---------------------------------------------------------------------------
+
+def socketio_webcam(index, base_url, frames, args, collector, start_at, stop_at):
+    """One browser tab streaming video_frame events at args.fps.
+
+    A frame whose result never arrives because a newer frame replaced it on
+    the server counts as dropped; frames still unanswered when the drain
+    time runs out count as unanswered.
+    """
+    import socketio
+
+    sent = {}
+    lock = threading.Lock()
+    last_result = threading.Event()
+    last_id = [None]
+    client = socketio.Client(reconnection=False)
+
+    @client.on('analysis_result')
+    def on_result(result):
+        received = time.perf_counter()
+        frame_id = result.get('frame_id')
+        if frame_id is None:
+            collector.error('webcam', 'result without frame_id (server too old?)')
+            return
+        with lock:
+            superseded = [fid for fid in sent if fid < frame_id]
+            superseded_at = [sent.pop(fid) for fid in superseded]
+            sent_at = sent.pop(frame_id, None)
+        for at in superseded_at:
+            collector.count('webcam', 'dropped', at)
+        if sent_at is not None:
+            collector.completed('webcam', sent_at, received - sent_at, result.get('queued_ms'))
+            if result.get('status') == 'error':
+                collector.count('webcam', 'failed', sent_at)
+                collector.error('webcam', result.get('message', 'analysis error'))
+        collector.report_dropped(index, result.get('frames_dropped', 0))
+        if frame_id == last_id[0]:
+            last_result.set()
+
+    @client.on('analysis_error')
+    def on_error(data):
+        collector.error('webcam', data.get('error', 'analysis_error'))
+
+    sleep_until(start_at)
+    try:
+        client.connect(base_url, auth={'frame_formats': [args.frame_format]},
+                       transports=[args.socketio_transport], wait_timeout=args.timeout)
+        options = {'detector': args.detector} if args.detector else {}
+        client.emit('start_analysis', options)
+    except Exception as e:
+        collector.error('webcam', f'connect failed: {e}')
+        return
+
+    interval = 1.0 / args.fps
+    next_at = time.perf_counter()
+    frame_id = 0
+    try:
+        while next_at < stop_at:
+            sleep_until(next_at)
+            payload = frames[(index + frame_id) % len(frames)]
+            now = time.perf_counter()
+            with lock:
+                sent[frame_id] = now
+            last_id[0] = frame_id
+            client.emit('video_frame', {'frame': payload, 'frame_id': frame_id})
+            collector.count('webcam', 'sent', now)
+            frame_id += 1
+            next_at += interval
+        last_result.wait(args.drain)
+    except Exception as e:
+        collector.error('webcam', f'send failed: {e}')
+    finally:
+        with lock:
+            leftover = list(sent.values())
+        for at in leftover:
+            collector.count('webcam', 'unanswered', at)
+        client.disconnect()
+
+
+def http_webcam(index, base_url, frames, args, collector, start_at, stop_at):
+    """One client posting frames at args.fps, waiting for each response like the web page does.
+
+    Frame slots that pass while a request is still in flight are skipped
+    and counted as dropped.
+    """
+    session = requests.Session()
+    url = base_url + args.facial_path
+    session_id = f'load-{index}'
+    interval = 1.0 / args.fps
+    next_at = start_at
+    frame_id = 0
+    while next_at < stop_at:
+        sleep_until(next_at)
+        sent_at = time.perf_counter()
+        collector.count('webcam', 'sent', sent_at)
+        payload = {'image': frames[(index + frame_id) % len(frames)], 'session_id': session_id}
+        if args.detector:
+            payload['detector'] = args.detector
+        try:
+            response = session.post(url, json=payload, timeout=args.timeout)
+            received = time.perf_counter()
+            if response.status_code == 503:
+                collector.count('webcam', 'rejected', sent_at)
+            elif response.status_code != 200:
+                collector.count('webcam', 'failed', sent_at)
+                collector.error('webcam', f'HTTP {response.status_code}')
+            else:
+                collector.completed('webcam', sent_at, received - sent_at)
+                result = response.json()
+                if result.get('success') is False or result.get('status') == 'error':
+                    collector.count('webcam', 'failed', sent_at)
+                    collector.error('webcam', result.get('error') or result.get('message') or 'analysis error')
+        except (requests.RequestException, ValueError) as e:
+            received = time.perf_counter()
+            collector.count('webcam', 'failed', sent_at)
+            collector.error('webcam', type(e).__name__)
+        frame_id += 1
+        next_at += interval
+        while next_at < received and next_at < stop_at:
+            collector.count('webcam', 'dropped', next_at)
+            next_at += interval
+
+
+def text_chatter(index, base_url, texts, args, collector, start_at, stop_at):
+    """One user sending a chat message every 1/args.chat_rate seconds (sharing a session with webcam index)."""
+    session = requests.Session()
+    url = base_url + args.text_path
+    session_id = f'load-{index}'
+    interval = 1.0 / args.chat_rate
+    # Offset the chatters so they don't all post on the same tick
+    next_at = start_at + interval * (index % 10) / 10
+    message = 0
+    while next_at < stop_at:
+        sleep_until(next_at)
+        sent_at = time.perf_counter()
+        collector.count('text', 'sent', sent_at)
+        try:
+            response = session.post(url, json={'text': texts[(index + message) % len(texts)],
+                                               'session_id': session_id}, timeout=args.timeout)
+            received = time.perf_counter()
+            if response.status_code == 200:
+                collector.completed('text', sent_at, received - sent_at)
+            else:
+                collector.count('text', 'failed', sent_at)
+                collector.error('text', f'HTTP {response.status_code}')
+        except requests.RequestException as e:
+            received = time.perf_counter()
+            collector.count('text', 'failed', sent_at)
+            collector.error('text', type(e).__name__)
+        message += 1
+        next_at = max(next_at + interval, received)
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def build_frames(args):
+    """Distinct synthetic webcam frames, encoded as the clients will send them."""
+    width, height = (int(v) for v in args.resolution.lower().split('x'))
+    frames = []
+    for seed in range(args.seed, args.seed + args.distinct_frames):
+        data = synthetic.encode_image(synthetic.face_image(width, height, seed), '.jpg', args.quality)
+        use_binary = args.transport == 'socketio' and args.frame_format == 'binary'
+        frames.append(data if use_binary else synthetic.data_url(data))
+    return frames
+
+
+def server_env(args):
+    env = dict(os.environ)
+    if not args.real_models:
+        env.update({
+            'FAD_MODEL_BACKEND': 'stub',
+            'FAD_STUB_LATENCY_MS': str(args.stub_latency_ms),
+            'FAD_STUB_PER_FACE_MS': str(args.stub_per_face_ms),
+            'FAD_STUB_BUSY': '1' if args.stub_busy else '0'
+        })
+    if not args.with_caches:
+        env.update({'FAD_FRAME_CACHE_SIZE': '0', 'FAD_TEXT_CACHE_SIZE': '0'})
+    for item in args.server_env:
+        name, _, value = item.partition('=')
+        env[name] = value
+    return env
+
+
+def run_load(args, base_url, pid):
+    frames = build_frames(args) if args.webcams else []
+    texts = [synthetic.sample_text(args.text_words, seed=args.seed + i) for i in range(50)]
+
+    sampler = None
+    if pid and ResourceSampler.available():
+        sampler = ResourceSampler(pid, interval=args.sample_interval)
+        sampler.start()
+
+    start = time.perf_counter() + 0.5
+    measure_from = start + args.warmup
+    stop_at = measure_from + args.duration
+    collector = Collector(measure_from)
+    measure_from_monotonic = time.monotonic() + (measure_from - time.perf_counter())
+
+    webcam = socketio_webcam if args.transport == 'socketio' else http_webcam
+    threads = []
+    for index in range(args.webcams):
+        # Clients join spread over the warm-up, like a room filling up
+        start_at = start + args.warmup * index / max(args.webcams, 1)
+        threads.append(threading.Thread(target=webcam, daemon=True,
+                                        args=(index, base_url, frames, args, collector, start_at, stop_at)))
+    for index in range(args.chatters):
+        start_at = start + args.warmup * index / max(args.chatters, 1)
+        threads.append(threading.Thread(target=text_chatter, daemon=True,
+                                        args=(index, base_url, texts, args, collector, start_at, stop_at)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(args.warmup + args.duration + args.drain + args.timeout + 5)
+
+    health = fetch_health(base_url)
+    resources = None
+    if sampler is not None:
+        sampler.stop()
+        resources = sampler.summary(measure_from_monotonic)
+
+    webcam_counts = collector.counts['webcam']
+    text_counts = collector.counts['text']
+    results = {
+        'webcam': None,
+        'text': None,
+        'server': {'pid': pid, 'resources': resources, 'health': health},
+        'errors': collector.errors
+    }
+    if args.webcams:
+        sent = webcam_counts.get('sent', 0)
+        dropped = webcam_counts.get('dropped', 0)
+        results['webcam'] = {
+            'clients': args.webcams,
+            'transport': args.transport,
+            'target_fps': args.fps,
+            'sent': sent,
+            'completed': webcam_counts.get('completed', 0),
+            'dropped': dropped,
+            'drop_rate': round(dropped / sent, 4) if sent else None,
+            'unanswered': webcam_counts.get('unanswered', 0),
+            'rejected': webcam_counts.get('rejected', 0),
+            'failed': webcam_counts.get('failed', 0),
+            'server_frames_dropped': sum(collector.server_dropped.values()) if collector.server_dropped else None,
+            'achieved_fps_per_client': round(webcam_counts.get('completed', 0) / args.duration / args.webcams, 2),
+            'latency_ms': distribution(collector.latency_ms['webcam']),
+            'queued_ms': distribution(collector.queued_ms)
+        }
+    if args.chatters:
+        results['text'] = {
+            'clients': args.chatters,
+            'target_rate_per_client': args.chat_rate,
+            'sent': text_counts.get('sent', 0),
+            'completed': text_counts.get('completed', 0),
+            'failed': text_counts.get('failed', 0),
+            'throughput_per_s': round(text_counts.get('completed', 0) / args.duration, 2),
+            'latency_ms': distribution(collector.latency_ms['text'])
+        }
+    return results
+
+
+def print_summary(results, out=sys.stderr):
+    webcam = results['webcam']
+    if webcam:
+        latency = webcam['latency_ms'] or {}
+        queued = webcam['queued_ms'] or {}
+        print(f"📹 webcam: {webcam['completed']}/{webcam['sent']} frames analyzed, {webcam['dropped']} dropped "
+              f"({webcam['drop_rate'] or 0:.1%}), {webcam['achieved_fps_per_client']} fps/client", file=out)
+        print(f"   latency p50 {latency.get('p50')} ms  p95 {latency.get('p95')} ms  p99 {latency.get('p99')} ms"
+              + (f"   queued p50 {queued.get('p50')} ms  p95 {queued.get('p95')} ms" if queued else ''), file=out)
+    text = results['text']
+    if text:
+        latency = text['latency_ms'] or {}
+        print(f"💬 text: {text['completed']}/{text['sent']} messages, {text['throughput_per_s']}/s, "
+              f"latency p50 {latency.get('p50')} ms  p99 {latency.get('p99')} ms", file=out)
+    resources = results['server']['resources']
+    if resources:
+        print(f"🖥️  server: CPU p50 {resources['cpu_percent']['p50']}%  max {resources['cpu_percent']['max']}%  "
+              f"RSS max {resources['rss_mb']['max']} MB ({resources['processes']} processes)", file=out)
+    for message, count in results['errors'].items():
+        print(f"⚠️  {count}× {message}", file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test an EmotionFAD server with simulated clients.')
+    target = parser.add_argument_group('server')
+    target.add_argument('--server', choices=sorted(SERVERS), default='app_emotion',
+                        help='Server to start locally (default: app_emotion)')
+    target.add_argument('--url', help='Test an already running server instead of starting one')
+    target.add_argument('--server-pid', type=int, help='With --url: process to sample CPU/memory from')
+    target.add_argument('--port', type=int, help='Port for the started server (default: a free port)')
+    target.add_argument('--server-env', action='append', default=[], metavar='NAME=VALUE',
+                        help='Extra environment for the started server, e.g. FAD_FRAME_WORKERS=4 (repeatable)')
+    target.add_argument('--server-log', help='Keep the started server\'s output here')
+    target.add_argument('--startup-timeout', type=float, default=120, help='Seconds to wait for /health (default: 120)')
+    target.add_argument('--real-models', action='store_true', help='Use FER/DeepFace instead of the model stub')
+    target.add_argument('--stub-latency-ms', type=float, default=40, help='Stub cost per model call (default: 40)')
+    target.add_argument('--stub-per-face-ms', type=float, default=5, help='Stub cost per face (default: 5)')
+    target.add_argument('--stub-busy', action='store_true', help='Stub burns CPU instead of sleeping')
+    target.add_argument('--with-caches', action='store_true', help='Keep the frame and text result caches enabled')
+
+    load = parser.add_argument_group('load')
+    load.add_argument('--webcams', type=int, default=10, help='Concurrent webcam clients (default: 10)')
+    load.add_argument('--fps', type=float, default=5, help='Frames per second per webcam (default: 5)')
+    load.add_argument('--transport', choices=('socketio', 'http'), help='How webcams send frames (default: per server)')
+    load.add_argument('--socketio-transport', choices=('websocket', 'polling'), default='websocket',
+                      help='Engine.IO transport for Socket.IO webcams (default: websocket)')
+    load.add_argument('--frame-format', choices=('base64', 'binary'), default='binary',
+                      help='Socket.IO frame encoding (default: binary)')
+    load.add_argument('--resolution', default='640x480', help='Frame size (default: 640x480)')
+    load.add_argument('--quality', type=int, default=80, help='JPEG quality of the frames (default: 80)')
+    load.add_argument('--distinct-frames', type=int, default=8, help='Different frames each webcam cycles through')
+    load.add_argument('--detector', help='Face detector to request (default: the server\'s)')
+    load.add_argument('--chatters', type=int, default=0, help='Concurrent text chatters (default: 0)')
+    load.add_argument('--chat-rate', type=float, default=0.5, help='Messages per second per chatter (default: 0.5)')
+    load.add_argument('--text-words', type=int, default=30, help='Words per chat message (default: 30)')
+    load.add_argument('--duration', type=float, default=30, help='Measured seconds (default: 30)')
+    load.add_argument('--warmup', type=float, default=5, help='Unmeasured seconds while clients join (default: 5)')
+    load.add_argument('--drain', type=float, default=5, help='Seconds to wait for outstanding results (default: 5)')
+    load.add_argument('--timeout', type=float, default=30, help='Request and connect timeout (default: 30)')
+    load.add_argument('--sample-interval', type=float, default=0.5, help='Server CPU/memory sampling period')
+    load.add_argument('--seed', type=int, default=0, help='Seed for the synthetic frames and texts (default: 0)')
+    parser.add_argument('-o', '--output', help='Write results JSON here (default: stdout)')
+    args = parser.parse_args()
+
+    preset = SERVERS[args.server]
+    args.transport = args.transport or preset['transport']
+    args.facial_path = preset['facial_path']
+    args.text_path = preset['text_path']
+    if args.chatters and not args.text_path:
+        parser.error(f'{args.server} has no text endpoint; use --server app or asgi for --chatters')
+    if args.webcams and args.fps <= 0 or args.chatters and args.chat_rate <= 0:
+        parser.error('--fps and --chat-rate must be positive')
+
+    proc = None
+    log_path = args.server_log
+    if args.url:
+        base_url = args.url.rstrip('/')
+        pid = args.server_pid
+        startup = wait_until_healthy(base_url, None, args.startup_timeout)
+    else:
+        port = args.port or free_port()
+        base_url = f'http://127.0.0.1:{port}'
+        if log_path is None:
+            log_path = os.path.join(tempfile.gettempdir(), f'emotionfad-load-{port}.log')
+        print(f'🚀 Starting {args.server} on port {port} (log: {log_path})...', file=sys.stderr)
+        proc = start_server(args.server, port, server_env(args), log_path)
+        pid = proc.pid
+        try:
+            startup = wait_until_healthy(base_url, proc, args.startup_timeout)
+        except RuntimeError as e:
+            print(f'❌ {e}; see {log_path}', file=sys.stderr)
+            stop_server(proc)
+            return 1
+
+    backend = startup.get('model_backend', 'unknown')
+    print(f'⏱️  {args.webcams} webcams @ {args.fps} fps ({args.transport}), {args.chatters} chatters, '
+          f'{args.duration:.0f}s after {args.warmup:.0f}s warm-up, model backend: {backend}', file=sys.stderr)
+    try:
+        results = run_load(args, base_url, pid)
+    finally:
+        if proc is not None:
+            stop_server(proc)
+
+    settings = {key: value for key, value in vars(args).items() if key not in ('output',)}
+    report = {
+        'suite': 'emotionfad-load',
+        'created': datetime.now().isoformat(),
+        'settings': settings,
+        'environment': environment_info(),
+        'model_backend': backend,
+        'server_log': log_path,
+        **results
+    }
+    print_summary(results)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+        print(f'✅ Results written to {args.output}', file=sys.stderr)
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
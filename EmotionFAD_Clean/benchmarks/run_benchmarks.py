@@ -0,0 +1,401 @@
+"""
+EmotionFAD - Benchmark Suite
+Offline latency, throughput and memory benchmarks for the analysis hot paths
+
+Usage:
+    python benchmarks/run_benchmarks.py -o results.json
+    python benchmarks/run_benchmarks.py --only text,decode --quick
+    python benchmarks/run_benchmarks.py --baseline baseline.json --fail-on-regression
+
+Every benchmark runs in its own child process so its peak RSS is its own.
+Inputs are synthetic (see synthetic.py) and seeded, and the frame/text caches
+are disabled unless --with-caches is given, so repeated runs measure the same
+work. Benchmarks whose models are not installed are reported as skipped.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import synthetic  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCHMARKS = {}
+
+TEXT_LENGTHS = {'short': 20, 'medium': 200, 'long': 2000}
+KEYWORD_LIST_SIZES = (30, 300, 3000)
+
+
+def benchmark(name, iterations=100):
+    """Register setup(seed) -> zero-argument callable to time."""
+    def decorator(setup):
+        BENCHMARKS[name] = (setup, iterations)
+        return setup
+    return decorator
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks
+# ---------------------------------------------------------------------------
+
+def _frame_data_url(width, height, seed):
+    return synthetic.data_url(synthetic.encode_image(synthetic.face_image(width, height, seed)))
+
+
+def _emotion_analyzer():
+    from emotion_analysis import EmotionAnalyzer
+    analyzer = EmotionAnalyzer()
+    analyzer.warm_up()
+    return analyzer
+
+
+def _fraud_detection_system():
+    from fraud_detection import FraudDetectionSystem
+    return FraudDetectionSystem()
+
+
+@benchmark('decode.base64_720p', iterations=200)
+def bench_decode_720p(seed):
+    from image_ingest import ImageDecoder
+    decoder = ImageDecoder(max_side=960)
+    data = _frame_data_url(1280, 720, seed)
+    return lambda: decoder.decode(data)
+
+
+@benchmark('decode.base64_1080p', iterations=100)
+def bench_decode_1080p(seed):
+    from image_ingest import ImageDecoder
+    decoder = ImageDecoder(max_side=960)
+    data = _frame_data_url(1920, 1080, seed)
+    return lambda: decoder.decode(data)
+
+
+@benchmark('frame.process_frame_fer', iterations=20)
+def bench_process_frame(seed):
+    analyzer = _emotion_analyzer()
+    data = _frame_data_url(1280, 720, seed)
+    return lambda: analyzer.process_frame(data)
+
+
+@benchmark('facial.analyze_emotions_fer', iterations=20)
+def bench_analyze_emotions(seed):
+    analyzer = _emotion_analyzer()
+    image = analyzer.decode_frame(_frame_data_url(1280, 720, seed))
+    return lambda: analyzer.analyze_emotions(image)
+
+
+@benchmark('facial.analyze_facial_expression_deepface', iterations=20)
+def bench_analyze_facial_expression(seed):
+    fds = _fraud_detection_system()
+    fds.warm_up()
+    data = _frame_data_url(1280, 720, seed)
+    return lambda: fds.analyze_facial_expression(data)
+
+
+@benchmark('facial.detect_face_haar', iterations=100)
+def bench_detect_face(seed):
+    from face_detectors import FaceDetectorSet
+    detectors = FaceDetectorSet()
+    image = synthetic.face_image(960, 540, seed)
+    return lambda: detectors.detect('haar', image)
+
+
+def _bench_draw_boxes(seed, format, quality, scale):
+    from emotion_analysis import EmotionAnalyzer
+    # draw_boxes only renders and encodes; skip loading the models
+    analyzer = EmotionAnalyzer.__new__(EmotionAnalyzer)
+    image = synthetic.face_image(960, 540, seed)
+    faces = [{'box': {'x': 380, 'y': 160, 'w': 200, 'h': 220}, 'dominant_emotion': 'neutral', 'confidence': 0.87}]
+    return lambda: analyzer.draw_boxes(image, faces, format=format, quality=quality, scale=scale)
+
+
+benchmark('overlay.draw_boxes_jpeg_q75', iterations=100)(
+    lambda seed: _bench_draw_boxes(seed, 'jpeg', 75, 1.0))
+benchmark('overlay.draw_boxes_jpeg_q50_half', iterations=100)(
+    lambda seed: _bench_draw_boxes(seed, 'jpeg', 50, 0.5))
+benchmark('overlay.draw_boxes_webp_q50_half', iterations=100)(
+    lambda seed: _bench_draw_boxes(seed, 'webp', 50, 0.5))
+
+
+def _bench_text(seed, words, keyword_count):
+    import text_analysis
+    from fraud_matcher import FraudMatcher
+    fds = _fraud_detection_system()
+    keywords = list(text_analysis.FRAUD_KEYWORDS)
+    keywords += synthetic.synthetic_keywords(max(0, keyword_count - len(keywords)), seed)
+    fds.text.matcher = FraudMatcher(keywords, text_analysis.SUSPICIOUS_PATTERNS)
+    # A pool of distinct texts, so nothing benefits from repeating one input
+    texts = [synthetic.sample_text(words, seed=seed * 1000 + i) for i in range(64)]
+    state = {'i': 0}
+
+    def run():
+        state['i'] += 1
+        return fds.analyze_text_sentiment(texts[state['i'] % len(texts)])
+    return run
+
+
+for _length, _words in TEXT_LENGTHS.items():
+    for _keywords in KEYWORD_LIST_SIZES:
+        benchmark(f'text.{_length}_kw{_keywords}', iterations=50 if _length == 'long' else 200)(
+            lambda seed, words=_words, keywords=_keywords: _bench_text(seed, words, keywords))
+
+
+def _comprehensive_inputs(fds, seed):
+    from risk_scoring import score_emotions
+
+    emotions = synthetic.sample_emotions(seed)
+    facial = dict({
+        'success': True,
+        'emotions': emotions,
+        'dominant_emotion': max(emotions, key=emotions.get)
+    }, **score_emotions(emotions))
+    text = fds.analyze_text_sentiment(synthetic.sample_text(40, fraud_rate=0.2, seed=seed))
+    return facial, text
+
+
+@benchmark('report.comprehensive', iterations=2000)
+def bench_comprehensive(seed):
+    fds = _fraud_detection_system()
+    facial, text = _comprehensive_inputs(fds, seed)
+    return lambda: fds.generate_comprehensive_report(facial, text)
+
+
+@benchmark('report.comprehensive_session', iterations=2000)
+def bench_comprehensive_session(seed):
+    fds = _fraud_detection_system()
+    facial, text = _comprehensive_inputs(fds, seed)
+    for i in range(fds.session_data.capacity):
+        fds.track_session('bench', dict(facial, emotions=synthetic.sample_emotions(seed + i)))
+    return lambda: fds.generate_comprehensive_report(facial, text, session_id='bench')
+
+
+# ---------------------------------------------------------------------------
+# Measurement
+# ---------------------------------------------------------------------------
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, or None where unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def percentile(sorted_values, fraction):
+    """Linear-interpolated percentile of an already sorted list."""
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    position = (len(sorted_values) - 1) * fraction
+    low = int(position)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - low)
+
+
+def measure(name, iterations, warmup, seed):
+    """Set up and time one benchmark in this process."""
+    setup, _ = BENCHMARKS[name]
+    # The engines print a line per call; keep that out of the output (its cost stays in the timing)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        fn = setup(seed)
+        setup_rss = peak_rss_mb()
+        for _ in range(warmup):
+            fn()
+
+        samples = []
+        started = time.perf_counter()
+        for _ in range(iterations):
+            t0 = time.perf_counter_ns()
+            fn()
+            samples.append(time.perf_counter_ns() - t0)
+        elapsed = time.perf_counter() - started
+
+    samples_ms = sorted(sample / 1e6 for sample in samples)
+    return {
+        'iterations': iterations,
+        'p50_ms': round(percentile(samples_ms, 0.50), 4),
+        'p95_ms': round(percentile(samples_ms, 0.95), 4),
+        'p99_ms': round(percentile(samples_ms, 0.99), 4),
+        'mean_ms': round(sum(samples_ms) / len(samples_ms), 4),
+        'min_ms': round(samples_ms[0], 4),
+        'max_ms': round(samples_ms[-1], 4),
+        'throughput_per_s': round(iterations / elapsed, 2) if elapsed > 0 else None,
+        'setup_rss_mb': setup_rss,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def run_child(name, iterations, warmup, seed, env):
+    """Run one benchmark in a fresh interpreter; returns its result dict."""
+    command = [sys.executable, os.path.abspath(__file__), '--child', name,
+               '--iterations', str(iterations), '--warmup', str(warmup), '--seed', str(seed)]
+    proc = subprocess.run(command, capture_output=True, text=True, env=env)
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        error = (proc.stderr.strip().splitlines() or ['exit code %d' % proc.returncode])[-1]
+        return {'status': 'error', 'error': error}
+    return json.loads(lines[-1])
+
+
+def child_main(args):
+    try:
+        result = measure(args.child, args.iterations, args.warmup, args.seed)
+        result['status'] = 'ok'
+    except ImportError as e:
+        result = {'status': 'skipped', 'error': f'{type(e).__name__}: {str(e)}'}
+    print(json.dumps(result))
+
+
+def environment_info():
+    info = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count()
+    }
+    for module in ('numpy', 'cv2', 'PIL'):
+        try:
+            info[module] = __import__(module).__version__
+        except Exception:
+            info[module] = None
+    try:
+        info['git_commit'] = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=BENCH_DIR
+        ).stdout.strip() or None
+    except OSError:
+        info['git_commit'] = None
+    return info
+
+
+# ---------------------------------------------------------------------------
+# Baseline comparison
+# ---------------------------------------------------------------------------
+
+def compare(results, baseline, threshold, rss_threshold):
+    """Rows comparing p50/p95 latency and peak RSS with a saved run; flags regressions."""
+    rows = []
+    for name, current in results.items():
+        before = baseline.get('results', {}).get(name)
+        if current.get('status') != 'ok' or not before or before.get('status') != 'ok':
+            continue
+        p50_change = current['p50_ms'] / before['p50_ms'] - 1 if before['p50_ms'] else 0.0
+        p95_change = current['p95_ms'] / before['p95_ms'] - 1 if before['p95_ms'] else 0.0
+        rss_change = None
+        if current.get('peak_rss_mb') and before.get('peak_rss_mb'):
+            rss_change = current['peak_rss_mb'] / before['peak_rss_mb'] - 1
+        regressed = p50_change > threshold or (rss_change is not None and rss_change > rss_threshold)
+        rows.append({
+            'name': name,
+            'baseline_p50_ms': before['p50_ms'],
+            'p50_ms': current['p50_ms'],
+            'p50_change': round(p50_change, 4),
+            'p95_change': round(p95_change, 4),
+            'peak_rss_change': round(rss_change, 4) if rss_change is not None else None,
+            'regression': regressed
+        })
+    return rows
+
+
+def print_comparison(rows, out=sys.stderr):
+    print(f"{'benchmark':44} {'base p50':>10} {'p50':>10} {'Δp50':>8} {'Δp95':>8} {'ΔRSS':>8}", file=out)
+    for row in rows:
+        rss = f"{row['peak_rss_change']:+.1%}" if row['peak_rss_change'] is not None else '-'
+        flag = '  REGRESSION' if row['regression'] else ''
+        print(f"{row['name']:44} {row['baseline_p50_ms']:>10.3f} {row['p50_ms']:>10.3f} "
+              f"{row['p50_change']:>+8.1%} {row['p95_change']:>+8.1%} {rss:>8}{flag}", file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the EmotionFAD analysis hot paths.')
+    parser.add_argument('-o', '--output', help='Write results JSON here (default: stdout)')
+    parser.add_argument('--only', help='Comma-separated name prefixes to run (e.g. text,decode)')
+    parser.add_argument('--list', action='store_true', help='List benchmark names and exit')
+    parser.add_argument('--iterations', type=int, help='Timed iterations for every benchmark (default: per benchmark)')
+    parser.add_argument('--warmup', type=int, default=3, help='Untimed iterations first (default: 3)')
+    parser.add_argument('--quick', action='store_true', help='A fifth of the default iterations')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the synthetic inputs (default: 0)')
+    parser.add_argument('--with-caches', action='store_true', help='Keep the frame and text result caches enabled')
+    parser.add_argument('--baseline', help='Compare with a results JSON from an earlier run')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Allowed p50 slowdown vs baseline (default: 0.10)')
+    parser.add_argument('--rss-threshold', type=float, default=0.10, help='Allowed peak RSS growth vs baseline (default: 0.10)')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit with status 1 if anything regressed')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child_main(args)
+        return 0
+
+    names = sorted(BENCHMARKS)
+    if args.only:
+        prefixes = tuple(prefix.strip() for prefix in args.only.split(',') if prefix.strip())
+        names = [name for name in names if name.startswith(prefixes)]
+    if args.list:
+        print('\n'.join(names))
+        return 0
+
+    env = dict(os.environ)
+    if not args.with_caches:
+        env.update({'FAD_FRAME_CACHE_SIZE': '0', 'FAD_TEXT_CACHE_SIZE': '0'})
+
+    results = {}
+    for name in names:
+        iterations = args.iterations or BENCHMARKS[name][1]
+        if args.quick and not args.iterations:
+            iterations = max(5, iterations // 5)
+        print(f'⏱️  {name} ({iterations} iterations)...', file=sys.stderr)
+        results[name] = run_child(name, iterations, args.warmup, args.seed, env)
+        result = results[name]
+        if result['status'] == 'ok':
+            print(f"   p50 {result['p50_ms']:.3f} ms  p99 {result['p99_ms']:.3f} ms  "
+                  f"{result['throughput_per_s']}/s  peak RSS {result['peak_rss_mb']} MB", file=sys.stderr)
+        else:
+            print(f"   {result['status']}: {result['error']}", file=sys.stderr)
+
+    report = {
+        'suite': 'emotionfad',
+        'created': datetime.now().isoformat(),
+        'settings': {'seed': args.seed, 'warmup': args.warmup, 'caches': args.with_caches, 'quick': args.quick},
+        'environment': environment_info(),
+        'results': results
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            rows = compare(results, json.load(f), args.threshold, args.rss_threshold)
+        report['comparison'] = {'baseline': args.baseline, 'threshold': args.threshold,
+                                'rss_threshold': args.rss_threshold, 'rows': rows}
+        print_comparison(rows)
+        regressions = [row['name'] for row in rows if row['regression']]
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+        print(f'✅ Results written to {args.output}', file=sys.stderr)
+    else:
+        print(output)
+
+    if regressions:
+        print(f"❌ {len(regressions)} regression(s): {', '.join(regressions)}", file=sys.stderr)
+        if args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
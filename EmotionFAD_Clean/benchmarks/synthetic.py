@@ -0,0 +1,88 @@
+"""
+EmotionFAD - Synthetic Benchmark Inputs
+Deterministic images and texts generated locally, so benchmark runs need no datasets or network
+"""
+
+import base64
+import random
+
+import cv2
+import numpy as np
+
+VOCABULARY = (
+    'the account team called about your order and asked to confirm the delivery address '
+    'we will review the invoice tomorrow morning please let me know if the meeting time works '
+    'thanks for the update i checked the report and everything looks fine for next week '
+    'can you share the document with the client before friday so they have time to read it'
+).split()
+
+FRAUD_PHRASES = (
+    'send me money now', 'give us bitcoin', 'bank account details', 'urgent payment right now',
+    'keep quiet about this', 'guaranteed profit', 'act now', 'gift card', 'wire transfer'
+)
+
+
+def face_image(width=1280, height=720, seed=0):
+    """BGR frame with a drawn, shaded face on a noisy background (roughly what a webcam frame costs to process)."""
+    rng = np.random.default_rng(seed)
+    image = rng.integers(40, 90, size=(height, width, 3), dtype=np.uint8)
+    image = cv2.GaussianBlur(image, (0, 0), 3)
+
+    cx, cy = width // 2, height // 2
+    face_w, face_h = height // 5, height // 4
+    cv2.ellipse(image, (cx, cy), (face_w, face_h), 0, 0, 360, (140, 170, 210), -1)
+    for side in (-1, 1):
+        eye = (cx + side * face_w // 2, cy - face_h // 4)
+        cv2.ellipse(image, eye, (face_w // 5, face_h // 10), 0, 0, 360, (250, 250, 250), -1)
+        cv2.circle(image, eye, face_h // 14, (40, 30, 20), -1)
+        brow = (cx + side * face_w // 2, cy - face_h // 2 + face_h // 10)
+        cv2.ellipse(image, brow, (face_w // 4, face_h // 16), 0, 200, 340, (50, 40, 30), 4)
+    cv2.line(image, (cx, cy - face_h // 8), (cx, cy + face_h // 6), (110, 130, 170), 3)
+    cv2.ellipse(image, (cx, cy + face_h // 2 - face_h // 6), (face_w // 3, face_h // 10), 0, 10, 170, (60, 60, 150), 5)
+
+    noise = rng.normal(0, 6, size=image.shape)
+    return np.clip(image + noise, 0, 255).astype(np.uint8)
+
+
+def encode_image(image, extension='.jpg', quality=90):
+    """Encoded image bytes."""
+    flag = cv2.IMWRITE_WEBP_QUALITY if extension == '.webp' else cv2.IMWRITE_JPEG_QUALITY
+    ok, buffer = cv2.imencode(extension, image, [flag, quality])
+    if not ok:
+        raise ValueError(f'Could not encode {extension}')
+    return buffer.tobytes()
+
+
+def data_url(data, mimetype='image/jpeg'):
+    """Base64 data URL, as the browser sends frames."""
+    return f"data:{mimetype};base64,{base64.b64encode(data).decode('ascii')}"
+
+
+def sample_text(words, fraud_rate=0.05, seed=0):
+    """Chat-like text of about `words` words with fraud phrases mixed in at fraud_rate."""
+    rng = random.Random(seed)
+    out = []
+    while len(out) < words:
+        if rng.random() < fraud_rate:
+            out.extend(rng.choice(FRAUD_PHRASES).split())
+        else:
+            out.append(rng.choice(VOCABULARY))
+    return ' '.join(out[:words]).capitalize() + '.'
+
+
+def synthetic_keywords(count, seed=0):
+    """Made-up keywords to grow the keyword list without matching ordinary text."""
+    rng = random.Random(seed)
+    letters = 'bcdfghjklmnpqrstvwxz'
+    keywords = set()
+    while len(keywords) < count:
+        keywords.add(''.join(rng.choice(letters) for _ in range(rng.randint(5, 10))))
+    return sorted(keywords)
+
+
+def sample_emotions(seed=0):
+    """Random emotion percentages (summing to 100) in the model's label order."""
+    rng = np.random.default_rng(seed)
+    scores = rng.dirichlet(np.ones(7)) * 100
+    labels = ('angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral')
+    return dict(zip(labels, map(float, scores)))
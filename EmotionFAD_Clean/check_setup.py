@@ -27,6 +27,7 @@ for module in required:
 print("\nChecking files...")
 files = [
     'app.py',
+    'fraud_detection.py',
     'templates/index.html',
     'static/app.js',
     'requirements.txt'
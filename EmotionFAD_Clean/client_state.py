@@ -0,0 +1,217 @@
+"""
+EmotionFAD - Client State
+Per-connection state kept outside the worker process, so any worker behind the load balancer can read it
+"""
+
+import json
+import os
+import threading
+import time
+
+from face_tracker import FaceTracker
+
+
+class MemoryStateStore:
+    """Per-process store (one worker, or tests). State must be JSON-serializable, as with Redis."""
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self._states = {}
+        self._expires = {}
+        self._lock = threading.Lock()
+
+    def _expired(self, sid):
+        expires = self._expires.get(sid)
+        if expires is not None and expires < time.monotonic():
+            self._states.pop(sid, None)
+            self._expires.pop(sid, None)
+            return True
+        return False
+
+    def _touch(self, sid):
+        if self.ttl:
+            self._expires[sid] = time.monotonic() + self.ttl
+
+    def get(self, sid):
+        """Copy of the client's state, or None."""
+        with self._lock:
+            if self._expired(sid) or sid not in self._states:
+                return None
+            return json.loads(self._states[sid])
+
+    def set(self, sid, state):
+        with self._lock:
+            self._states[sid] = json.dumps(state)
+            self._touch(sid)
+
+    def update(self, sid, **fields):
+        """Merge fields into the client's state (creating it) and return the result."""
+        with self._lock:
+            state = {} if self._expired(sid) else json.loads(self._states.get(sid, '{}'))
+            state.update(fields)
+            self._states[sid] = json.dumps(state)
+            self._touch(sid)
+            return state
+
+    def increment(self, sid, field, amount=1):
+        """Add amount to an integer field of the client's state (creating it) and return the new value."""
+        with self._lock:
+            state = {} if self._expired(sid) else json.loads(self._states.get(sid, '{}'))
+            state[field] = state.get(field, 0) + amount
+            self._states[sid] = json.dumps(state)
+            self._touch(sid)
+            return state[field]
+
+    def delete(self, sid):
+        with self._lock:
+            self._states.pop(sid, None)
+            self._expires.pop(sid, None)
+
+    def count(self):
+        with self._lock:
+            for sid in list(self._expires):
+                self._expired(sid)
+            return len(self._states)
+
+
+class RedisStateStore:
+    """Client state in Redis hashes (one JSON-encoded field per key), shared by every worker and host.
+
+    Entries expire after ttl seconds without a write, so state of workers
+    that died without seeing a disconnect does not pile up.
+    """
+
+    def __init__(self, url, prefix='fad:client:', ttl=86400):
+        try:
+            import redis
+        except ImportError:
+            raise ImportError('redis:// client state needs the redis package (pip install redis)')
+        self.redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def _key(self, sid):
+        return f'{self.prefix}{sid}'
+
+    def get(self, sid):
+        fields = self.redis.hgetall(self._key(sid))
+        if not fields:
+            return None
+        return {name.decode(): json.loads(value) for name, value in fields.items()}
+
+    def set(self, sid, state):
+        key = self._key(sid)
+        pipe = self.redis.pipeline()
+        pipe.delete(key)
+        if state:
+            pipe.hset(key, mapping={name: json.dumps(value) for name, value in state.items()})
+            pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def update(self, sid, **fields):
+        key = self._key(sid)
+        pipe = self.redis.pipeline()
+        if fields:
+            pipe.hset(key, mapping={name: json.dumps(value) for name, value in fields.items()})
+        pipe.expire(key, self.ttl)
+        pipe.hgetall(key)
+        stored = pipe.execute()[-1]
+        return {name.decode(): json.loads(value) for name, value in stored.items()}
+
+    def increment(self, sid, field, amount=1):
+        # JSON integers are plain decimal strings, so HINCRBY works on them atomically
+        key = self._key(sid)
+        pipe = self.redis.pipeline()
+        pipe.hincrby(key, field, amount)
+        pipe.expire(key, self.ttl)
+        return pipe.execute()[0]
+
+    def delete(self, sid):
+        self.redis.delete(self._key(sid))
+
+    def count(self):
+        return sum(1 for _ in self.redis.scan_iter(match=f'{self.prefix}*', count=500))
+
+
+def state_url():
+    """FAD_STATE_URL, else the message queue when it is Redis (one server for both), else None."""
+    url = os.environ.get('FAD_STATE_URL')
+    if url:
+        return url
+    queue = os.environ.get('FAD_MESSAGE_QUEUE', '')
+    return queue if queue.startswith(('redis://', 'rediss://', 'unix://')) else None
+
+
+def create_state_store(url=None, prefix='fad:client:'):
+    """Redis-backed store for redis:// URLs, else a per-process memory store."""
+    url = url if url is not None else state_url()
+    ttl = int(os.environ.get('FAD_STATE_TTL', 86400))
+    if url and not url.startswith('memory://'):
+        return RedisStateStore(url, prefix=prefix, ttl=ttl)
+    return MemoryStateStore(ttl=ttl)
+
+
+class AnalysisSessions:
+    """Live video analysis options per socket.
+
+    The options (detector, overlay, tracking) live in the shared store,
+    merged into whatever else the store keeps for the socket; the
+    FaceTracker, which holds frames and cannot be serialized, stays with the
+    worker that owns the socket. Frames that reach a different worker (no
+    sticky sessions) are analyzed with the stored options and a fresh tracker.
+    The per-socket frame sequence is kept in the store too, so it continues
+    on whichever worker analyzes the next frame.
+    """
+
+    def __init__(self, store=None):
+        self.store = store if store is not None else create_state_store(prefix='fad:analysis:')
+        self._local = {}
+        self._lock = threading.Lock()
+
+    def connect(self, sid):
+        self._save(sid, {'tracking': False, 'detect_every': 0, 'detector': None, 'overlay': None})
+
+    def start(self, sid, tracking, detect_every, detector, overlay):
+        options = {'tracking': bool(tracking), 'detect_every': detect_every, 'detector': detector, 'overlay': overlay}
+        return self._save(sid, options)
+
+    def _save(self, sid, options):
+        # Sequence numbers restart with every connect and start_video
+        self.store.update(sid, sequence=0, **options)
+        session = self._build(options)
+        with self._lock:
+            self._local[sid] = session
+        return session
+
+    def get(self, sid):
+        """{'tracker', 'detector', 'overlay'} for a socket (defaults if it never started analysis)."""
+        with self._lock:
+            session = self._local.get(sid)
+        if session is not None:
+            return session
+        # Socket held by another worker: honour its options, but keep nothing here
+        # (this worker never sees its disconnect)
+        return self._build(self.store.get(sid) or {})
+
+    def next_sequence(self, sid):
+        """Count one more analyzed frame for a socket and return its sequence number (1 for the first)."""
+        return self.store.increment(sid, 'sequence')
+
+    def remove(self, sid):
+        with self._lock:
+            self._local.pop(sid, None)
+        self.store.delete(sid)
+
+    def count(self):
+        """Connected sockets across every worker sharing the store."""
+        return self.store.count()
+
+    def local_count(self):
+        """Sockets held by this worker (no store round trip)."""
+        with self._lock:
+            return len(self._local)
+
+    @staticmethod
+    def _build(options):
+        tracker = FaceTracker(detect_every=options['detect_every']) if options.get('tracking') else None
+        return {'tracker': tracker, 'detector': options.get('detector'), 'overlay': options.get('overlay')}
@@ -5,22 +5,107 @@ Handles real-time facial expression and emotion detection
 
 import cv2
 import numpy as np
-from fer import FER
 from PIL import Image
 import io
+import os
 import base64
 import logging
+from micro_batcher import MicroBatcher
+from face_detectors import FaceDetectorSet, HaarDetector, MTCNNDetector
+from frame_cache import FrameCache, frame_key
+from image_ingest import ImageDecoder
+from model_stubs import model_backend
+from metrics import stage, record_frame
+
+def _load_fer():
+    """The FER class, imported on first use since it pulls in TensorFlow (never in a gunicorn master).
+
+    FAD_MODEL_BACKEND=stub swaps FER for a deterministic, fixed-latency stand-in (load tests).
+    """
+    if model_backend() == 'stub':
+        from model_stubs import StubFER
+        return StubFER
+    from fer import FER
+    return FER
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger('emotion_analysis')
 
+# Annotated frames are only rendered when a client asks for them
+OVERLAY_FORMATS = {'jpeg': ('.jpg', cv2.IMWRITE_JPEG_QUALITY, 'image/jpeg'),
+                   'webp': ('.webp', cv2.IMWRITE_WEBP_QUALITY, 'image/webp')}
+OVERLAY_DEFAULTS = {'format': 'jpeg', 'quality': 75, 'scale': 1.0}
+
+# Pixels of context FER crops around each face rectangle before classifying it
+FER_CROP_OFFSET = 10
+
+def overlay_options(value):
+    """Normalize an overlay request (None/False, True, a format name or a dict) to options or None."""
+    if value in (None, False, '', '0', 'false', 'no'):
+        return None
+    options = dict(OVERLAY_DEFAULTS)
+    if isinstance(value, dict):
+        options.update({key: value[key] for key in OVERLAY_DEFAULTS if value.get(key) is not None})
+    elif isinstance(value, str) and value not in ('1', 'true', 'yes'):
+        options['format'] = value
+    if options['format'] not in OVERLAY_FORMATS:
+        raise ValueError(f"Unknown overlay format '{options['format']}' (choose from {', '.join(OVERLAY_FORMATS)})")
+    options['quality'] = min(100, max(1, int(options['quality'])))
+    options['scale'] = min(1.0, max(0.1, float(options['scale'])))
+    return options
+
+def compact_result(result, sequence=None, frame_id=None):
+    """The parts of a process_frame result a live client needs: boxes, rounded scores and the dominant emotion.
+    
+    Faces are ordered largest first, and the dominant emotion is that face's.
+    sequence (the server's per-client frame counter) and frame_id (the
+    client's own id, if it sent one) let clients match results to frames.
+    """
+    faces = sorted(result.get("analysis") or [], key=lambda face: face["box"]["w"] * face["box"]["h"], reverse=True)
+    compact = {
+        "status": result.get("status"),
+        "sequence": sequence,
+        "frame_id": frame_id,
+        "faces": [
+            {
+                "box": [face["box"][key] for key in ("x", "y", "w", "h")],
+                "emotion": face["dominant_emotion"],
+                "confidence": round(face["confidence"], 3),
+                "scores": {label: round(float(score), 3) for label, score in face["emotions"].items()}
+            }
+            for face in faces
+        ],
+        "dominant_emotion": faces[0]["dominant_emotion"] if faces else None,
+        "frame_size": result.get("frame_size"),
+        "detection": result.get("detection"),
+        "cached": result.get("cached", False)
+    }
+    if result.get("status") == "error":
+        compact["message"] = result.get("message")
+    if result.get("risk"):
+        compact["risk"] = result["risk"]
+    if result.get("frame_with_boxes"):
+        compact["frame_with_boxes"] = result["frame_with_boxes"]
+    return compact
+
+def _at_boxes(cached, boxes, detection):
+    """A cached frame result moved to this frame's face boxes (the faces may have moved since)."""
+    result = dict(cached, cached=True, detection=detection)
+    faces = cached.get("analysis")
+    if boxes is not None and faces and len(faces) == len(boxes):
+        result["analysis"] = [
+            dict(face, box={key: int(value) for key, value in zip(("x", "y", "w", "h"), box)})
+            for face, box in zip(faces, boxes)
+        ]
+    return result
+
 class EmotionAnalyzer:
-    def __init__(self):
-        """Initialize the emotion detector and face detector."""
+    def __init__(self, decoder=None):
+        """Initialize the emotion detector and face detector (decoder defaults to one built from the environment)."""
         try:
             # Initialize FER (Facial Emotion Recognition) detector
-            self.detector = FER(mtcnn=True)  # Using MTCNN for better face detection
+            self.detector = _load_fer()(mtcnn=True)  # Using MTCNN for better face detection
             logger.info("Emotion detector initialized successfully")
             
             # Initialize OpenCV's face detector
@@ -29,95 +114,246 @@ class EmotionAnalyzer:
             )
             logger.info("Face detector initialized successfully")
             
+            # Selectable detectors (none/haar/dnn/mtcnn/cascade), sharing the models loaded above
+            self.face_detectors = FaceDetectorSet({
+                'haar': HaarDetector(self.face_cascade),
+                'mtcnn': MTCNNDetector(self.detector.find_faces)
+            })
+            self.default_detector = os.environ.get('FAD_FACE_DETECTOR', 'mtcnn')
+            self.face_detectors.get(self.default_detector)
+            
             # Define emotion labels
             self.EMOTIONS = ["angry", "disgust", "fear", "happy", "sad", "surprise", "neutral"]
             
+            # Batch face crops across concurrent frames when FAD_MICROBATCH_WINDOW_MS is set
+            self.batcher = MicroBatcher.from_env(self.classify_faces_batch, name='fer')
+            
+            # Reuse results for near-identical frames from the same session (FAD_FRAME_CACHE_SIZE=0 disables)
+            self.frame_cache = FrameCache.from_env()
+            
+            # Shared decoder: BGR straight from JPEG/WebP/PNG, downscaled to FAD_DECODE_MAX_SIDE
+            self.decoder = decoder or ImageDecoder.from_env()
+            
         except Exception as e:
             logger.error(f"Error initializing emotion analyzer: {str(e)}")
             raise
 
+    def warm_up(self):
+        """Run one dummy inference so the first real frame doesn't pay for graph setup."""
+        self.analyze_emotions(np.zeros((96, 96, 3), dtype=np.uint8))
+        if self.frame_cache is not None:
+            self.frame_cache.clear()
+        logger.info("Emotion analyzer warmed up")
+
     def detect_face(self, image):
         """Detect faces in the image using OpenCV."""
         try:
-            # Convert to grayscale for face detection
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            
-            # Detect faces
-            faces = self.face_cascade.detectMultiScale(
-                gray,
-                scaleFactor=1.1,
-                minNeighbors=5,
-                minSize=(30, 30),
-                flags=cv2.CASCADE_SCALE_IMAGE
-            )
-            
-            return faces
+            return self.face_detectors.detect('haar', image)
             
         except Exception as e:
             logger.error(f"Error in face detection: {str(e)}")
             return []
 
-    def analyze_emotions(self, image):
-        """Analyze emotions in the given image."""
+    def analyze_emotions(self, image, tracker=None, detector=None, session_id=None):
+        """Analyze emotions in the given image.
+        
+        detector picks the face detector (see face_detectors.DETECTOR_NAMES);
+        it defaults to FAD_FACE_DETECTOR. With a FaceTracker, full face
+        detection only runs when the tracker asks for it; other frames reuse
+        the tracked boxes and only run the classifier. Faces that look the
+        same as in a recent frame from the same session_id skip the
+        classifier and reuse that frame's emotions from the frame cache; the
+        tracker still follows them on every frame. Without a session_id
+        nothing is cached.
+        """
+        detector = detector or self.default_detector
         try:
-            # Convert image to RGB (FER expects RGB)
-            rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            face_detector = self.face_detectors.get(detector)
+            boxes, detection = self._locate_faces(image, face_detector, detector, tracker)
             
-            # Detect emotions
-            results = self.detector.detect_emotions(rgb_image)
+            key = None
+            if self.frame_cache is not None and session_id is not None:
+                key = self._cache_key(image, boxes)
+                cached = self.frame_cache.get(session_id, key, variant=detector)
+                if cached is not None:
+                    record_frame('fer', 'faces' if cached["status"] == "success" else cached["status"], cached.get("faces_detected", 0))
+                    return _at_boxes(cached, boxes, detection)
             
-            if not results:
-                return {"status": "no_faces", "message": "No faces detected"}
-            
-            # Process results
-            emotions = []
-            for face in results:
-                # Get face coordinates
-                x, y, w, h = face['box']
-                
-                # Get emotion scores
-                emotion_scores = face['emotions']
-                
-                # Get dominant emotion
-                dominant_emotion = max(emotion_scores.items(), key=lambda x: x[1])
-                
-                emotions.append({
-                    "box": {"x": int(x), "y": int(y), "w": int(w), "h": int(h)},
-                    "emotions": emotion_scores,
-                    "dominant_emotion": dominant_emotion[0],
-                    "confidence": float(dominant_emotion[1])
-                })
-            
-            return {
-                "status": "success",
-                "faces_detected": len(emotions),
-                "analysis": emotions
-            }
+            result = self._analyze_uncached(image, boxes, detection, detector)
+            if key is not None and result["status"] != "error":
+                # Store a copy; callers add per-frame fields (e.g. frame_with_boxes) to the result
+                self.frame_cache.put(session_id, key, dict(result), variant=detector)
+            record_frame('fer', 'faces' if result["status"] == "success" else result["status"], result.get("faces_detected", 0))
+            return result
             
         except Exception as e:
             logger.error(f"Error in emotion analysis: {str(e)}")
+            record_frame('fer', 'error')
             return {"status": "error", "message": str(e)}
+    
+    def _locate_faces(self, image, face_detector, detector, tracker):
+        """Return (boxes, detection); boxes is None when FER finds and classifies the faces in one call."""
+        if tracker is not None:
+            with stage('detect'):
+                boxes, detected = tracker.update(image, face_detector.detect)
+            return boxes, "full" if detected else "tracked"
+        if detector == 'mtcnn' and self.batcher is None:
+            return None, "full"
+        # Frames without a face never reach the classifier
+        with stage('detect'):
+            return face_detector.detect(image), "full"
+    
+    def _cache_key(self, image, boxes):
+        """Frame cache key: perceptual hashes of the face crops, or the exact frame when no face is found.
+        
+        When FER finds and classifies the faces in one call (boxes is None),
+        the cheap Haar detector locates the crops to hash.
+        """
+        if boxes is None:
+            with stage('detect'):
+                boxes = self.face_detectors.detect('haar', image)
+        return self.frame_cache.face_key(image, boxes) if len(boxes) else frame_key(image)
+    
+    def _analyze_uncached(self, image, boxes, detection, detector):
+        """Classify the located faces (or find and classify them in one FER call)."""
+        # Convert image to RGB (FER expects RGB)
+        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        
+        # Detect emotions
+        if boxes is None:
+            with stage('detect_classify'):
+                results = self.detector.detect_emotions(rgb_image)
+        else:
+            with stage('classify'):
+                results = self._classify_boxes(rgb_image, boxes)
+        
+        if not results:
+            return {"status": "no_faces", "message": "No faces detected", "detection": detection, "detector": detector, "cached": False}
+        
+        # Process results
+        with stage('score'):
+            emotions = self._score_faces(results)
+        
+        return {
+            "status": "success",
+            "faces_detected": len(emotions),
+            "analysis": emotions,
+            "detection": detection,
+            "detector": detector,
+            "cached": False
+        }
 
-    def process_frame(self, frame_data):
-        """Process a single frame of video data (base64 encoded)."""
-        try:
-            # Convert base64 to image
-            if ',' in frame_data:
-                frame_data = frame_data.split(',')[1]
+    def _score_faces(self, results):
+        """Boxes, scores and dominant emotion per classified face."""
+        emotions = []
+        for face in results:
+            # Get face coordinates
+            x, y, w, h = face['box']
             
-            img_data = base64.b64decode(frame_data)
-            nparr = np.frombuffer(img_data, np.uint8)
-            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            # Get emotion scores
+            emotion_scores = face['emotions']
+            
+            # Get dominant emotion
+            dominant_emotion = max(emotion_scores.items(), key=lambda x: x[1])
+            
+            emotions.append({
+                "box": {"x": int(x), "y": int(y), "w": int(w), "h": int(h)},
+                "emotions": emotion_scores,
+                "dominant_emotion": dominant_emotion[0],
+                "confidence": float(dominant_emotion[1])
+            })
+        return emotions
+
+    def _classify_boxes(self, image, boxes):
+        """Run only the emotion classifier on already-located faces."""
+        if len(boxes) == 0:
+            return []
+        
+        if self.batcher is None:
+            # FER skips its own detector when face_rectangles is given
+            return self.detector.detect_emotions(image, face_rectangles=[tuple(int(v) for v in box) for box in boxes])
+        
+        futures = [self.batcher.submit(self._context_crop(image, box)) for box in boxes]
+        return [
+            {"box": [int(v) for v in box], "emotions": future.result()}
+            for box, future in zip(boxes, futures)
+        ]
+    
+    def _context_crop(self, image, box, margin=0.25):
+        """Crop a face with some surrounding context; returns (crop, face box within crop).
+        
+        The context is at least the FER_CROP_OFFSET pixels FER itself takes
+        around a face, so the classifier sees the same pixels as in the frame.
+        """
+        x, y, w, h = [int(v) for v in box]
+        img_h, img_w = image.shape[:2]
+        pad_x = max(int(w * margin), FER_CROP_OFFSET)
+        pad_y = max(int(h * margin), FER_CROP_OFFSET)
+        x0 = max(0, x - pad_x)
+        y0 = max(0, y - pad_y)
+        x1 = min(img_w, x + w + pad_x)
+        y1 = min(img_h, y + h + pad_y)
+        return image[y0:y1, x0:x1], (x - x0, y - y0, w, h)
+    
+    def classify_faces_batch(self, crops, gap=64):
+        """Classify many face crops with a single FER classifier call.
+        
+        FER classifies every rectangle passed to detect_emotions in one batch,
+        so the crops are tiled into one mosaic at their own scale (with blank
+        gaps wider than FER's crop offsets) and their face boxes are passed as
+        face_rectangles. Every face is then classified from the same pixels as
+        when its frame is analyzed on its own.
+        """
+        columns = int(np.ceil(np.sqrt(len(crops))))
+        rows = int(np.ceil(len(crops) / columns))
+        cell_h = max(crop.shape[0] for crop, _ in crops) + gap
+        cell_w = max(crop.shape[1] for crop, _ in crops) + gap
+        channels = crops[0][0].shape[2] if crops[0][0].ndim == 3 else 1
+        mosaic = np.zeros((rows * cell_h + gap, columns * cell_w + gap, channels), dtype=np.uint8)
+        
+        rectangles = []
+        for index, (crop, (fx, fy, fw, fh)) in enumerate(crops):
+            top = gap + (index // columns) * cell_h
+            left = gap + (index % columns) * cell_w
+            mosaic[top:top + crop.shape[0], left:left + crop.shape[1]] = crop.reshape(crop.shape[0], crop.shape[1], -1)
+            rectangles.append((left + fx, top + fy, fw, fh))
+        
+        if channels == 1:
+            mosaic = mosaic[:, :, 0]
+        results = self.detector.detect_emotions(mosaic, face_rectangles=rectangles)
+        if len(results) != len(crops):
+            # FER drops rectangles it cannot resize; fall back to one call per crop
+            results = [
+                (self.detector.detect_emotions(crop, face_rectangles=[box]) or [{"emotions": {}}])[0]
+                for crop, box in crops
+            ]
+        return [result["emotions"] for result in results]
+    
+    def decode_frame(self, frame_data):
+        """Decode a frame sent as raw JPEG/WebP bytes or as a base64 (data URL) string."""
+        with stage('decode'):
+            return self.decoder.decode(frame_data)
+
+    def process_frame(self, frame_data, tracker=None, detector=None, session_id=None, overlay=None):
+        """Process a single frame of video data (binary or base64 encoded).
+        
+        Returns box coordinates and scores only; pass overlay options (see
+        overlay_options) to also get the annotated frame in frame_with_boxes.
+        """
+        try:
+            image = self.decode_frame(frame_data)
             
             if image is None:
                 return {"status": "error", "message": "Failed to decode image"}
             
             # Analyze emotions
-            result = self.analyze_emotions(image)
+            result = self.analyze_emotions(image, tracker=tracker, detector=detector, session_id=session_id)
+            # Boxes are in the coordinates of the (possibly downscaled) decoded frame
+            result["frame_size"] = {"w": int(image.shape[1]), "h": int(image.shape[0])}
             
-            # Add visualization if faces were detected
-            if result["status"] == "success" and result["faces_detected"] > 0:
-                result["frame_with_boxes"] = self.draw_boxes(image, result["analysis"])
+            # Add visualization if requested and faces were detected
+            if overlay and result["status"] == "success" and result["faces_detected"] > 0:
+                result["frame_with_boxes"] = self.draw_boxes(image, result["analysis"], **overlay)
             
             return result
             
@@ -125,42 +361,52 @@ class EmotionAnalyzer:
             logger.error(f"Error processing frame: {str(e)}")
             return {"status": "error", "message": str(e)}
     
-    def draw_boxes(self, image, analysis_results):
-        """Draw bounding boxes and emotion labels on the image."""
+    def draw_boxes(self, image, analysis_results, format='jpeg', quality=95, scale=1.0):
+        """Draw bounding boxes and emotion labels on the image.
+        
+        The frame is downscaled by scale before drawing and encoded as JPEG or
+        WebP at the given quality.
+        """
         try:
-            img = image.copy()
+            with stage('draw_boxes'):
+                if scale < 1.0:
+                    img = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+                else:
+                    img = image.copy()
+                    scale = 1.0
             
-            for face in analysis_results:
-                box = face["box"]
-                emotion = face["dominant_emotion"]
-                confidence = face["confidence"]
+                for face in analysis_results:
+                    x, y, w, h = [int(face["box"][key] * scale) for key in ("x", "y", "w", "h")]
+                    emotion = face["dominant_emotion"]
+                    confidence = face["confidence"]
                 
-                # Draw rectangle around face
-                cv2.rectangle(
-                    img,
-                    (box["x"], box["y"]),
-                    (box["x"] + box["w"], box["y"] + box["h"]),
-                    (0, 255, 0),
-                    2
-                )
+                    # Draw rectangle around face
+                    cv2.rectangle(
+                        img,
+                        (x, y),
+                        (x + w, y + h),
+                        (0, 255, 0),
+                        2
+                    )
                 
-                # Draw emotion label
-                label = f"{emotion}: {confidence:.2f}"
-                cv2.putText(
-                    img,
-                    label,
-                    (box["x"], box["y"] - 10),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.7,
-                    (0, 255, 0),
-                    2
-                )
-            
-            # Convert back to base64
-            _, buffer = cv2.imencode('.jpg', img)
-            img_str = base64.b64encode(buffer).decode('utf-8')
-            
-            return f"data:image/jpeg;base64,{img_str}"
+                    # Draw emotion label
+                    label = f"{emotion}: {confidence:.2f}"
+                    cv2.putText(
+                        img,
+                        label,
+                        (x, y - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX,
+                        0.7 * max(scale, 0.5),
+                        (0, 255, 0),
+                        2
+                    )
+            
+                # Convert back to base64
+                extension, quality_flag, mimetype = OVERLAY_FORMATS[format]
+                _, buffer = cv2.imencode(extension, img, [quality_flag, int(quality)])
+                img_str = base64.b64encode(buffer).decode('utf-8')
+            
+                return f"data:{mimetype};base64,{img_str}"
             
         except Exception as e:
             logger.error(f"Error drawing boxes: {str(e)}")
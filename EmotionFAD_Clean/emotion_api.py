@@ -0,0 +1,192 @@
+"""
+EmotionFAD - Live Emotion API
+The single-image endpoint and the Socket.IO event logic of the live video page,
+shared by app_emotion.py (Flask-SocketIO) and asgi.py (asyncio)
+"""
+
+import logging
+from datetime import datetime
+
+from flask import Blueprint, request, jsonify
+
+from emotion_analysis import OVERLAY_FORMATS, overlay_options
+from engine import engine
+from face_detectors import DETECTOR_NAMES
+from live_video import parse_frame
+from metrics import stage
+
+logger = logging.getLogger('emotion_api')
+
+# Frame encodings accepted on video_frame, in order of preference
+FRAME_FORMATS = ['binary', 'base64']
+
+# Raw image bodies accepted by /api/analyze
+BINARY_IMAGE_MIMETYPES = ('application/octet-stream', 'image/jpeg', 'image/webp', 'image/png')
+
+# Emotion analyzer is loaded and warmed at boot (FER + MTCNN + Haar cascade)
+engine.require('fer')
+
+api = Blueprint('emotion_api', __name__)
+
+
+@api.route('/api/analyze', methods=['POST'])
+def analyze_image():
+    """API endpoint for analyzing a single image (raw bytes, file upload or base64 JSON).
+
+    Returns boxes and scores; add overlay=jpeg|webp (with optional
+    overlay_quality / overlay_scale), or "overlay" in the JSON body, to also
+    get the annotated image.
+    """
+    try:
+        detector = request.args.get('detector')
+        session_id = request.args.get('session_id')
+        try:
+            overlay = query_overlay(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if request.mimetype in BINARY_IMAGE_MIMETYPES:
+            # Raw JPEG/WebP/PNG body
+            image_data = request.get_data()
+        elif 'image' in request.files:
+            # Handle file upload
+            file = request.files['image']
+            if file.filename == '':
+                return jsonify({'error': 'No selected file'}), 400
+            image_data = file.read()
+        else:
+            # Handle base64 encoded image
+            payload = request.get_json(silent=True) or {}
+            image_data = payload.get('image')
+            detector = detector or payload.get('detector')
+            session_id = session_id or payload.get('session_id')
+            overlay = overlay or payload.get('overlay')
+
+        if not image_data:
+            return jsonify({'error': 'No image provided'}), 400
+        if detector is not None and detector not in DETECTOR_NAMES:
+            return jsonify({'error': f'Unknown detector, choose from {", ".join(DETECTOR_NAMES)}'}), 400
+        try:
+            overlay = overlay_options(overlay)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        if engine.fer() is None:
+            return jsonify({'error': 'Emotion analyzer not initialized'}), 503
+
+        result = engine.analyze_frame(image_data, detector=detector,
+                                      session_id=session_id, overlay=overlay)
+        if result.get('message') == 'Failed to decode image':
+            return jsonify({'error': 'Failed to decode image'}), 400
+
+        with stage('serialize'):
+            return jsonify(result)
+
+    except Exception as e:
+        logger.error(f'Error in analyze_image: {str(e)}')
+        return jsonify({'error': str(e)}), 500
+
+
+def query_overlay(args):
+    """The overlay request of ?overlay=jpeg|webp|1 (with overlay_quality / overlay_scale), or None when off.
+
+    Raises ValueError for an unknown format.
+    """
+    overlay = args.get('overlay')
+    if overlay_options(overlay) is None:
+        return None
+    return {
+        'format': overlay if overlay in OVERLAY_FORMATS else None,
+        'quality': args.get('overlay_quality'),
+        'scale': args.get('overlay_scale')
+    }
+
+
+# Socket.IO events: each returns the (event, payload) to send back to the client,
+# so Flask-SocketIO and asyncio servers only differ in how they emit it
+
+def connect(sessions, sid, auth=None):
+    """Register a new connection and agree on a frame encoding; returns its connection_response."""
+    offered = (auth or {}).get('frame_formats') or ['base64']
+    frame_format = next((fmt for fmt in offered if fmt in FRAME_FORMATS), 'base64')
+    sessions.connect(sid)
+    logger.info(f'Client connected: {sid} (frames: {frame_format})')
+    return 'connection_response', {
+        'status': 'connected',
+        'analyzer_ready': engine.fer_ready(),
+        'frame_format': frame_format,
+        'frame_formats': FRAME_FORMATS
+    }
+
+
+def start_analysis(sessions, sid, options=None, track_detect_every=0):
+    """Store a client's analysis options; returns analysis_started, or analysis_error for bad options.
+
+    options may contain {'tracking': bool, 'detect_every': int} to run full
+    face detection only every N frames and track faces in between,
+    {'detector': name} to pick the face detector (none/haar/dnn/mtcnn/cascade)
+    and {'overlay': true | 'webp' | {'format', 'quality', 'scale'}} to also
+    receive annotated frames (off by default; clients draw the boxes).
+    track_detect_every is the server default (FAD_TRACK_DETECT_EVERY).
+    """
+    try:
+        analyzer = engine.fer()
+        if analyzer is None:
+            return 'analysis_error', {'error': 'Emotion analyzer not initialized'}
+
+        options = options or {}
+        detector = options.get('detector')
+        if detector is not None and detector not in DETECTOR_NAMES:
+            return 'analysis_error', {'error': f'Unknown detector, choose from {", ".join(DETECTOR_NAMES)}'}
+
+        detect_every = int(options.get('detect_every') or track_detect_every or 5)
+        tracking = options.get('tracking', track_detect_every > 0)
+        session = sessions.start(
+            sid, tracking=tracking, detect_every=detect_every,
+            detector=detector, overlay=overlay_options(options.get('overlay'))
+        )
+        logger.info('Emotion analysis started')
+        return 'analysis_started', {
+            'status': 'success',
+            'tracking': bool(tracking),
+            'detector': detector or analyzer.default_detector,
+            'overlay': session['overlay']
+        }
+    except Exception as e:
+        error_msg = f'Error starting analysis: {str(e)}'
+        logger.error(error_msg)
+        return 'analysis_error', {'error': error_msg}
+
+
+def frame_message(data):
+    """The scheduler message of a video_frame payload (binary, or {'frame', 'frame_id'}); raises ValueError without a frame."""
+    frame, frame_id = parse_frame(data)
+    if not frame:
+        raise ValueError('No frame provided')
+    return {'frame': frame, 'frame_id': frame_id}
+
+
+def analyze_frame(sessions, scheduler, sid, message, queued_seconds):
+    """Analyze a client's scheduled frame with its options; returns analysis_result, or analysis_error.
+
+    An optional frame_id in the message is echoed back on the result.
+    """
+    try:
+        if engine.fer() is None:
+            return 'analysis_error', {'error': 'Emotion analyzer not initialized'}
+
+        session = sessions.get(sid)
+        result = engine.analyze_frame(
+            message['frame'], tracker=session['tracker'], detector=session['detector'],
+            session_id=sid, overlay=session['overlay']
+        )
+        result['timestamp'] = datetime.now().isoformat()
+        result['queued_ms'] = round(queued_seconds * 1000, 1)
+        result['frames_dropped'] = scheduler.dropped(sid)
+        if message.get('frame_id') is not None:
+            # Lets clients match results to frames (end-to-end latency, superseded frames)
+            result['frame_id'] = message['frame_id']
+        return 'analysis_result', result
+    except Exception as e:
+        error_msg = f'Error processing video frame: {str(e)}'
+        logger.error(error_msg)
+        return 'analysis_error', {'error': error_msg}
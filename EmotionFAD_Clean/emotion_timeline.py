@@ -0,0 +1,202 @@
+"""
+EmotionFAD - Emotion Timeline
+Per-session ring buffers of facial emotion scores with smoothing, variance and sudden-change detection
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Output order of the DeepFace emotion model
+EMOTION_LABELS = ('angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral')
+
+
+class EmotionTimeline:
+    """Fixed-size history of one session's emotion scores (percentages).
+
+    Each update is O(1): the newest frame overwrites the oldest slot and the
+    window sums are adjusted by the difference, the EMA is advanced one step,
+    and the frame is compared against the EMA *before* it absorbs the frame,
+    so a jump stands out against the recent baseline. The running sums are
+    recomputed exactly each time the buffer wraps to keep float drift out.
+    """
+
+    __slots__ = ('capacity', 'alpha', 'change_threshold', 'min_frames', 'scores', 'times', 'changes',
+                 'head', 'count', 'ema', 'sum', 'sumsq', 'change_count', 'last_change', 'last_seen')
+
+    def __init__(self, capacity=120, alpha=0.3, change_threshold=35.0, min_frames=5):
+        self.capacity = capacity
+        self.alpha = alpha
+        self.change_threshold = change_threshold
+        self.min_frames = min_frames
+        self.scores = np.zeros((capacity, len(EMOTION_LABELS)), dtype=np.float32)
+        # Wall-clock seconds need float64; float32 would round them to minutes
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.changes = np.zeros(capacity, dtype=np.bool_)
+        self.head = 0
+        self.count = 0
+        self.ema = np.zeros(len(EMOTION_LABELS), dtype=np.float32)
+        self.sum = np.zeros(len(EMOTION_LABELS), dtype=np.float64)
+        self.sumsq = np.zeros(len(EMOTION_LABELS), dtype=np.float64)
+        self.change_count = 0
+        self.last_change = None
+        self.last_seen = 0.0
+
+    def add(self, scores, timestamp):
+        """Record one frame's scores (array in EMOTION_LABELS order); returns (change magnitude, sudden)."""
+        slot = self.head
+        if self.count == self.capacity:
+            old = self.scores[slot].astype(np.float64)
+            self.sum -= old
+            self.sumsq -= old * old
+            self.change_count -= int(self.changes[slot])
+        else:
+            self.count += 1
+
+        # Total variation distance from the smoothed baseline, in percentage points
+        magnitude = 0.0
+        sudden = False
+        if self.count > 1:
+            delta = scores - self.ema
+            magnitude = float(np.abs(delta).sum()) / 2
+            sudden = self.count > self.min_frames and magnitude >= self.change_threshold
+            self.ema += self.alpha * delta
+        else:
+            self.ema[:] = scores
+
+        self.scores[slot] = scores
+        self.times[slot] = timestamp
+        self.changes[slot] = sudden
+        value = scores.astype(np.float64)
+        self.sum += value
+        self.sumsq += value * value
+        if sudden:
+            self.change_count += 1
+            self.last_change = (timestamp, EMOTION_LABELS[int(np.argmax(np.abs(delta)))], magnitude)
+
+        self.head = (slot + 1) % self.capacity
+        if self.head == 0:
+            window = self.scores.astype(np.float64)
+            self.sum = window.sum(axis=0)
+            self.sumsq = (window * window).sum(axis=0)
+        self.last_seen = time.monotonic()
+        return magnitude, sudden
+
+    @property
+    def variance(self):
+        if self.count == 0:
+            return np.zeros(len(EMOTION_LABELS))
+        mean = self.sum / self.count
+        return np.maximum(self.sumsq / self.count - mean * mean, 0.0)
+
+    def window_seconds(self):
+        if self.count < 2:
+            return 0.0
+        oldest = self.times[self.head if self.count == self.capacity else 0]
+        newest = self.times[(self.head - 1) % self.capacity]
+        return float(newest - oldest)
+
+    def smoothed(self):
+        """EMA emotion scores as a dict."""
+        return dict(zip(EMOTION_LABELS, map(float, self.ema)))
+
+    def summary(self):
+        variance = self.variance
+        summary = {
+            'frames': self.count,
+            'window_seconds': round(self.window_seconds(), 3),
+            'smoothed_emotions': {label: round(value, 2) for label, value in self.smoothed().items()},
+            'variance': {label: round(float(value), 2) for label, value in zip(EMOTION_LABELS, variance)},
+            'volatility': round(float(np.sqrt(variance).mean()), 2),
+            'sudden_changes': self.change_count,
+            'last_change': None
+        }
+        if self.last_change is not None:
+            timestamp, emotion, magnitude = self.last_change
+            summary['last_change'] = {'timestamp': timestamp, 'emotion': emotion, 'magnitude': round(magnitude, 2)}
+        return summary
+
+
+class SessionTimelines:
+    """Bounded set of EmotionTimelines keyed by session id.
+
+    Sessions are kept in least-recently-updated order, so idle sessions
+    are evicted from the front without scanning, and the oldest session is
+    dropped when max_sessions is reached.
+    """
+
+    def __init__(self, capacity=120, max_sessions=1000, idle_seconds=300, alpha=0.3, change_threshold=35.0):
+        self.capacity = capacity
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.alpha = alpha
+        self.change_threshold = change_threshold
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls):
+        """Timelines sized by FAD_SESSION_WINDOW / _MAX / _IDLE_SECONDS / _EMA_ALPHA / _CHANGE_THRESHOLD."""
+        return cls(
+            capacity=int(os.environ.get('FAD_SESSION_WINDOW', 120)),
+            max_sessions=int(os.environ.get('FAD_SESSION_MAX', 1000)),
+            idle_seconds=float(os.environ.get('FAD_SESSION_IDLE_SECONDS', 300)),
+            alpha=float(os.environ.get('FAD_SESSION_EMA_ALPHA', 0.3)),
+            change_threshold=float(os.environ.get('FAD_SESSION_CHANGE_THRESHOLD', 35))
+        )
+
+    def update(self, session_id, emotions, timestamp=None):
+        """Add one frame's emotion dict to the session and return its summary."""
+        scores = np.fromiter((emotions.get(label, 0.0) for label in EMOTION_LABELS),
+                             dtype=np.float32, count=len(EMOTION_LABELS))
+        with self._lock:
+            self._evict_idle()
+            timeline = self._sessions.get(session_id)
+            if timeline is None:
+                if len(self._sessions) >= self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self.evictions += 1
+                timeline = self._sessions[session_id] = EmotionTimeline(
+                    self.capacity, self.alpha, self.change_threshold
+                )
+            else:
+                self._sessions.move_to_end(session_id)
+            magnitude, sudden = timeline.add(scores, time.time() if timestamp is None else timestamp)
+            summary = timeline.summary()
+        summary['change_magnitude'] = round(magnitude, 2)
+        summary['sudden_change'] = sudden
+        return summary
+
+    def snapshot(self, session_id):
+        """Summary of the session's history, or None if it has none (or it went idle)."""
+        with self._lock:
+            self._evict_idle()
+            timeline = self._sessions.get(session_id)
+            return timeline.summary() if timeline is not None else None
+
+    def remove(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _evict_idle(self):
+        cutoff = time.monotonic() - self.idle_seconds
+        while self._sessions:
+            session_id, timeline = next(iter(self._sessions.items()))
+            if timeline.last_seen >= cutoff:
+                break
+            del self._sessions[session_id]
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'window': self.capacity,
+                'bytes_per_session': self.capacity * (len(EMOTION_LABELS) * 4 + 8 + 1),
+                'evictions': self.evictions
+            }
@@ -0,0 +1,14 @@
+"""
+EmotionFAD - Analysis Engine
+One importable engine behind every server: shared models, decoding and scoring
+"""
+
+from risk_scoring import (
+    as_percentages, stress_level, deception_risk, mental_health_score, score_emotions
+)
+from engine.core import AnalysisEngine, CAPABILITIES, frame_facial_result, engine
+
+__all__ = [
+    'AnalysisEngine', 'CAPABILITIES', 'engine', 'frame_facial_result',
+    'as_percentages', 'stress_level', 'deception_risk', 'mental_health_score', 'score_emotions'
+]
@@ -0,0 +1,218 @@
+"""
+EmotionFAD - Analysis Engine
+Facial, text, voice and fused analysis behind one model registry and one decoder
+"""
+
+import threading
+
+from image_ingest import ImageDecoder
+from model_manager import models as default_models, preload_enabled
+from risk_scoring import score_emotions
+
+# Model registry names behind each capability a server can require
+CAPABILITIES = {
+    'deepface': 'deepface_emotion',
+    'text': 'textblob',
+    'fer': 'fer'
+}
+
+
+class AnalysisEngine:
+    """Everything a server analyzes goes through here.
+
+    Servers only parse requests and emit results: they call require() for the
+    capabilities they serve and then the analyze_*() methods. The models are
+    registered once in the process-wide ModelManager, so importing several
+    servers into one process (asgi.py imports app.py) still loads each model
+    once. The text analyzer, the DeepFace system (which shares the text
+    analyzer), the FER analyzer and the report fusion are built on first use;
+    the image analyzers share one ImageDecoder. Text-only servers never build
+    the DeepFace system.
+    """
+
+    def __init__(self, models=None, decoder=None):
+        self.models = models or default_models
+        self.decoder = decoder or ImageDecoder.from_env()
+        self._text = None
+        self._fraud = None
+        self._fusion = None
+        self._lock = threading.Lock()
+
+    @property
+    def text(self):
+        """The TextAnalyzer (TextBlob sentiment, fraud keywords and patterns, text cache)."""
+        if self._text is None:
+            with self._lock:
+                if self._text is None:
+                    from text_analysis import TextAnalyzer
+                    self._text = TextAnalyzer()
+        return self._text
+
+    @property
+    def fraud(self):
+        """The FraudDetectionSystem (DeepFace emotions, session timelines, comprehensive reports)."""
+        if self._fraud is None:
+            text = self.text
+            with self._lock:
+                if self._fraud is None:
+                    from fraud_detection import FraudDetectionSystem
+                    self._fraud = FraudDetectionSystem(decoder=self.decoder, text=text)
+        return self._fraud
+
+    @property
+    def fusion(self):
+        """Session-keyed comprehensive reports, pushed to subscribers as inputs arrive."""
+        if self._fusion is None:
+            with self._lock:
+                if self._fusion is None:
+                    from report_fusion import ReportFusion
+                    self._fusion = ReportFusion.from_env()
+        return self._fusion
+
+    def _load_fer(self):
+        from emotion_analysis import EmotionAnalyzer
+        return EmotionAnalyzer(decoder=self.decoder)
+
+    def _register(self, capability):
+        if capability == 'deepface':
+            self.models.register('deepface_emotion', lambda: self.fraud.load_models(),
+                                 warm_up=lambda model: self.fraud.warm_up())
+        elif capability == 'text':
+            self.models.register('textblob', lambda: self.text,
+                                 warm_up=lambda analyzer: analyzer.analyze_text_sentiment('warm up'))
+        elif capability == 'fer':
+            self.models.register('fer', self._load_fer, warm_up=lambda analyzer: analyzer.warm_up())
+        else:
+            raise ValueError(f"Unknown capability '{capability}' (choose from {', '.join(CAPABILITIES)})")
+
+    def require(self, *capabilities):
+        """Register the models behind these capabilities and, unless preloading is off, load and warm them now.
+
+        Safe to call from every server module: a model already registered or
+        loaded by another import is reused.
+        """
+        for capability in capabilities:
+            self._register(capability)
+        if preload_enabled():
+            for capability in capabilities:
+                self.models.load(CAPABILITIES[capability])
+
+    def available(self, capability):
+        """Whether a required capability's model is loaded (loading it now if preloading was skipped).
+
+        A failed load is not retried on every call: the registry waits out its
+        backoff (FAD_MODEL_RETRY_SECONDS) and answers False meanwhile.
+        """
+        return self.models.get(CAPABILITIES[capability]) is not None
+
+    def fer(self):
+        """The shared FER emotion analyzer, or None if it failed to load."""
+        return self.models.get('fer')
+
+    def fer_ready(self):
+        return self.models.is_ready('fer')
+
+    def component_stats(self, name, capability='fer'):
+        """stats() of a component of a capability's analyzer; None before it loads or if it's off.
+
+        Components are frame_cache and batcher (fer, deepface), session_data
+        (deepface) and text_cache (text). Reading them never builds an analyzer.
+        """
+        if capability == 'fer':
+            analyzer = self.fer() if self.fer_ready() else None
+        elif capability == 'deepface':
+            analyzer = self._fraud
+        else:
+            analyzer = self._text
+        component = getattr(analyzer, name, None)
+        return component.stats() if component is not None else None
+
+    # Facial (DeepFace, single images over HTTP)
+
+    def analyze_facial(self, image_data, detector=None, session_id=None):
+        """DeepFace emotions plus stress, deception and mental health scores for one image."""
+        return self.fraud.analyze_facial_expression(image_data, detector=detector, session_id=session_id)
+
+    def track_facial(self, session_id, result):
+        """Add a facial result to its session's smoothed history and fold it into the session report."""
+        result = self.fraud.track_session(session_id, result)
+        self.fusion.update_facial(session_id, result)
+        return result
+
+    # Frames (FER, every face in live video and uploaded images)
+
+    def analyze_frame(self, frame_data, tracker=None, detector=None, session_id=None, overlay=None):
+        """Boxes and emotions of every face in one frame, with the largest face's scores in 'risk'."""
+        analyzer = self.fer()
+        if analyzer is None:
+            return {"status": "error", "message": "Emotion analyzer not initialized"}
+        result = analyzer.process_frame(frame_data, tracker=tracker, detector=detector,
+                                        session_id=session_id, overlay=overlay)
+        facial = frame_facial_result(result)
+        if facial is not None:
+            result["risk"] = {key: round(facial[key], 3)
+                              for key in ('stress_level', 'deception_risk', 'mental_health_score')}
+        return result
+
+    def fuse_frame(self, session_id, result):
+        """Fold a frame's largest face into the session's smoothed history and report; returns the new report or None."""
+        facial = frame_facial_result(result)
+        if facial is None:
+            return None
+        return self.fusion.update_facial(session_id, self.fraud.track_session(session_id, facial))
+
+    def end_session(self, session_id):
+        """Drop cached frames of a disconnected client."""
+        analyzer = self.fer() if self.fer_ready() else None
+        if analyzer is not None and analyzer.frame_cache is not None:
+            analyzer.frame_cache.clear(session_id)
+
+    # Text
+
+    def analyze_text(self, text, session_id=None):
+        """Sentiment and fraud indicators of one message, folded into the session report when session_id is given."""
+        result = self.text.analyze_text_sentiment(text)
+        if session_id:
+            self.fusion.update_text(session_id, result)
+        return result
+
+    def analyze_text_batch(self, texts):
+        return self.text.analyze_text_batch(texts)
+
+    # Voice and fused reports
+
+    def voice_stream(self, sample_rate=None, audio_format=None, channels=None):
+        """A new per-connection VoiceStream (prosody features and calibrated vocal stress)."""
+        from voice_analysis import VoiceStream
+        return VoiceStream.from_env(sample_rate=sample_rate, audio_format=audio_format, channels=channels)
+
+    def analyze_voice(self, stream, chunk, session_id=None):
+        """Analyze one audio chunk; returns (result, new session report or None)."""
+        result = stream.process_chunk(chunk)
+        report = self.fusion.update_voice(session_id, result) if session_id else None
+        return result, report
+
+    def report(self, facial_data=None, text_data=None, session_id=None, voice_data=None):
+        """Comprehensive fraud risk report from facial, text and voice results."""
+        return self.fraud.generate_comprehensive_report(facial_data, text_data, session_id=session_id,
+                                                        voice_data=voice_data)
+
+
+def frame_facial_result(result):
+    """A FER frame result's largest face as a facial result in the DeepFace shape (percentages plus scores), or None."""
+    faces = result.get("analysis") if result.get("status") == "success" else None
+    if not faces:
+        return None
+    face = max(faces, key=lambda face: face["box"]["w"] * face["box"]["h"])
+    emotions = {label: float(score) * 100 for label, score in face["emotions"].items()}
+    facial = {
+        'success': True,
+        'emotions': emotions,
+        'dominant_emotion': face["dominant_emotion"]
+    }
+    facial.update(score_emotions(emotions))
+    return facial
+
+
+# Shared by every server module imported into the same process
+engine = AnalysisEngine()
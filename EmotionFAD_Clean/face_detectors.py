@@ -0,0 +1,197 @@
+"""
+EmotionFAD - Face Detector Backends
+Interchangeable face detectors with different cost/accuracy trade-offs
+
+    none     whole frame, no detection (cheapest)
+    haar     OpenCV Haar cascade
+    dnn      OpenCV DNN: YuNet if FAD_YUNET_MODEL is set, else the res10 SSD in FAD_DNN_MODEL_DIR
+    mtcnn    MTCNN (most accurate, slowest)
+    cascade  Haar gates MTCNN: empty frames never reach MTCNN, which only searches around Haar hits
+             (DeepFace analysis classifies the Haar hit itself, without running a detector)
+"""
+
+import os
+import threading
+
+import cv2
+
+DETECTOR_NAMES = ('none', 'haar', 'dnn', 'mtcnn', 'cascade')
+
+# Closest DeepFace detector_backend for each of our detectors
+# ('cascade' hands DeepFace the Haar face crop, so it must not detect again)
+DEEPFACE_BACKENDS = {
+    'none': 'skip',
+    'haar': 'opencv',
+    'dnn': 'ssd',
+    'mtcnn': 'mtcnn',
+    'cascade': 'skip'
+}
+
+
+class WholeFrameDetector:
+    """Treat the whole frame as the face (no detection cost)."""
+
+    name = 'none'
+
+    def detect(self, image):
+        h, w = image.shape[:2]
+        return [(0, 0, w, h)]
+
+
+class HaarDetector:
+    name = 'haar'
+
+    def __init__(self, cascade=None):
+        self.cascade = cascade or cv2.CascadeClassifier(
+            cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+        )
+
+    def detect(self, image):
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        faces = self.cascade.detectMultiScale(
+            gray,
+            scaleFactor=1.1,
+            minNeighbors=5,
+            minSize=(30, 30),
+            flags=cv2.CASCADE_SCALE_IMAGE
+        )
+        return [tuple(int(v) for v in face) for face in faces]
+
+
+class MTCNNDetector:
+    """MTCNN detector; reuses an existing find_faces(image, bgr=True) callable (e.g. FER's) if given."""
+
+    name = 'mtcnn'
+
+    def __init__(self, find_faces=None, min_confidence=0.9):
+        self._find_faces = find_faces
+        self._mtcnn = None
+        self.min_confidence = min_confidence
+
+    def detect(self, image):
+        if self._find_faces is not None:
+            return [tuple(int(v) for v in box) for box in self._find_faces(image, bgr=True)]
+
+        if self._mtcnn is None:
+            from mtcnn import MTCNN
+            self._mtcnn = MTCNN()
+        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        return [
+            tuple(max(0, int(v)) for v in face['box'])
+            for face in self._mtcnn.detect_faces(rgb)
+            if face.get('confidence', 1.0) >= self.min_confidence
+        ]
+
+
+class DNNDetector:
+    """OpenCV DNN face detector (YuNet or the res10 SSD Caffe model)."""
+
+    name = 'dnn'
+
+    def __init__(self, min_confidence=0.6):
+        self.min_confidence = min_confidence
+        self._yunet = None
+        self._net = None
+
+        yunet_path = os.environ.get('FAD_YUNET_MODEL')
+        model_dir = os.environ.get('FAD_DNN_MODEL_DIR', 'models')
+        prototxt = os.path.join(model_dir, 'deploy.prototxt')
+        weights = os.path.join(model_dir, 'res10_300x300_ssd_iter_140000.caffemodel')
+
+        if yunet_path and os.path.exists(yunet_path) and hasattr(cv2, 'FaceDetectorYN'):
+            self._yunet = cv2.FaceDetectorYN.create(yunet_path, '', (320, 320), self.min_confidence)
+        elif os.path.exists(prototxt) and os.path.exists(weights):
+            self._net = cv2.dnn.readNetFromCaffe(prototxt, weights)
+        else:
+            raise ValueError('DNN face detector needs FAD_YUNET_MODEL or the res10 SSD files in FAD_DNN_MODEL_DIR')
+
+    def detect(self, image):
+        h, w = image.shape[:2]
+        if self._yunet is not None:
+            self._yunet.setInputSize((w, h))
+            _, faces = self._yunet.detect(image)
+            if faces is None:
+                return []
+            return [tuple(max(0, int(v)) for v in face[:4]) for face in faces]
+
+        blob = cv2.dnn.blobFromImage(cv2.resize(image, (300, 300)), 1.0, (300, 300), (104.0, 177.0, 123.0))
+        self._net.setInput(blob)
+        detections = self._net.forward()[0, 0]
+        boxes = []
+        for detection in detections:
+            if detection[2] < self.min_confidence:
+                continue
+            x0, y0 = max(0, int(detection[3] * w)), max(0, int(detection[4] * h))
+            x1, y1 = min(w, int(detection[5] * w)), min(h, int(detection[6] * h))
+            if x1 > x0 and y1 > y0:
+                boxes.append((x0, y0, x1 - x0, y1 - y0))
+        return boxes
+
+
+class CascadeDetector:
+    """Run a cheap detector first and the expensive one only around its hits.
+
+    Frames where the gate finds nothing return no faces without ever running
+    the expensive detector.
+    """
+
+    name = 'cascade'
+
+    def __init__(self, gate, confirm, margin=0.5):
+        self.gate = gate
+        self.confirm = confirm
+        self.margin = margin
+
+    def detect(self, image):
+        candidates = self.gate.detect(image)
+        if not candidates:
+            return []
+
+        img_h, img_w = image.shape[:2]
+        boxes = []
+        for x, y, w, h in candidates:
+            x0 = max(0, x - int(w * self.margin))
+            y0 = max(0, y - int(h * self.margin))
+            x1 = min(img_w, x + w + int(w * self.margin))
+            y1 = min(img_h, y + h + int(h * self.margin))
+            for bx, by, bw, bh in self.confirm.detect(image[y0:y1, x0:x1]):
+                box = (x0 + bx, y0 + by, bw, bh)
+                if box not in boxes:
+                    boxes.append(box)
+        return boxes
+
+
+class FaceDetectorSet:
+    """Lazily built, shared detector instances looked up by name.
+
+    Pass already-loaded detectors (e.g. a Haar cascade or FER's MTCNN) as
+    overrides so they are not loaded twice.
+    """
+
+    def __init__(self, overrides=None):
+        self._detectors = dict(overrides or {})
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        if name not in DETECTOR_NAMES:
+            raise ValueError(f"Unknown face detector '{name}' (choose from {', '.join(DETECTOR_NAMES)})")
+        with self._lock:
+            return self._get_locked(name)
+
+    def _get_locked(self, name):
+        if name not in self._detectors:
+            if name == 'none':
+                detector = WholeFrameDetector()
+            elif name == 'haar':
+                detector = HaarDetector()
+            elif name == 'dnn':
+                detector = DNNDetector()
+            elif name == 'mtcnn':
+                detector = MTCNNDetector()
+            else:
+                detector = CascadeDetector(self._get_locked('haar'), self._get_locked('mtcnn'))
+            self._detectors[name] = detector
+        return self._detectors[name]
+
+    def detect(self, name, image):
+        return self.get(name).detect(image)
@@ -0,0 +1,157 @@
+"""
+EmotionFAD - Face Tracker
+Propagates face boxes between periodic full detections in a live video stream
+"""
+
+import threading
+
+import cv2
+import numpy as np
+
+
+def _create_opencv_tracker(kind):
+    """Return an OpenCV KCF/CSRT tracker if this build ships one, else None."""
+    name = f'Tracker{kind}_create'
+    factory = getattr(cv2, name, None)
+    if factory is None and hasattr(cv2, 'legacy'):
+        factory = getattr(cv2.legacy, name, None)
+    return factory() if factory is not None else None
+
+
+class _FlowTrack:
+    """Follow one box with sparse Lucas-Kanade optical flow on corner features."""
+
+    MIN_POINTS = 5
+
+    def __init__(self, gray, box):
+        self.box = tuple(float(v) for v in box)
+        x, y, w, h = [int(v) for v in box]
+        mask = np.zeros_like(gray)
+        mask[max(0, y):y + h, max(0, x):x + w] = 255
+        self.points = cv2.goodFeaturesToTrack(gray, maxCorners=40, qualityLevel=0.01, minDistance=4, mask=mask)
+
+    def update(self, prev_gray, gray):
+        if self.points is None or len(self.points) < self.MIN_POINTS:
+            return False
+        new_points, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, self.points, None, winSize=(15, 15), maxLevel=2)
+        good = status.reshape(-1) == 1
+        if good.sum() < self.MIN_POINTS:
+            return False
+
+        old = self.points[good].reshape(-1, 2)
+        new = new_points[good].reshape(-1, 2)
+        dx, dy = np.median(new - old, axis=0)
+
+        # Scale from the change in spread of the tracked points around their centre
+        old_spread = np.linalg.norm(old - old.mean(axis=0), axis=1).mean()
+        new_spread = np.linalg.norm(new - new.mean(axis=0), axis=1).mean()
+        scale = new_spread / old_spread if old_spread > 1e-3 else 1.0
+
+        x, y, w, h = self.box
+        cx, cy = x + w / 2 + dx, y + h / 2 + dy
+        w, h = w * scale, h * scale
+        self.box = (cx - w / 2, cy - h / 2, w, h)
+        self.points = new.reshape(-1, 1, 2)
+        return True
+
+
+class _OpenCVTrack:
+    def __init__(self, tracker, image, box):
+        self.tracker = tracker
+        self.box = tuple(float(v) for v in box)
+        self.tracker.init(image, tuple(int(v) for v in box))
+
+    def update(self, image):
+        ok, box = self.tracker.update(image)
+        if ok:
+            self.box = tuple(float(v) for v in box)
+        return ok
+
+
+class FaceTracker:
+    """Run full face detection every N frames (or when tracking is lost) and track in between.
+
+    update() returns the current face boxes and whether they came from a full
+    detection, so callers only run the emotion classifier on tracked frames.
+    """
+
+    def __init__(self, detect_every=10, backend='auto'):
+        self.detect_every = max(1, int(detect_every))
+        self.backend = backend
+        self._tracks = []
+        self._prev_gray = None
+        self._since_detection = None
+        self._lock = threading.Lock()
+
+        self.full_detections = 0
+        self.tracked_frames = 0
+        self.losses = 0
+
+    def _new_track(self, image, gray, box):
+        if self.backend in ('auto', 'KCF', 'CSRT'):
+            kind = 'KCF' if self.backend == 'auto' else self.backend
+            tracker = _create_opencv_tracker(kind)
+            if tracker is not None:
+                return _OpenCVTrack(tracker, image, box)
+        return _FlowTrack(gray, box)
+
+    def _step(self, image, gray):
+        for track in self._tracks:
+            if isinstance(track, _OpenCVTrack):
+                ok = track.update(image)
+            else:
+                ok = track.update(self._prev_gray, gray)
+            if not ok:
+                return False
+        return True
+
+    def update(self, image, detect_fn):
+        """Return (boxes, detected) for a BGR frame.
+
+        detect_fn(image) runs the expensive detector and returns (x, y, w, h)
+        boxes; it is only called on schedule or after the tracker loses a face.
+        """
+        with self._lock:
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+            img_h, img_w = gray.shape[:2]
+
+            due = self._since_detection is None or self._since_detection + 1 >= self.detect_every
+            tracked = False
+            if not due and self._tracks:
+                tracked = self._step(image, gray)
+                if not tracked:
+                    self.losses += 1
+
+            if tracked:
+                self._since_detection += 1
+                self.tracked_frames += 1
+            else:
+                boxes = detect_fn(image)
+                self._tracks = [self._new_track(image, gray, box) for box in boxes]
+                self._since_detection = 0
+                self.full_detections += 1
+
+            self._prev_gray = gray
+
+            result = []
+            for track in self._tracks:
+                x, y, w, h = track.box
+                x0, y0 = max(0, int(round(x))), max(0, int(round(y)))
+                x1, y1 = min(img_w, int(round(x + w))), min(img_h, int(round(y + h)))
+                if x1 > x0 and y1 > y0:
+                    result.append((x0, y0, x1 - x0, y1 - y0))
+            return result, not tracked
+
+    def reset(self):
+        with self._lock:
+            self._tracks = []
+            self._prev_gray = None
+            self._since_detection = None
+
+    def stats(self):
+        return {
+            'detect_every': self.detect_every,
+            'full_detections': self.full_detections,
+            'tracked_frames': self.tracked_frames,
+            'losses': self.losses
+        }
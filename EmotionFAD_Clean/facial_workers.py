@@ -0,0 +1,238 @@
+"""
+EmotionFAD - Facial Inference Worker Pool
+Long-lived processes that each load the emotion model once and serve facial analysis requests
+"""
+
+import itertools
+import math
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+
+class PoolSaturated(Exception):
+    """Raised when the request queue is full; callers should retry later."""
+
+    def __init__(self, retry_after):
+        super().__init__('Facial analysis workers are busy')
+        self.retry_after = retry_after
+
+
+class PoolTimeout(Exception):
+    """Raised when a queued request is not answered within the timeout."""
+
+
+class WorkerCrashed(Exception):
+    """Raised when the worker process handling a request exits before answering."""
+
+
+def _worker_main(request_queue, result_queue):
+    """Worker process loop: load and warm the model once, then serve requests forever.
+
+    Messages to the parent are (kind, pid, payload): 'ready' once warm,
+    'taken' with the request id when a request is picked up (so it can be
+    failed at once if this process dies) and 'done' with (request id,
+    result, seconds).
+    """
+    from engine import engine
+
+    pid = os.getpid()
+    fds = engine.fraud
+    fds.warm_up()
+    result_queue.put(('ready', pid, None))
+
+    while True:
+        item = request_queue.get()
+        if item is None:
+            break
+        request_id, image_data, options = item
+        result_queue.put(('taken', pid, request_id))
+        started = time.perf_counter()
+        result = fds.analyze_facial_expression(image_data, **options)
+        result_queue.put(('done', pid, (request_id, result, time.perf_counter() - started)))
+
+
+class FacialWorkerPool:
+    """Dispatch facial analysis to N worker processes through a bounded queue.
+
+    The HTTP layer calls analyze(); it blocks only the calling request thread
+    while a worker process runs inference, so throughput scales with cores.
+    Worker liveness is checked every check_interval seconds however busy the
+    pool is: a dead worker is replaced and the request it was running fails
+    with WorkerCrashed instead of waiting out the timeout.
+    """
+
+    def __init__(self, num_workers=2, queue_size=None, timeout=30.0, check_interval=0.5):
+        self.num_workers = num_workers
+        self.queue_size = queue_size or num_workers * 2
+        self.timeout = timeout
+        self.check_interval = check_interval
+
+        self._ctx = multiprocessing.get_context('spawn')
+        self._request_queue = None
+        self._result_queue = None
+        self._workers = []
+        self._pending = {}
+        # pid -> id of the request that worker process is running
+        self._running_requests = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._collector = None
+        self._running = False
+
+        self.ready_workers = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.crashed = 0
+        self._avg_latency = 1.0
+
+    def start(self):
+        """Spawn the worker processes and the result collector thread."""
+        if self._running:
+            return
+        self._request_queue = self._ctx.Queue(maxsize=self.queue_size)
+        self._result_queue = self._ctx.Queue()
+        self._workers = [self._spawn_worker() for _ in range(self.num_workers)]
+        self._running = True
+        self._collector = threading.Thread(target=self._collect_results, name='facial-pool-collector', daemon=True)
+        self._collector.start()
+
+    def _spawn_worker(self):
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(self._request_queue, self._result_queue),
+            daemon=True
+        )
+        process.start()
+        return process
+
+    def _collect_results(self):
+        next_check = time.monotonic() + self.check_interval
+        while self._running:
+            try:
+                self._handle_message(*self._result_queue.get(timeout=self.check_interval))
+            except queue.Empty:
+                pass
+            except (EOFError, OSError):
+                break
+
+            # On a timer, not only when idle, so a crash is noticed under steady load too
+            if time.monotonic() >= next_check:
+                self._replace_dead_workers()
+                next_check = time.monotonic() + self.check_interval
+
+    def _handle_message(self, kind, pid, payload):
+        if kind == 'ready':
+            self.ready_workers += 1
+        elif kind == 'taken':
+            self._running_requests[pid] = payload
+        elif kind == 'done':
+            request_id, result, latency = payload
+            self._running_requests.pop(pid, None)
+            with self._lock:
+                future = self._pending.pop(request_id, None)
+                self.completed += 1
+                self._avg_latency = 0.9 * self._avg_latency + 0.1 * latency
+            if future is not None and not future.done():
+                future.set_result(result)
+
+    def _replace_dead_workers(self):
+        dead = [index for index, process in enumerate(self._workers) if not process.is_alive()]
+        if not dead or not self._running:
+            return
+        # Read everything the dead workers sent before exiting, so a request
+        # they finished is answered rather than failed
+        while True:
+            try:
+                self._handle_message(*self._result_queue.get_nowait())
+            except queue.Empty:
+                break
+        for index in dead:
+            process = self._workers[index]
+            self.ready_workers = max(0, self.ready_workers - 1)
+            request_id = self._running_requests.pop(process.pid, None)
+            if request_id is not None:
+                with self._lock:
+                    future = self._pending.pop(request_id, None)
+                    self.crashed += 1
+                if future is not None and not future.done():
+                    future.set_exception(WorkerCrashed(
+                        f'Facial analysis worker exited (code {process.exitcode}) while handling the request'
+                    ))
+            self._workers[index] = self._spawn_worker()
+
+    def retry_after(self):
+        """Seconds until the current backlog should have drained."""
+        backlog = self.queue_depth() + self.num_workers
+        return max(1, math.ceil(backlog * self._avg_latency / max(self.num_workers, 1)))
+
+    def queue_depth(self):
+        try:
+            return self._request_queue.qsize()
+        except (NotImplementedError, AttributeError):
+            return len(self._pending)
+
+    def analyze(self, image_data, timeout=None, **options):
+        """Run facial analysis on a worker and return its result dict.
+
+        Extra keyword options (e.g. detector) are passed through to
+        analyze_facial_expression. Raises PoolSaturated when the queue is full and PoolTimeout when no
+        worker answers within the timeout.
+        """
+        if not self._running:
+            self.start()
+
+        request_id = next(self._ids)
+        future = Future()
+        with self._lock:
+            self._pending[request_id] = future
+
+        try:
+            self._request_queue.put_nowait((request_id, image_data, options))
+        except queue.Full:
+            with self._lock:
+                self._pending.pop(request_id, None)
+                self.rejected += 1
+            raise PoolSaturated(self.retry_after())
+
+        try:
+            return future.result(timeout=timeout or self.timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                self._pending.pop(request_id, None)
+                self.timed_out += 1
+            raise PoolTimeout(f'Facial analysis timed out after {timeout or self.timeout:.0f}s')
+
+    def stats(self):
+        return {
+            'workers': self.num_workers,
+            'ready_workers': self.ready_workers,
+            'queue_size': self.queue_size,
+            'queue_depth': self.queue_depth() if self._running else 0,
+            'in_flight': len(self._pending),
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+            'crashed': self.crashed,
+            'avg_latency_seconds': round(self._avg_latency, 4)
+        }
+
+    def stop(self):
+        """Ask every worker to exit and wait briefly for them."""
+        if not self._running:
+            return
+        self._running = False
+        for _ in self._workers:
+            try:
+                self._request_queue.put_nowait(None)
+            except queue.Full:
+                break
+        for process in self._workers:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._workers = []
@@ -0,0 +1,198 @@
+"""
+EmotionFAD - Perceptual Frame Cache
+Reuses analysis results for repeated frames and near-identical faces from the same session
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+def dhash(image, hash_size=16):
+    """hash_size**2-bit difference hash of a BGR or grayscale image.
+
+    The image is shrunk to (hash_size + 1) x hash_size and each bit records
+    whether a pixel is brighter than its right-hand neighbour, so small
+    changes in noise, compression or exposure flip few bits.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+def face_key(image, boxes, hash_size=16):
+    """Cache key of the located faces in a frame: one dhash per face crop, in box order.
+
+    Hashing the crop rather than the frame spends every bit on the face, so
+    an expression change (a smile turning into a frown) flips many bits even
+    when the face is a small part of the frame.
+    """
+    img_h, img_w = image.shape[:2]
+    hashes = []
+    for box in boxes:
+        x, y, w, h = [int(v) for v in box]
+        crop = image[max(0, y):min(img_h, y + h), max(0, x):min(img_w, x + w)]
+        hashes.append(dhash(crop, hash_size) if crop.size else 0)
+    return ('faces',) + tuple(hashes)
+
+
+def frame_key(image):
+    """Cache key that only matches this exact frame.
+
+    For paths that locate and classify faces in one model call, where there
+    is no face crop to hash before running the model.
+    """
+    digest = hashlib.blake2b(np.ascontiguousarray(image).tobytes(), digest_size=16).digest()
+    return ('frame', digest)
+
+
+def key_distance(a, b):
+    """Differing bits between two keys (the most of any one face), or None if they can never match."""
+    if a == b:
+        return 0
+    if a[0] != 'faces' or b[0] != 'faces' or len(a) != len(b):
+        return None
+    return max(hamming(x, y) for x, y in zip(a[1:], b[1:]))
+
+
+class FrameCache:
+    """LRU + TTL cache of analysis results keyed by face_key() or frame_key().
+
+    Entries are scoped to a session (and optionally a variant such as the
+    face detector), so one user's result is never served to another. A lookup
+    hits when a stored key for the same scope has the same number of faces
+    and every face crop's hash is within max_distance bits (frame keys only
+    match exactly). Total entries and the estimated size of the stored
+    results are capped.
+    """
+
+    def __init__(self, max_entries=256, ttl=10.0, max_distance=8, max_bytes=4 * 1024 * 1024, per_session=32,
+                 hash_size=16):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self.hash_size = hash_size
+        self.max_bytes = max_bytes
+        self.per_session = per_session
+
+        self._entries = OrderedDict()  # (scope, key) -> (result, expires_at, size), oldest first
+        self._scopes = {}              # scope -> OrderedDict of keys, oldest first
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @classmethod
+    def from_env(cls):
+        """Build a cache from FAD_FRAME_CACHE_* settings, or None if FAD_FRAME_CACHE_SIZE is 0."""
+        max_entries = int(os.environ.get('FAD_FRAME_CACHE_SIZE', 256))
+        if max_entries <= 0:
+            return None
+        return cls(
+            max_entries=max_entries,
+            ttl=float(os.environ.get('FAD_FRAME_CACHE_TTL', 10)),
+            max_distance=int(os.environ.get('FAD_FRAME_CACHE_DISTANCE', 8)),
+            max_bytes=int(os.environ.get('FAD_FRAME_CACHE_MAX_BYTES', 4 * 1024 * 1024)),
+            hash_size=int(os.environ.get('FAD_FRAME_CACHE_HASH_SIZE', 16))
+        )
+
+    def face_key(self, image, boxes):
+        """face_key() at this cache's hash size."""
+        return face_key(image, boxes, self.hash_size)
+
+    def get(self, session_id, frame_key, variant=None):
+        """Return the cached result closest to frame_key for this session, or None."""
+        scope = (session_id, variant)
+        now = time.monotonic()
+        with self._lock:
+            best_distance, best_key = None, None
+            for stored_key in list(self._scopes.get(scope, ())):
+                key = (scope, stored_key)
+                if self._entries[key][1] <= now:
+                    self._evict(key)
+                    self.expirations += 1
+                    continue
+                distance = key_distance(stored_key, frame_key)
+                if distance is None or distance > self.max_distance:
+                    continue
+                if best_distance is None or distance < best_distance:
+                    best_distance, best_key = distance, key
+
+            if best_key is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_key)
+            self._scopes[scope].move_to_end(best_key[1])
+            self.hits += 1
+            if best_distance > 0:
+                self.near_hits += 1
+            return self._entries[best_key][0]
+
+    def put(self, session_id, frame_key, result, variant=None):
+        """Store a result; it expires after ttl seconds or when evicted."""
+        size = len(json.dumps(result, default=str))
+        if size > self.max_bytes:
+            return
+
+        scope = (session_id, variant)
+        key = (scope, frame_key)
+        with self._lock:
+            if key in self._entries:
+                self._evict(key)
+            self._entries[key] = (result, time.monotonic() + self.ttl, size)
+            self._scopes.setdefault(scope, OrderedDict())[frame_key] = None
+            self._bytes += size
+
+            keys = self._scopes[scope]
+            while len(keys) > self.per_session:
+                self._evict((scope, next(iter(keys))))
+                self.evictions += 1
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._evict(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _evict(self, key):
+        scope, frame_key = key
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+        keys = self._scopes[scope]
+        keys.pop(frame_key, None)
+        if not keys:
+            del self._scopes[scope]
+
+    def clear(self, session_id=None):
+        """Drop every entry, or only those of one session (e.g. on disconnect)."""
+        with self._lock:
+            for key in [key for key in self._entries if session_id is None or key[0][0] == session_id]:
+                self._evict(key)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'sessions': len({scope[0] for scope in self._scopes}),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'near_hits': self.near_hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
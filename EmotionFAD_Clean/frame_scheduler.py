@@ -0,0 +1,101 @@
+"""
+EmotionFAD - Per-Client Frame Scheduler
+Latest-frame-wins buffering with per-client FPS limits and round-robin fairness
+"""
+
+import threading
+import time
+from collections import deque
+
+
+class FrameScheduler:
+    """Hold at most one pending frame per client and hand them out fairly.
+
+    offer() replaces any frame the client already has waiting (counting it as
+    dropped), so a slow server never builds a backlog. next_frame() returns the
+    oldest-queued client whose FPS budget allows another analysis and whose
+    previous frame is finished; clients go to the back of the line once
+    served, so a chatty client cannot starve the others. Frame workers call
+    done() once a frame's result is emitted, so one client's frames never run
+    concurrently or finish out of order.
+    """
+
+    def __init__(self, max_fps=10.0):
+        self.min_interval = 1.0 / max_fps if max_fps and max_fps > 0 else 0.0
+        self._pending = {}
+        self._order = deque()
+        self._next_allowed = {}
+        self._dropped = {}
+        self._busy = set()
+        self._lock = threading.Lock()
+
+        self.total_received = 0
+        self.total_dropped = 0
+        self.total_dispatched = 0
+
+    def offer(self, client_id, frame):
+        """Queue a frame for a client, replacing any frame still waiting."""
+        with self._lock:
+            self.total_received += 1
+            if client_id in self._pending:
+                self._dropped[client_id] = self._dropped.get(client_id, 0) + 1
+                self.total_dropped += 1
+            else:
+                self._order.append(client_id)
+            self._pending[client_id] = (frame, time.monotonic())
+
+    def next_frame(self):
+        """Return (client_id, frame, queued_seconds), or (None, None, wait_seconds).
+
+        When nothing is ready the last value is how long until the earliest
+        rate-limited client may be served again (or None if nothing is pending
+        or every pending client still has a frame in flight). The returned
+        client is busy until done(client_id) is called.
+        """
+        now = time.monotonic()
+        with self._lock:
+            wait = None
+            for _ in range(len(self._order)):
+                client_id = self._order.popleft()
+                if client_id in self._busy:
+                    self._order.append(client_id)
+                    continue
+                allowed_at = self._next_allowed.get(client_id, 0.0)
+                if allowed_at <= now:
+                    frame, received_at = self._pending.pop(client_id)
+                    self._next_allowed[client_id] = now + self.min_interval
+                    self._busy.add(client_id)
+                    self.total_dispatched += 1
+                    return client_id, frame, now - received_at
+                self._order.append(client_id)
+                wait = allowed_at - now if wait is None else min(wait, allowed_at - now)
+            return None, None, wait
+
+    def done(self, client_id):
+        """Mark the client's frame from next_frame() as finished; its next frame may now be handed out."""
+        with self._lock:
+            self._busy.discard(client_id)
+
+    def dropped(self, client_id):
+        return self._dropped.get(client_id, 0)
+
+    def remove(self, client_id):
+        """Forget a disconnected client."""
+        with self._lock:
+            if self._pending.pop(client_id, None) is not None:
+                self._order.remove(client_id)
+            self._next_allowed.pop(client_id, None)
+            self._dropped.pop(client_id, None)
+            self._busy.discard(client_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_fps': round(1.0 / self.min_interval, 2) if self.min_interval else None,
+                'clients_waiting': len(self._pending),
+                'in_flight': len(self._busy),
+                'received': self.total_received,
+                'dispatched': self.total_dispatched,
+                'dropped': self.total_dropped,
+                'dropped_by_client': dict(self._dropped)
+            }
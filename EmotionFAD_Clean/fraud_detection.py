@@ -0,0 +1,305 @@
+"""
+EmotionFAD - Fraud Detection Engine
+Facial, text and combined fraud scoring shared by the web app and offline tools
+"""
+
+import cv2
+import numpy as np
+import os
+from datetime import datetime
+from micro_batcher import MicroBatcher
+from face_detectors import FaceDetectorSet, DEEPFACE_BACKENDS
+from frame_cache import FrameCache, frame_key
+from image_ingest import ImageDecoder
+from emotion_timeline import SessionTimelines, EMOTION_LABELS
+from model_stubs import model_backend, StubDeepFace
+from metrics import stage, record_frame
+from text_analysis import TextAnalyzer
+from risk_scoring import (
+    stress_level, deception_risk, mental_health_score,
+    facial_report_component, text_report_component, voice_report_component, assess_risk
+)
+
+# DeepFace pulls in TensorFlow, so it is only imported once facial analysis is used
+DeepFace = None
+
+def _load_deepface():
+    global DeepFace
+    if DeepFace is None:
+        if model_backend() == 'stub':
+            # Deterministic, fixed-latency stand-in for load tests (FAD_MODEL_BACKEND=stub)
+            DeepFace = StubDeepFace()
+        else:
+            from deepface import DeepFace as deepface_module
+            DeepFace = deepface_module
+    return DeepFace
+
+class FraudDetectionSystem:
+    def __init__(self, decoder=None, text=None):
+        # Smoothed per-session emotion history (ring buffers), fed into comprehensive reports
+        self.session_data = SessionTimelines.from_env()
+        # Sentiment and fraud keywords (the engine passes its shared TextAnalyzer)
+        self.text = text or TextAnalyzer()
+        # Batches face crops across concurrent requests when FAD_MICROBATCH_WINDOW_MS is set
+        self.batcher = MicroBatcher.from_env(self.classify_emotions_batch, name='deepface')
+        self._emotion_model = None
+        # Face detector used before emotion inference (none/haar/dnn/mtcnn/cascade)
+        self.face_detectors = FaceDetectorSet()
+        self.default_detector = os.environ.get('FAD_FACE_DETECTOR', 'haar')
+        # Near-identical frames from the same session reuse the previous result
+        self.frame_cache = FrameCache.from_env()
+        # Decodes straight to BGR, downscaled to FAD_DECODE_MAX_SIDE (the engine passes its shared one)
+        self.decoder = decoder or ImageDecoder.from_env()
+        print("✅ Fraud Detection System initialized")
+        
+    def analyze_facial_expression(self, image_data, detector=None, session_id=None):
+        """Analyze facial expressions and detect emotions
+        
+        A face that looks the same as in a recent frame from the same
+        session_id is answered from the frame cache without running the model
+        (when DeepFace locates the face itself, the cheap Haar detector finds
+        the face to compare; frames without a face only match exact repeats).
+        Without a session_id nothing is cached.
+        
+        With the 'cascade' detector, frames where Haar finds no face never
+        reach DeepFace, and DeepFace only classifies the largest Haar hit
+        (with some margin) instead of searching the frame again.
+        """
+        detector = detector or self.default_detector
+        try:
+            if detector not in DEEPFACE_BACKENDS:
+                raise ValueError(f"Unknown face detector '{detector}'")
+            
+            # Decode base64 image (handles alpha and EXIF orientation)
+            with stage('decode'):
+                img_bgr = self.decoder.decode(image_data)
+            if img_bgr is None:
+                raise ValueError('Could not decode image')
+            
+            # Analyze emotions using DeepFace
+            print(f"🔍 Analyzing facial expression ({detector})...")
+            faces = None
+            if detector == 'cascade':
+                # Cheap Haar gate: no face, so skip the expensive detector and model entirely
+                with stage('detect'):
+                    faces = self.face_detectors.detect('haar', img_bgr)
+                if not faces:
+                    record_frame('deepface', 'no_faces')
+                    return {
+                        'success': False,
+                        'error': 'No face detected',
+                        'detector': detector,
+                        'message': 'Could not detect face. Please ensure your face is clearly visible with good lighting.'
+                    }
+            
+            key = None
+            if self.batcher is not None:
+                with stage('detect'):
+                    box = self._primary_face_box(img_bgr, detector)
+                if self.frame_cache is not None and session_id is not None:
+                    key = self._cache_key(img_bgr, [box] if box is not None else [])
+                    cached = self._cached_facial(session_id, key, detector)
+                    if cached is not None:
+                        return cached
+                face = img_bgr if box is None else img_bgr[box[1]:box[1] + box[3], box[0]:box[0] + box[2]]
+                with stage('classify'):
+                    emotions = self.batcher.process(face)
+                dominant_emotion = max(emotions, key=emotions.get)
+            else:
+                if self.frame_cache is not None and session_id is not None:
+                    key = self._cache_key(img_bgr, faces)
+                    cached = self._cached_facial(session_id, key, detector)
+                    if cached is not None:
+                        return cached
+                # DeepFace finds and classifies the face in one call; for the
+                # cascade the Haar gate already found it, so only the crop is classified
+                face = img_bgr if faces is None else self._face_crop(img_bgr, max(faces, key=lambda f: f[2] * f[3]))
+                with stage('detect_classify'):
+                    analysis = _load_deepface().analyze(
+                        face,
+                        actions=['emotion'],
+                        detector_backend=DEEPFACE_BACKENDS[detector],
+                        enforce_detection=False,
+                        silent=True
+                    )
+                
+                if isinstance(analysis, list):
+                    analysis = analysis[0]
+                
+                emotions = analysis['emotion']
+                dominant_emotion = analysis['dominant_emotion']
+            
+            # Calculate stress and deception indicators
+            with stage('score'):
+                stress = stress_level(emotions)
+                deception = deception_risk(emotions)
+                mental_health = mental_health_score(emotions)
+            
+            print(f"✅ Analysis complete: {dominant_emotion} ({emotions[dominant_emotion]:.1f}%)")
+            
+            result = {
+                'success': True,
+                'emotions': emotions,
+                'dominant_emotion': dominant_emotion,
+                'stress_level': stress,
+                'deception_risk': deception,
+                'mental_health_score': mental_health,
+                'detector': detector,
+                'cached': False,
+                'timestamp': datetime.now().isoformat()
+            }
+            if key is not None:
+                self.frame_cache.put(session_id, key, result, variant=detector)
+            record_frame('deepface', 'faces', 1)
+            return result
+        except Exception as e:
+            print(f"❌ Facial analysis error: {str(e)}")
+            record_frame('deepface', 'error')
+            return {
+                'success': False,
+                'error': str(e),
+                'message': 'Could not detect face. Please ensure your face is clearly visible with good lighting.'
+            }
+    
+    def track_session(self, session_id, result):
+        """Add a facial result to its session's history and attach the smoothed view as 'temporal'.
+        
+        Called by the web process (not facial worker processes) so each
+        session keeps one history however requests are distributed.
+        """
+        if self.session_data is None or not session_id or not result.get('success'):
+            return result
+        temporal = self._score_temporal(self.session_data.update(session_id, result['emotions']))
+        return dict(result, temporal=temporal)
+    
+    def load_models(self):
+        """Build the DeepFace emotion model up front instead of on the first request"""
+        return self._get_emotion_model()
+    
+    def warm_up(self):
+        """Load the DeepFace emotion model and run one dummy inference"""
+        blank = np.zeros((48, 48, 3), dtype=np.uint8)
+        if self.batcher is not None:
+            self.classify_emotions_batch([blank])
+        else:
+            _load_deepface().analyze(blank, actions=['emotion'], enforce_detection=False, silent=True)
+        print("✅ Emotion model loaded and warmed up")
+    
+    def classify_emotions_batch(self, face_crops):
+        """Classify a list of BGR face crops with one forward pass of the emotion model"""
+        batch = np.empty((len(face_crops), 48, 48, 1), dtype=np.float32)
+        for i, crop in enumerate(face_crops):
+            gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+            batch[i, :, :, 0] = cv2.resize(gray, (48, 48))
+        batch /= 255.0
+        
+        predictions = self._get_emotion_model().predict(batch, verbose=0)
+        percentages = 100 * predictions / predictions.sum(axis=1, keepdims=True)
+        return [dict(zip(EMOTION_LABELS, map(float, row))) for row in percentages]
+    
+    def _get_emotion_model(self):
+        """Keras model behind DeepFace's emotion action, for batched prediction"""
+        if self._emotion_model is None:
+            deepface = _load_deepface()
+            try:
+                client = deepface.build_model(task='facial_attribute', model_name='Emotion')
+            except TypeError:
+                # DeepFace releases before the task argument was added
+                client = deepface.build_model('Emotion')
+            self._emotion_model = getattr(client, 'model', client)
+        return self._emotion_model
+    
+    def _cached_facial(self, session_id, key, detector):
+        """This session's cached result for a frame key, or None"""
+        cached = self.frame_cache.get(session_id, key, variant=detector)
+        if cached is None:
+            return None
+        record_frame('deepface', 'faces', 1)
+        return dict(cached, cached=True, timestamp=datetime.now().isoformat())
+    
+    def _primary_face_box(self, img_bgr, detector='haar'):
+        """(x, y, w, h) of the largest face found by the chosen detector, or None"""
+        faces = self.face_detectors.detect(detector, img_bgr)
+        if len(faces) == 0:
+            return None
+        return max(faces, key=lambda f: f[2] * f[3])
+    
+    def _face_crop(self, img_bgr, box, margin=0.2):
+        """A face box with some margin around it, clipped to the frame"""
+        x, y, w, h = box
+        img_h, img_w = img_bgr.shape[:2]
+        x0 = max(0, x - int(w * margin))
+        y0 = max(0, y - int(h * margin))
+        x1 = min(img_w, x + w + int(w * margin))
+        y1 = min(img_h, y + h + int(h * margin))
+        return img_bgr[y0:y1, x0:x1]
+    
+    def _cache_key(self, img_bgr, faces=None):
+        """Frame cache key: perceptual hashes of the face crops, or the exact frame when there is no face
+        
+        Without faces from the chosen detector (DeepFace finds the face
+        itself), the cheap Haar detector locates the crops to hash.
+        """
+        if faces is None:
+            with stage('detect'):
+                faces = self.face_detectors.detect('haar', img_bgr)
+        return self.frame_cache.face_key(img_bgr, faces) if faces else frame_key(img_bgr)
+    
+    def analyze_text_sentiment(self, text):
+        """Analyze text for sentiment and fraud indicators (see TextAnalyzer)"""
+        return self.text.analyze_text_sentiment(text)
+    
+    def analyze_text_batch(self, texts):
+        return self.text.analyze_text_batch(texts)
+    
+    def session_temporal(self, session_id):
+        """Smoothed facial history of a session with its stress/deception/mental health scores, or None"""
+        if not session_id or self.session_data is None:
+            return None
+        temporal = self.session_data.snapshot(session_id)
+        return self._score_temporal(temporal) if temporal is not None else None
+    
+    def _score_temporal(self, temporal):
+        smoothed = temporal['smoothed_emotions']
+        temporal['stress_level'] = stress_level(smoothed)
+        temporal['deception_risk'] = deception_risk(smoothed)
+        temporal['mental_health_score'] = mental_health_score(smoothed)
+        return temporal
+    
+    def generate_comprehensive_report(self, facial_data, text_data, session_id=None, voice_data=None):
+        """Generate comprehensive fraud detection report
+        
+        With a session_id that has facial history, the smoothed (EMA) scores of
+        the whole session are used instead of the single latest frame.
+        voice_data is a voice_analysis result whose stress score adds to the risk.
+        """
+        try:
+            temporal = self.session_temporal(session_id)
+            facial_risk, facial_factors = facial_report_component(facial_data, temporal)
+            text_risk, text_factors = text_report_component(text_data)
+            voice_risk, voice_factors = voice_report_component(voice_data)
+            
+            overall_risk = facial_risk + text_risk + voice_risk
+            risk_factors = facial_factors + text_factors + voice_factors
+            risk_level, recommendation = assess_risk(overall_risk)
+            
+            print(f"📊 Comprehensive report: {risk_level} risk ({overall_risk:.2f})")
+            
+            return {
+                'success': True,
+                'overall_risk_score': overall_risk,
+                'risk_level': risk_level,
+                'risk_factors': risk_factors,
+                'recommendation': recommendation,
+                'facial_analysis': facial_data,
+                'text_analysis': text_data,
+                'voice_analysis': voice_data,
+                'temporal_analysis': temporal,
+                'timestamp': datetime.now().isoformat()
+            }
+        except Exception as e:
+            print(f"❌ Report generation error: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
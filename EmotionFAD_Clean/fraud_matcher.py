@@ -0,0 +1,227 @@
+"""
+EmotionFAD - Fraud Matcher
+Single-pass keyword and pattern matching for text fraud analysis
+"""
+
+import hashlib
+import re
+from collections import deque
+
+
+def _is_word_char(ch):
+    """Match the regex definition of a word character (\\w)."""
+    return ch.isalnum() or ch == '_'
+
+
+class AhoCorasick:
+    """Aho-Corasick automaton that finds every keyword in one pass over the text."""
+
+    def __init__(self, keywords, word_boundaries=True):
+        self.word_boundaries = word_boundaries
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        self.keywords = []
+        self._seen = set()
+
+        for keyword in keywords:
+            self._add(keyword)
+        self._build_failure_links()
+
+    def _add(self, keyword):
+        if not keyword or keyword in self._seen:
+            return
+        index = len(self.keywords)
+        self.keywords.append(keyword)
+        self._seen.add(keyword)
+
+        node = 0
+        for ch in keyword:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = nxt
+        self._output[node].append(index)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(ch, 0)
+                # Inherit matches that end at the same position via the suffix link
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def finditer(self, text):
+        """Yield (keyword_index, start, end) for every keyword occurrence in text."""
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        keywords = self.keywords
+        check_bounds = self.word_boundaries
+        length = len(text)
+
+        node = 0
+        for pos, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if not output[node]:
+                continue
+
+            end = pos + 1
+            for index in output[node]:
+                start = end - len(keywords[index])
+                if check_bounds:
+                    if start > 0 and _is_word_char(text[start - 1]) and _is_word_char(text[start]):
+                        continue
+                    if end < length and _is_word_char(text[end]) and _is_word_char(text[end - 1]):
+                        continue
+                yield index, start, end
+
+
+class PatternSet:
+    """Suspicious-phrase regexes merged into one alternation with named groups."""
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self._compiled = [re.compile(pattern) for pattern in self.patterns]
+        self._groups = ['p%d' % i for i in range(len(self.patterns))]
+        if self.patterns:
+            self._combined = re.compile('|'.join(
+                '(?P<%s>%s)' % (group, pattern)
+                for group, pattern in zip(self._groups, self.patterns)
+            ))
+        else:
+            self._combined = None
+
+    def search(self, text):
+        """Return {pattern_index: (start, end)} for the first match of every pattern.
+
+        The merged alternation reports the earliest match at each position, so a
+        pattern whose only matches start inside a span consumed by another pattern
+        is re-checked individually from the first hit. Text with no matches at all
+        never leaves the single combined scan.
+        """
+        found = {}
+        if self._combined is None:
+            return found
+
+        first_hit = None
+        for match in self._combined.finditer(text):
+            index = int(match.lastgroup[1:])
+            if first_hit is None:
+                first_hit = match.start()
+            if index not in found:
+                found[index] = match.span()
+
+        if first_hit is not None and len(found) < len(self.patterns):
+            for index, compiled in enumerate(self._compiled):
+                if index in found:
+                    continue
+                match = compiled.search(text, first_hit)
+                if match:
+                    found[index] = match.span()
+
+        return found
+
+
+def _lowercase_with_offsets(text):
+    """Lowercase text and return (lowered, offsets) mapping each lowered index to its index in text.
+
+    offsets is None when lowercasing kept every character one-to-one (the
+    usual case); characters such as 'İ' expand to several on lower().
+    """
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered, None
+    parts = []
+    offsets = []
+    for index, ch in enumerate(text):
+        low = ch.lower()
+        parts.append(low)
+        offsets.extend([index] * len(low))
+    return ''.join(parts), offsets
+
+
+def _original_span(offsets, start, end):
+    if offsets is None:
+        return start, end
+    return offsets[start], offsets[end - 1] + 1
+
+
+class FraudMatcher:
+    """Prebuilt matcher for fraud keywords and suspicious patterns.
+
+    Keeps its own copy of the keyword and pattern lists; call update() after
+    changing them so the automaton and merged regex are rebuilt once, not
+    checked on every match().
+    """
+
+    def __init__(self, keywords, patterns, word_boundaries=True):
+        self.word_boundaries = word_boundaries
+        self.version = None
+        self.update(keywords, patterns)
+
+    def update(self, keywords=None, patterns=None):
+        """Replace the keyword and/or pattern lists and rebuild."""
+        if keywords is not None:
+            self.keywords = list(keywords)
+        if patterns is not None:
+            self.patterns = list(patterns)
+        self.rebuild()
+
+    def rebuild(self):
+        """Compile the automaton and merged regex from the current lists."""
+        self._keyword_list = [kw.lower() for kw in self.keywords]
+        self._automaton = AhoCorasick(self._keyword_list, self.word_boundaries)
+        self._pattern_set = PatternSet(self.patterns)
+
+        digest = hashlib.sha1()
+        for item in self._keyword_list + ['\0'] + list(self.patterns):
+            digest.update(item.encode('utf-8'))
+            digest.update(b'\0')
+        digest.update(b'wb' if self.word_boundaries else b'sub')
+        self.version = digest.hexdigest()[:16]
+
+    def match(self, text):
+        """Scan text (case-insensitively) once for keywords and once for patterns.
+
+        Returns a dict with the distinct keywords found (in list order), the
+        patterns that matched (in list order) and the offsets of every keyword
+        occurrence and first pattern match for highlighting. Offsets index the
+        text as given, even where lowercasing changed its length.
+        """
+        text_lower, offsets = _lowercase_with_offsets(text)
+
+        keyword_matches = []
+        seen = set()
+        for index, start, end in self._automaton.finditer(text_lower):
+            keyword = self._automaton.keywords[index]
+            start, end = _original_span(offsets, start, end)
+            keyword_matches.append({'keyword': keyword, 'start': start, 'end': end})
+            seen.add(keyword)
+        keyword_matches.sort(key=lambda m: (m['start'], m['end']))
+        keywords_found = [kw for kw in dict.fromkeys(self._keyword_list) if kw in seen]
+
+        found = self._pattern_set.search(text_lower)
+        patterns_found = [self.patterns[i] for i in sorted(found)]
+        pattern_matches = []
+        for i in sorted(found, key=lambda i: found[i]):
+            start, end = _original_span(offsets, *found[i])
+            pattern_matches.append({'pattern': self.patterns[i], 'start': start, 'end': end})
+
+        return {
+            'keywords_found': keywords_found,
+            'patterns_found': patterns_found,
+            'keyword_matches': keyword_matches,
+            'pattern_matches': pattern_matches,
+        }
@@ -0,0 +1,42 @@
+"""
+Gunicorn configuration for EmotionFAD
+
+The app code is imported once in the master (preload_app) and shared with the
+forked workers copy-on-write, but the models are not: TensorFlow (DeepFace,
+FER) is not fork-safe, as its thread pools and locks would be copied into the
+children mid-state. Each worker loads and warms its models right after it
+starts, before serving requests.
+"""
+
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'eventlet')
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+threads = 1
+timeout = 300
+
+# Import the app in the master before forking, without loading any model there
+preload_app = True
+os.environ['FAD_LOAD_MODELS_AFTER_FORK'] = '1'
+
+if worker_class == 'eventlet':
+    # The app is imported before workers patch themselves, so patch up front
+    import eventlet
+    eventlet.monkey_patch()
+
+
+def pre_fork(server, worker):
+    # Objects allocated while importing the app are never freed; keeping them out
+    # of the collector's generations stops GC passes in workers from writing to
+    # (and so un-sharing) those pages
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    # Load and warm this worker's own models before it accepts requests
+    # (FAD_PRELOAD_MODELS=0 leaves them to load on first use)
+    if os.environ.get('FAD_PRELOAD_MODELS', '1') != '0':
+        from model_manager import models
+        models.load_all()
@@ -0,0 +1,135 @@
+"""
+EmotionFAD - Image Ingest
+Shared decoding of uploaded images and video frames straight to (downscaled) BGR arrays
+"""
+
+import base64
+import io
+import os
+import threading
+
+import cv2
+import numpy as np
+from PIL import Image
+
+EXIF_ORIENTATION_TAG = 0x0112
+
+# Largest JPEG decode-time reduction first (libjpeg scales while decoding; other formats are resized after)
+_REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2)
+)
+
+
+def to_bytes(data):
+    """Raw image bytes from bytes-like data or a base64 / data URL string."""
+    if isinstance(data, str):
+        comma = data.find(',', 0, 100)
+        return base64.b64decode(data[comma + 1:] if comma >= 0 else data)
+    return data
+
+
+def probe(data):
+    """(width, height, has_alpha, exif_orientation) from the image header, or None.
+
+    PIL only parses the header here; no pixels are decoded.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            has_alpha = img.mode in ('RGBA', 'LA', 'PA') or (img.mode == 'P' and 'transparency' in img.info)
+            orientation = 1
+            if img.format in ('JPEG', 'WEBP', 'TIFF', 'PNG'):
+                orientation = img.getexif().get(EXIF_ORIENTATION_TAG, 1)
+            return img.width, img.height, has_alpha, orientation
+    except Exception:
+        return None
+
+
+def apply_orientation(image, orientation):
+    """Rotate/flip an image the way its EXIF orientation says it should be displayed."""
+    if orientation == 2:
+        return cv2.flip(image, 1)
+    if orientation == 3:
+        return cv2.rotate(image, cv2.ROTATE_180)
+    if orientation == 4:
+        return cv2.flip(image, 0)
+    if orientation == 5:
+        return cv2.transpose(image)
+    if orientation == 6:
+        return cv2.rotate(image, cv2.ROTATE_90_CLOCKWISE)
+    if orientation == 7:
+        return cv2.rotate(cv2.transpose(image), cv2.ROTATE_180)
+    if orientation == 8:
+        return cv2.rotate(image, cv2.ROTATE_90_COUNTERCLOCKWISE)
+    return image
+
+
+class ImageDecoder:
+    """Decode images to BGR no larger than max_side, in as few full-size copies as possible.
+
+    JPEGs bigger than needed are decoded at 1/2, 1/4 or 1/8 scale by libjpeg;
+    anything still too large is resized into a per-thread buffer that is reused
+    across frames of the same size. Such an image stays valid until the same
+    thread decodes again, so callers that keep frames must copy them.
+    """
+
+    def __init__(self, max_side=960, background=(255, 255, 255)):
+        self.max_side = max_side
+        self.background = np.array(background, dtype=np.uint16)
+        self._local = threading.local()
+
+    @classmethod
+    def from_env(cls):
+        """Decoder limited to FAD_DECODE_MAX_SIDE pixels (0 keeps full resolution)."""
+        return cls(max_side=int(os.environ.get('FAD_DECODE_MAX_SIDE', 960)))
+
+    def decode(self, data):
+        """Decode bytes-like or base64 image data to a BGR array, or None if it isn't an image."""
+        raw = to_bytes(data)
+        buf = np.frombuffer(raw, np.uint8)
+        info = probe(raw)
+        width, height, has_alpha, orientation = info if info else (0, 0, False, 1)
+
+        # Orientation is applied below so every OpenCV version behaves the same
+        flags = cv2.IMREAD_COLOR
+        if has_alpha:
+            flags = cv2.IMREAD_UNCHANGED
+        elif self.max_side:
+            for factor, reduced in _REDUCED_FLAGS:
+                if max(width, height) >= self.max_side * factor:
+                    flags = reduced
+                    break
+        image = cv2.imdecode(buf, flags | cv2.IMREAD_IGNORE_ORIENTATION)
+        if image is None:
+            return None
+
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        elif image.shape[2] == 4:
+            image = self._composite(image)
+
+        image = self._downscale(image)
+        return apply_orientation(image, orientation)
+
+    def _composite(self, bgra):
+        """Flatten transparency onto the background colour."""
+        alpha = bgra[:, :, 3:].astype(np.uint16)
+        blended = bgra[:, :, :3] * alpha
+        blended += self.background * (255 - alpha)
+        blended += 127
+        blended //= 255
+        return blended.astype(np.uint8)
+
+    def _downscale(self, image):
+        height, width = image.shape[:2]
+        if not self.max_side or max(height, width) <= self.max_side:
+            return image
+        scale = self.max_side / max(height, width)
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+
+        shape = (size[1], size[0], image.shape[2])
+        out = getattr(self._local, 'buffer', None)
+        if out is None or out.shape != shape:
+            out = self._local.buffer = np.empty(shape, dtype=np.uint8)
+        return cv2.resize(image, size, dst=out, interpolation=cv2.INTER_AREA)
@@ -0,0 +1,99 @@
+"""
+EmotionFAD - Live Video
+Scheduled frame analysis with compact results, shared by app_new.py and app_updated.py
+"""
+
+import logging
+import threading
+
+from emotion_analysis import compact_result
+from engine import engine
+from frame_scheduler import FrameScheduler
+
+logger = logging.getLogger('live_video')
+
+
+def parse_frame(data):
+    """(frame, frame_id) of a video_frame payload: binary, or {'frame' (or 'image'): base64/bytes, 'frame_id'}."""
+    if isinstance(data, dict):
+        return data.get('frame') or data.get('image'), data.get('frame_id')
+    return data, None
+
+
+class LiveVideo:
+    """video_frame handling for servers that answer with compact results.
+
+    Frames are queued on a latest-frame-wins FrameScheduler and analyzed by
+    background loops (started with the first frame) with the engine's FER
+    analyzer. Each client gets compact_result() on processed_frame, never
+    its frame back, and the session's risk_report when its largest face
+    changes it. Failures are logged; clients only get a generic error.
+    """
+
+    def __init__(self, socketio, sessions, max_fps=10.0, workers=1):
+        self.socketio = socketio
+        self.sessions = sessions
+        self.scheduler = FrameScheduler(max_fps=max_fps)
+        self.workers = workers
+        self._started = False
+        self._lock = threading.Lock()
+
+    def offer(self, sid, data):
+        """Queue a video_frame payload, replacing the client's waiting frame; returns an error for the client, or None."""
+        frame, frame_id = parse_frame(data)
+        if not frame:
+            return 'No frame provided'
+        self.scheduler.offer(sid, {'frame': frame, 'frame_id': frame_id})
+        self._start_workers()
+        return None
+
+    def remove(self, sid):
+        """Forget a disconnected client's waiting frame."""
+        self.scheduler.remove(sid)
+
+    def _start_workers(self):
+        with self._lock:
+            if self._started:
+                return
+            for _ in range(self.workers):
+                self.socketio.start_background_task(self._run)
+            self._started = True
+
+    def _run(self):
+        """Analyze queued frames forever, one client at a time."""
+        while True:
+            sid, message, queued_seconds = self.scheduler.next_frame()
+            if sid is None:
+                # Nothing ready: sleep until the next rate-limited client is due
+                self.socketio.sleep(min(queued_seconds, 0.05) if queued_seconds else 0.01)
+                continue
+
+            try:
+                self._analyze(sid, message, queued_seconds)
+            except Exception as e:
+                logger.error(f'Error processing video frame: {str(e)}')
+                self.socketio.emit('error', {'error': 'Failed to process video frame'}, to=sid)
+            finally:
+                self.scheduler.done(sid)
+
+            # Let the hub service other sockets between analyses
+            self.socketio.sleep(0)
+
+    def _analyze(self, sid, message, queued_seconds):
+        if engine.fer() is None:
+            self.socketio.emit('error', {'error': 'Emotion analyzer not initialized'}, to=sid)
+            return
+
+        session = self.sessions.get(sid)
+        sequence = self.sessions.next_sequence(sid)
+        result = engine.analyze_frame(
+            message['frame'], tracker=session['tracker'], detector=session['detector'],
+            session_id=sid, overlay=session['overlay']
+        )
+        reply = compact_result(result, sequence=sequence, frame_id=message['frame_id'])
+        reply['queued_ms'] = round(queued_seconds * 1000, 1)
+        reply['frames_dropped'] = self.scheduler.dropped(sid)
+        self.socketio.emit('processed_frame', reply, to=sid)
+        report = engine.fuse_frame(sid, result)
+        if report is not None:
+            self.socketio.emit('risk_report', report, to=sid)
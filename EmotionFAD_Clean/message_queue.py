@@ -0,0 +1,164 @@
+"""
+EmotionFAD - Socket.IO Message Queue
+Cross-worker event delivery, so a result emitted by any worker reaches the socket wherever it is connected
+"""
+
+import asyncio
+import json
+import os
+import queue
+import threading
+
+import socketio
+from socketio.async_pubsub_manager import AsyncPubSubManager
+
+DEFAULT_CHANNEL = 'emotionfad'
+
+
+class LocalBroker:
+    """In-process pub/sub hub standing in for Redis.
+
+    Every subscriber gets its own queue and sees every message published on
+    its channel, including its own (the managers skip those by host id, as
+    they do with Redis).
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        inbox = queue.Queue()
+        with self._lock:
+            self._subscribers.setdefault(channel, []).append(inbox)
+        return inbox
+
+    def unsubscribe(self, channel, inbox):
+        with self._lock:
+            subscribers = self._subscribers.get(channel, [])
+            if inbox in subscribers:
+                subscribers.remove(inbox)
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for inbox in subscribers:
+            inbox.put(message)
+        return len(subscribers)
+
+
+_brokers = {}
+_brokers_lock = threading.Lock()
+
+
+def get_broker(url='memory://'):
+    """Shared broker for a memory:// URL; servers using the same URL see each other's events."""
+    with _brokers_lock:
+        if url not in _brokers:
+            _brokers[url] = LocalBroker()
+        return _brokers[url]
+
+
+class MemoryManager(socketio.PubSubManager):
+    """Client manager for memory:// queues (several servers in one process, e.g. tests).
+
+    Messages are published as JSON, which PubSubManager decodes on every
+    supported python-socketio release, so anything that works here also
+    survives a real broker.
+    """
+
+    name = 'memory'
+
+    def __init__(self, url='memory://', channel=DEFAULT_CHANNEL, write_only=False, logger=None,
+                 poll_interval=0.005):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.broker = get_broker(url)
+        self.poll_interval = poll_interval
+        # Subscribe now so nothing published before the listener starts is lost
+        self.inbox = None if write_only else self.broker.subscribe(channel)
+
+    def _publish(self, data):
+        return self.broker.publish(self.channel, json.dumps(data))
+
+    def _listen(self):
+        # Polled rather than blocking so the listener never stalls an eventlet hub
+        while True:
+            try:
+                yield self.inbox.get_nowait()
+            except queue.Empty:
+                self.server.sleep(self.poll_interval)
+
+
+class AsyncMemoryManager(AsyncPubSubManager):
+    """memory:// client manager for the ASGI server."""
+
+    name = 'memory'
+
+    def __init__(self, url='memory://', channel=DEFAULT_CHANNEL, write_only=False, logger=None,
+                 poll_interval=0.005):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.broker = get_broker(url)
+        self.poll_interval = poll_interval
+        self.inbox = None if write_only else self.broker.subscribe(channel)
+
+    async def _publish(self, data):
+        return self.broker.publish(self.channel, json.dumps(data))
+
+    async def _listen(self):
+        while True:
+            try:
+                yield self.inbox.get_nowait()
+            except queue.Empty:
+                await asyncio.sleep(self.poll_interval)
+
+
+def queue_url():
+    """Message queue URL from FAD_MESSAGE_QUEUE, or None for a single worker."""
+    return os.environ.get('FAD_MESSAGE_QUEUE') or None
+
+
+def create_client_manager(url=None, async_mode=False, write_only=False, channel=None):
+    """Socket.IO client manager for a queue URL, or None when no queue is configured.
+
+    memory:// stays inside this process; redis:// (and rediss://) is the
+    production backend. In WSGI mode kafka://, zmq+tcp:// and any other
+    Kombu URL (amqp://, sqs://, ...) work too; ASGI mode also takes amqp://.
+    """
+    url = url if url is not None else queue_url()
+    if not url:
+        return None
+    channel = channel or os.environ.get('FAD_MESSAGE_QUEUE_CHANNEL', DEFAULT_CHANNEL)
+    scheme = url.split('://', 1)[0]
+
+    if scheme == 'memory':
+        manager_class = AsyncMemoryManager if async_mode else MemoryManager
+        return manager_class(url, channel=channel, write_only=write_only)
+    if scheme in ('redis', 'rediss', 'unix'):
+        manager_class = socketio.AsyncRedisManager if async_mode else socketio.RedisManager
+        return manager_class(url, channel=channel, write_only=write_only)
+    if async_mode:
+        if scheme in ('amqp', 'amqps'):
+            return socketio.AsyncAioPikaManager(url, channel=channel, write_only=write_only)
+        raise ValueError(f'Unsupported message queue for ASGI mode: {url}')
+    if scheme == 'kafka':
+        return socketio.KafkaManager(url, channel=channel, write_only=write_only)
+    if scheme.startswith('zmq'):
+        return socketio.ZmqManager(url, channel=channel, write_only=write_only)
+    return socketio.KombuManager(url, channel=channel, write_only=write_only)
+
+
+def create_emitter(url=None):
+    """Write-only manager for emitting to clients from outside a server (scripts, other services)."""
+    return create_client_manager(url, write_only=True)
+
+
+def socketio_transports():
+    """Engine.IO transports from FAD_SOCKETIO_TRANSPORTS (e.g. "websocket"), or None for the default.
+
+    Websocket-only connections never need sticky sessions, since each one
+    stays on the worker that accepted it.
+    """
+    value = os.environ.get('FAD_SOCKETIO_TRANSPORTS')
+    if not value:
+        return None
+    return [name.strip() for name in value.split(',') if name.strip()]
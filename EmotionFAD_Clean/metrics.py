@@ -0,0 +1,339 @@
+"""
+EmotionFAD - Metrics
+Per-stage timings and pipeline counters, exposed in the Prometheus text format on /metrics (FAD_METRICS=1)
+"""
+
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+FACES_BUCKETS = (0, 1, 2, 3, 5, 10)
+
+# List that stage() appends (stage, seconds, failed) to while a request is being profiled (see profiling.py)
+stage_trace = ContextVar('fad_stage_trace', default=None)
+
+
+def metrics_enabled():
+    return os.environ.get('FAD_METRICS', '0').strip().lower() not in ('', '0', 'false', 'no')
+
+
+def _label_text(names, values):
+    if not names:
+        return ''
+    escaped = (
+        str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        for value in values
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _histogram_lines(name, labelnames, labelvalues, cumulative, count, total):
+    """Sample lines of one histogram; cumulative is [(upper bound, cumulative count), ...] ending with +Inf."""
+    lines = []
+    for bound, value in cumulative:
+        labels = _label_text(labelnames + ('le',), labelvalues + (_format_value(bound),))
+        lines.append(f'{name}_bucket{labels} {value}')
+    labels = _label_text(labelnames, labelvalues)
+    lines.append(f'{name}_sum{labels} {_format_value(float(total))}')
+    lines.append(f'{name}_count{labels} {count}')
+    return lines
+
+
+class _Family:
+    def __init__(self, registry, name, help, kind, labelnames):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def header(self):
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(_Family):
+    def __init__(self, registry, name, help, labelnames=()):
+        super().__init__(registry, name, help, 'counter', labelnames)
+
+    def inc(self, amount=1, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return self.header() + [
+            f'{self.name}{_label_text(self.labelnames, key)} {_format_value(value)}' for key, value in values
+        ]
+
+
+class Histogram:
+    """Cumulative fixed-bucket histogram (also kept by components such as the micro-batcher)."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            index = len(self.buckets)
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """[(upper bound, cumulative count), ...] ending with +Inf."""
+        running = 0
+        pairs = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            running += count
+            pairs.append((bound, running))
+        return pairs
+
+    def snapshot(self):
+        return {
+            'buckets': {('+Inf' if bound == float('inf') else str(bound)): count for bound, count in self.cumulative()},
+            'count': self.count,
+            'sum': round(self.sum, 3),
+            'mean': round(self.sum / self.count, 3) if self.count else 0.0
+        }
+
+
+class HistogramFamily(_Family):
+    """Labelled histograms built on Histogram."""
+
+    def __init__(self, registry, name, help, buckets, labelnames=()):
+        super().__init__(registry, name, help, 'histogram', labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            histogram = self._values.get(key)
+            if histogram is None:
+                histogram = self._values[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            for key, histogram in sorted(self._values.items()):
+                lines += _histogram_lines(self.name, self.labelnames, key, histogram.cumulative(),
+                                          histogram.count, histogram.sum)
+        return lines
+
+
+class _StageTimer:
+    __slots__ = ('registry', 'stage', 'trace', 'started')
+
+    def __init__(self, registry, stage, trace):
+        self.registry = registry
+        self.stage = stage
+        self.trace = trace
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        self.registry.stage_seconds.observe(elapsed, stage=self.stage)
+        if exc_type is not None:
+            self.registry.stage_errors.inc(stage=self.stage)
+        if self.trace is not None:
+            self.trace.append((self.stage, elapsed, exc_type is not None))
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Registry:
+    """Metric families of this process plus collectors read at scrape time.
+
+    When disabled, stage() hands out one shared no-op context manager and
+    inc()/observe() return at once, so instrumented code pays about one
+    attribute check per call (stages of a request being profiled are still
+    timed into its stage_trace). Collectors turn the stats() dicts the
+    components already keep (caches, schedulers, pools) into samples only
+    when /metrics is read, so queue depths and cache counters cost nothing
+    on the request path.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._families = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self.stage_seconds = self.histogram(
+            'fad_stage_seconds', 'Time spent in each analysis stage', SECONDS_BUCKETS, ('stage',)
+        )
+        self.stage_errors = self.counter(
+            'fad_stage_errors_total', 'Exceptions raised inside each analysis stage', ('stage',)
+        )
+
+    def _register(self, family):
+        with self._lock:
+            return self._families.setdefault(family.name, family)
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(Counter(self, name, help, labelnames))
+
+    def histogram(self, name, help, buckets, labelnames=()):
+        return self._register(HistogramFamily(self, name, help, buckets, labelnames))
+
+    def stage(self, name):
+        """Context manager timing one pipeline stage (and counting exceptions escaping it)."""
+        trace = stage_trace.get()
+        if not self.enabled and trace is None:
+            return _NULL_TIMER
+        return _StageTimer(self, name, trace)
+
+    def register_stats(self, name, stats, counters=(), gauges=(), histograms=()):
+        """Export fields of a component's stats() dict as fad_<name>_<field> samples.
+
+        stats is a zero-argument callable returning the dict (or None while
+        the component is off); histograms are Histogram snapshots in that
+        dict.
+        """
+        with self._lock:
+            self._collectors.append((name, stats, counters, gauges, histograms))
+
+    def _collect(self):
+        lines = []
+        with self._lock:
+            collectors = list(self._collectors)
+        for name, stats, counters, gauges, histograms in collectors:
+            try:
+                values = stats()
+            except Exception:
+                continue
+            if not values:
+                continue
+            for field in counters:
+                if values.get(field) is not None:
+                    metric = f'fad_{name}_{field}_total'
+                    lines += [f'# TYPE {metric} counter', f'{metric} {_format_value(values[field])}']
+            for field in gauges:
+                if values.get(field) is not None:
+                    metric = f'fad_{name}_{field}'
+                    lines += [f'# TYPE {metric} gauge', f'{metric} {_format_value(values[field])}']
+            for field in histograms:
+                snapshot = values.get(field)
+                if snapshot:
+                    metric = f'fad_{name}_{field}'
+                    cumulative = [
+                        (float('inf') if bound == '+Inf' else float(bound), count)
+                        for bound, count in snapshot['buckets'].items()
+                    ]
+                    lines.append(f'# TYPE {metric} histogram')
+                    lines += _histogram_lines(metric, (), (), cumulative, snapshot['count'], snapshot['sum'])
+        return lines
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            families = list(self._families.values())
+        lines = []
+        for family in families:
+            lines += family.render()
+        lines += self._collect()
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Registry(enabled=metrics_enabled())
+
+FRAMES = metrics.counter(
+    'fad_frames_total', 'Analyzed frames and images by engine and outcome (faces, no_faces, error)',
+    ('engine', 'outcome')
+)
+FACES = metrics.histogram('fad_faces_per_frame', 'Faces found per analyzed frame', FACES_BUCKETS, ('engine',))
+HTTP_REQUESTS = metrics.counter(
+    'fad_http_requests_total', 'HTTP requests by route, method and status code', ('route', 'method', 'status')
+)
+HTTP_SECONDS = metrics.histogram(
+    'fad_http_request_seconds', 'HTTP request handling time by route', SECONDS_BUCKETS, ('route',)
+)
+
+
+def stage(name):
+    return metrics.stage(name)
+
+
+def record_frame(engine, outcome, faces=0):
+    """Count one analyzed frame ('faces', 'no_faces' or 'error') and how many faces it had."""
+    if not metrics.enabled:
+        return
+    FRAMES.inc(engine=engine, outcome=outcome)
+    if outcome != 'error':
+        FACES.observe(faces, engine=engine)
+
+
+def record_request(route, method, status, seconds):
+    if not metrics.enabled:
+        return
+    HTTP_REQUESTS.inc(route=route, method=method, status=status)
+    HTTP_SECONDS.observe(seconds, route=route)
+
+
+def instrument_flask(app):
+    """Time and count every request of a Flask app by its URL rule (not the raw path)."""
+    if not metrics.enabled:
+        return
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            record_request(route, request.method, response.status_code, time.perf_counter() - started)
+        return response
+
+
+def metrics_response():
+    """(body, status, headers) for a /metrics route; 404 while metrics are off."""
+    if not metrics.enabled:
+        return 'Metrics are disabled; set FAD_METRICS=1\n', 404, {'Content-Type': 'text/plain; charset=utf-8'}
+    return metrics.render(), 200, {'Content-Type': CONTENT_TYPE}
@@ -0,0 +1,126 @@
+"""
+EmotionFAD - Micro-Batching Scheduler
+Collects face crops from concurrent callers and runs one batched model call per window
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from metrics import Histogram
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+LATENCY_MS_BUCKETS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+class MicroBatcher:
+    """Group individual inference requests into batches.
+
+    submit() enqueues one item and returns a Future. A background thread takes
+    the first waiting item, keeps collecting until max_batch_size items are
+    queued or max_wait_ms has passed, then calls batch_fn(items) once and hands
+    result i back to caller i.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=16, max_wait_ms=10.0, name='batcher'):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_latency_ms = Histogram(LATENCY_MS_BUCKETS)
+        self.batch_latency_ms = Histogram(LATENCY_MS_BUCKETS)
+        self.errors = 0
+
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f'{name}-microbatch', daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_env(cls, batch_fn, name='batcher'):
+        """Build a batcher from FAD_MICROBATCH_* settings, or None when disabled."""
+        window_ms = float(os.environ.get('FAD_MICROBATCH_WINDOW_MS', 0))
+        if window_ms <= 0:
+            return None
+        max_size = int(os.environ.get('FAD_MICROBATCH_SIZE', 16))
+        return cls(batch_fn, max_batch_size=max_size, max_wait_ms=window_ms, name=name)
+
+    def submit(self, item):
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def process(self, item, timeout=None):
+        """Submit one item and wait for its result."""
+        return self.submit(item).result(timeout=timeout)
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._running = False
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while self._running:
+            batch = self._collect()
+            if batch is None:
+                break
+
+            items = [item for item, _, _ in batch]
+            started = time.perf_counter()
+            try:
+                results = self.batch_fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError(f'{self.name} returned {len(results)} results for {len(items)} items')
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            finished = time.perf_counter()
+
+            with self._lock:
+                self.batch_sizes.observe(len(items))
+                self.batch_latency_ms.observe((finished - started) * 1000)
+                for _, _, enqueued in batch:
+                    self.queue_latency_ms.observe((started - enqueued) * 1000)
+
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'pending': self._queue.qsize(),
+                'errors': self.errors,
+                'batch_size': self.batch_sizes.snapshot(),
+                'queue_latency_ms': self.queue_latency_ms.snapshot(),
+                'batch_latency_ms': self.batch_latency_ms.snapshot()
+            }
+
+    def stop(self):
+        self._running = False
+        self._queue.put(None)
+        self._thread.join(timeout=5)
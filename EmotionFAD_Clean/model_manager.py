@@ -0,0 +1,163 @@
+"""
+EmotionFAD - Model Lifecycle Manager
+Loads and warms every model once per process and reports readiness
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+logger = logging.getLogger('model_manager')
+
+
+class ModelManager:
+    """Registry of named models with eager loading, warm-up and status reporting.
+
+    Servers register a loader (and optional warm-up) for each model they use and
+    load them at import time, or, under gunicorn, once in each worker after
+    it forks (TensorFlow must not be loaded before a fork). A model that
+    fails to load is not retried by get() until its backoff has passed, so
+    a broken model costs one failed load per backoff period rather than one
+    per request.
+    """
+
+    def __init__(self, retry_seconds=None, max_retry_seconds=600.0):
+        self._entries = {}
+        # Guards the registry only; each entry has its own lock held while it loads
+        self._lock = threading.Lock()
+        if retry_seconds is None:
+            retry_seconds = float(os.environ.get('FAD_MODEL_RETRY_SECONDS', 30))
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+
+    def register(self, name, loader, warm_up=None):
+        """Register a model; loader() returns it and warm_up(model) runs a dummy inference."""
+        with self._lock:
+            if name in self._entries:
+                return
+            self._entries[name] = {
+                'loader': loader,
+                'warm_up': warm_up,
+                'model': None,
+                'state': 'registered',
+                'error': None,
+                'load_seconds': None,
+                'warm_up_seconds': None,
+                'failures': 0,
+                'retry_at': None,
+                'lock': threading.Lock()
+            }
+
+    def load(self, name, warm_up=True, force=False):
+        """Load (and optionally warm) one model; returns it or None on failure.
+
+        A model that failed recently is not retried before its backoff has
+        passed unless force is set.
+        """
+        entry = self._entries[name]
+        with entry['lock']:
+            if entry['state'] == 'ready':
+                return entry['model']
+            if not force and entry['state'] == 'failed' and time.monotonic() < entry['retry_at']:
+                return None
+
+            entry['state'] = 'loading'
+            try:
+                started = time.perf_counter()
+                model = entry['loader']()
+                entry['load_seconds'] = round(time.perf_counter() - started, 3)
+
+                if warm_up and entry['warm_up'] is not None:
+                    started = time.perf_counter()
+                    entry['warm_up'](model)
+                    entry['warm_up_seconds'] = round(time.perf_counter() - started, 3)
+
+                entry['model'] = model
+                entry['error'] = None
+                entry['failures'] = 0
+                entry['retry_at'] = None
+                entry['state'] = 'ready'
+                logger.info(f"Model '{name}' ready (load {entry['load_seconds']}s, warm-up {entry['warm_up_seconds']}s)")
+            except Exception as e:
+                entry['failures'] += 1
+                backoff = min(self.retry_seconds * 2 ** (entry['failures'] - 1), self.max_retry_seconds)
+                entry['retry_at'] = time.monotonic() + backoff
+                entry['error'] = str(e)
+                entry['state'] = 'failed'
+                logger.error(f"Failed to load model '{name}': {str(e)} (next attempt in {backoff:.0f}s)")
+                return None
+            return entry['model']
+
+    def load_all(self, warm_up=True):
+        """Load every registered model; returns True when all of them are ready."""
+        for name in list(self._entries):
+            self.load(name, warm_up=warm_up)
+        return self.ready
+
+    def warm_up_all(self):
+        """Re-run warm-up inference on every loaded model."""
+        for name, entry in list(self._entries.items()):
+            if entry['state'] == 'ready' and entry['warm_up'] is not None:
+                try:
+                    entry['warm_up'](entry['model'])
+                except Exception as e:
+                    logger.error(f"Warm-up of model '{name}' failed: {str(e)}")
+
+    def get(self, name):
+        """Return a loaded model, loading it on demand if boot-time loading was skipped.
+
+        Returns None without retrying while a failed model's backoff lasts.
+        """
+        entry = self._entries.get(name)
+        if entry is None:
+            raise KeyError(f"Model '{name}' is not registered")
+        if entry['state'] == 'ready':
+            return entry['model']
+        return self.load(name)
+
+    def is_ready(self, name):
+        entry = self._entries.get(name)
+        return entry is not None and entry['state'] == 'ready'
+
+    @property
+    def ready(self):
+        return all(entry['state'] == 'ready' for entry in list(self._entries.values()))
+
+    @property
+    def healthy(self):
+        """False while a model is loading or after one failed to load."""
+        return not any(entry['state'] in ('loading', 'failed') for entry in list(self._entries.values()))
+
+    def status(self):
+        now = time.monotonic()
+        return {
+            name: {
+                'state': entry['state'],
+                'load_seconds': entry['load_seconds'],
+                'warm_up_seconds': entry['warm_up_seconds'],
+                'error': entry['error'],
+                'retry_in_seconds': round(max(0.0, entry['retry_at'] - now), 1) if entry['state'] == 'failed' else None
+            }
+            for name, entry in list(self._entries.items())
+        }
+
+
+def preload_enabled():
+    """Whether models should load at import time in this process.
+
+    Disabled with FAD_PRELOAD_MODELS=0; skipped in multiprocessing children
+    (e.g. facial workers re-importing the app), which load their own, and
+    when FAD_LOAD_MODELS_AFTER_FORK=1 (set by gunicorn.conf.py), where each
+    worker calls models.load_all() after forking instead.
+    """
+    if os.environ.get('FAD_PRELOAD_MODELS', '1') == '0':
+        return False
+    if os.environ.get('FAD_LOAD_MODELS_AFTER_FORK', '0') == '1':
+        return False
+    return multiprocessing.parent_process() is None
+
+
+# Shared by every server module imported into the same process
+models = ModelManager()
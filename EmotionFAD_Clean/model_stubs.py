@@ -0,0 +1,132 @@
+"""
+EmotionFAD - Model Stubs
+Deterministic stand-ins for FER and DeepFace (FAD_MODEL_BACKEND=stub), so servers can be load tested without TensorFlow
+"""
+
+import os
+import time
+import zlib
+
+import numpy as np
+
+from emotion_timeline import EMOTION_LABELS
+
+
+def model_backend():
+    """'stub' or 'real' (the default), from FAD_MODEL_BACKEND."""
+    return os.environ.get('FAD_MODEL_BACKEND', 'real').strip().lower() or 'real'
+
+
+class StubLatency:
+    """Simulated inference cost: base_ms per model call plus per_face_ms per face in it.
+
+    By default the call sleeps, which frees the CPU like inference offloaded
+    to a native library; busy=True spins instead, so the simulated model
+    consumes CPU and holds the interpreter like a model running inline.
+    """
+
+    def __init__(self, base_ms=40.0, per_face_ms=5.0, busy=False):
+        self.base_ms = base_ms
+        self.per_face_ms = per_face_ms
+        self.busy = busy
+
+    @classmethod
+    def from_env(cls):
+        """Latency from FAD_STUB_LATENCY_MS / FAD_STUB_PER_FACE_MS / FAD_STUB_BUSY."""
+        return cls(
+            base_ms=float(os.environ.get('FAD_STUB_LATENCY_MS', 40)),
+            per_face_ms=float(os.environ.get('FAD_STUB_PER_FACE_MS', 5)),
+            busy=os.environ.get('FAD_STUB_BUSY', '0') not in ('', '0', 'false', 'no')
+        )
+
+    def wait(self, faces=1):
+        seconds = (self.base_ms + self.per_face_ms * faces) / 1000.0
+        if seconds <= 0:
+            return
+        if self.busy:
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                pass
+        else:
+            time.sleep(seconds)
+
+
+def stub_probabilities(image):
+    """Emotion probabilities (EMOTION_LABELS order) fixed by the image content: same frame, same scores."""
+    sample = np.ascontiguousarray(image[::16, ::16])
+    weights = np.random.default_rng(zlib.crc32(sample.tobytes())).random(len(EMOTION_LABELS)) ** 3
+    return weights / weights.sum()
+
+
+def stub_face_box(image):
+    """One centred (x, y, w, h) face box, or None for a blank frame (like the warm-up image)."""
+    if image.size == 0 or float(image[::8, ::8].std()) < 2.0:
+        return None
+    height, width = image.shape[:2]
+    side = min(width, height) // 2
+    return (width - side) // 2, (height - side) // 2, side, side
+
+
+class StubFER:
+    """The parts of fer.FER that EmotionAnalyzer uses (detect_emotions, find_faces)."""
+
+    def __init__(self, mtcnn=False, latency=None):
+        self.latency = latency or StubLatency.from_env()
+
+    def find_faces(self, img, bgr=True):
+        box = stub_face_box(img)
+        return [] if box is None else [box]
+
+    def detect_emotions(self, img, face_rectangles=None):
+        if face_rectangles is None:
+            face_rectangles = self.find_faces(img)
+        self.latency.wait(len(face_rectangles))
+        results = []
+        for x, y, w, h in face_rectangles:
+            crop = img[max(0, y):y + h, max(0, x):x + w]
+            probabilities = stub_probabilities(crop if crop.size else img)
+            results.append({
+                'box': [int(x), int(y), int(w), int(h)],
+                # FER reports rounded probabilities
+                'emotions': {label: round(float(p), 2) for label, p in zip(EMOTION_LABELS, probabilities)}
+            })
+        return results
+
+
+class StubEmotionModel:
+    """Batched emotion classifier with the Keras predict() signature."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def predict(self, batch, verbose=0):
+        self.latency.wait(len(batch))
+        return np.stack([stub_probabilities(face) for face in batch]).astype(np.float32)
+
+
+class StubDeepFace:
+    """Module-like stand-in for deepface.DeepFace (analyze, build_model)."""
+
+    def __init__(self, latency=None):
+        self.latency = latency or StubLatency.from_env()
+
+    def analyze(self, img_path, actions=('emotion',), detector_backend='opencv', enforce_detection=True,
+                silent=False, **kwargs):
+        self.latency.wait(1)
+        box = stub_face_box(img_path)
+        if box is None:
+            if enforce_detection:
+                raise ValueError('Face could not be detected.')
+            # DeepFace falls back to the whole image
+            box = (0, 0, img_path.shape[1], img_path.shape[0])
+        emotion = {label: float(p) * 100 for label, p in zip(EMOTION_LABELS, stub_probabilities(img_path))}
+        x, y, w, h = box
+        return [{
+            'emotion': emotion,
+            'dominant_emotion': max(emotion, key=emotion.get),
+            'region': {'x': int(x), 'y': int(y), 'w': int(w), 'h': int(h)},
+            'face_confidence': 1.0
+        }]
+
+    def build_model(self, *args, **kwargs):
+        return StubEmotionModel(self.latency)
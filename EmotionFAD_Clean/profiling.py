@@ -0,0 +1,400 @@
+"""
+EmotionFAD - Request Profiling
+Opt-in cProfile sampling and slow-request stack capture, written to a rotating local directory (FAD_PROFILE_*)
+"""
+
+import _thread
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+
+from metrics import stage_trace
+
+PROFILE_ID = re.compile(r'^[A-Za-z0-9_.-]+$')
+
+
+def _real_modules():
+    """threading, _thread and time as the OS provides them, even when eventlet has monkey-patched them.
+
+    Under eventlet the stack sampler must be a real thread (a green one
+    never runs while a frame is being analyzed), and requests must be keyed
+    by OS thread id, which is what sys._current_frames() reports.
+    """
+    if 'eventlet' in sys.modules:
+        from eventlet import patcher
+        if patcher.is_monkey_patched('thread'):
+            return patcher.original('threading'), patcher.original('_thread'), patcher.original('time')
+    return threading, _thread, time
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f'{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}'
+
+
+class StackSampler:
+    """Samples the Python stacks of watched threads every interval seconds, from its own OS thread.
+
+    Stacks are kept in collapsed form ("outer;inner;leaf" -> count), which
+    flame graph tools read directly. Under eventlet all green threads share
+    one OS thread, so samples show whichever one was running; during a stall
+    inside a model call that is the stalled frame worker.
+    """
+
+    def __init__(self, interval=0.01, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self._watched = {}
+        self._threading, self._thread_module, self._time = _real_modules()
+        self._lock = self._threading.Lock()
+        self._thread = None
+
+    def current_thread_id(self):
+        return self._thread_module.get_ident()
+
+    def watch(self, thread_id):
+        """Start collecting stacks for a thread; returns the dict they accumulate in."""
+        stacks = {}
+        with self._lock:
+            if self._thread is None:
+                self._thread = self._threading.Thread(target=self._run, name='fad-stack-sampler', daemon=True)
+                self._thread.start()
+            self._watched.setdefault(thread_id, []).append(stacks)
+        return stacks
+
+    def unwatch(self, thread_id, stacks):
+        with self._lock:
+            watchers = self._watched.get(thread_id, [])
+            if stacks in watchers:
+                watchers.remove(stacks)
+            if not watchers:
+                self._watched.pop(thread_id, None)
+
+    def _run(self):
+        while True:
+            self._time.sleep(self.interval)
+            with self._lock:
+                if not self._watched:
+                    continue
+                watched = {thread_id: list(watchers) for thread_id, watchers in self._watched.items()}
+            frames = sys._current_frames()
+            for thread_id, watchers in watched.items():
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                labels = []
+                while frame is not None and len(labels) < self.max_depth:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                collapsed = ';'.join(reversed(labels))
+                for stacks in watchers:
+                    stacks[collapsed] = stacks.get(collapsed, 0) + 1
+
+
+class _ActiveProfile:
+    __slots__ = ('kind', 'name', 'info', 'started', 'wall_time', 'trace', 'token', 'profiler', 'thread_id', 'stacks')
+
+
+class RequestProfiler:
+    """Profiles a random sample of requests, and captures stacks of any request slower than slow_ms.
+
+    A sampled request runs under cProfile. While slow capture is on, every
+    request's thread is also watched by the stack sampler, and the samples
+    are kept only if the request turns out slow. Each kept profile is one
+    JSON file with the request's stage timings (see metrics.stage), the top
+    cProfile functions and the collapsed stacks, plus a .prof file for
+    sampled requests; the oldest files are deleted beyond keep.
+    """
+
+    def __init__(self, directory='profiles', sample_rate=0.0, slow_ms=0.0, keep=100, interval_ms=10.0, top=40):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.keep = keep
+        self.top = top
+        self.sampler = StackSampler(interval=interval_ms / 1000.0) if slow_ms > 0 else None
+        self.written = 0
+        self.write_errors = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Profiler from FAD_PROFILE_SAMPLE_PERCENT / _SLOW_MS / _DIR / _KEEP / _INTERVAL_MS (off by default)."""
+        return cls(
+            directory=os.environ.get('FAD_PROFILE_DIR', 'profiles'),
+            sample_rate=float(os.environ.get('FAD_PROFILE_SAMPLE_PERCENT', 0)) / 100.0,
+            slow_ms=float(os.environ.get('FAD_PROFILE_SLOW_MS', 0)),
+            keep=int(os.environ.get('FAD_PROFILE_KEEP', 100)),
+            interval_ms=float(os.environ.get('FAD_PROFILE_INTERVAL_MS', 10))
+        )
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0 or self.slow_ms > 0
+
+    def start(self, kind, name, **info):
+        """Begin profiling the current request, or return None if it is neither sampled nor watched."""
+        if not self.enabled:
+            return None
+        active = _ActiveProfile()
+        active.kind = kind
+        active.name = name
+        active.info = info
+        active.wall_time = time.time()
+        active.trace = []
+        active.token = stage_trace.set(active.trace)
+        active.profiler = None
+        active.thread_id = None
+        active.stacks = None
+        if self.sampler is not None:
+            active.thread_id = self.sampler.current_thread_id()
+            active.stacks = self.sampler.watch(active.thread_id)
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            active.profiler = cProfile.Profile()
+            try:
+                active.profiler.enable()
+            except ValueError:
+                # Another profiler is already running on this thread
+                active.profiler = None
+        active.started = time.perf_counter()
+        return active
+
+    def finish(self, active, error=None):
+        """End a request started with start(); keeps its profile if it was sampled or slow."""
+        if active is None:
+            return None
+        duration_ms = (time.perf_counter() - active.started) * 1000
+        if active.profiler is not None:
+            active.profiler.disable()
+        if active.stacks is not None:
+            self.sampler.unwatch(active.thread_id, active.stacks)
+        stage_trace.reset(active.token)
+
+        slow = self.slow_ms > 0 and duration_ms >= self.slow_ms
+        if active.profiler is None and not slow:
+            return None
+        record = self._record(active, duration_ms, slow, error)
+        try:
+            self._write(record, active.profiler)
+        except OSError as e:
+            self.write_errors += 1
+            print(f"❌ Could not write profile: {str(e)}")
+            return None
+        return record['id']
+
+    def profile(self, kind, name, **info):
+        """Context manager form of start()/finish()."""
+        return _ProfileContext(self, kind, name, info)
+
+    def call(self, kind, name, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) as one profiled request (e.g. on an inference thread)."""
+        with self.profile(kind, name):
+            return fn(*args, **kwargs)
+
+    def _record(self, active, duration_ms, slow, error):
+        stages = [
+            {'stage': name, 'ms': round(seconds * 1000, 3), 'failed': failed}
+            for name, seconds, failed in active.trace
+        ]
+        stage_totals = {}
+        for item in stages:
+            stage_totals[item['stage']] = round(stage_totals.get(item['stage'], 0.0) + item['ms'], 3)
+
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', active.name).strip('_')[:40] or 'request'
+        # Timestamp first (to the millisecond) so file names sort oldest to newest for rotation
+        profile_id = '{}-{}-{}-{}ms-{:06x}'.format(
+            datetime.fromtimestamp(active.wall_time).strftime('%Y%m%d-%H%M%S-%f')[:-3],
+            active.kind, slug, int(duration_ms), random.getrandbits(24)
+        )
+
+        record = {
+            'id': profile_id,
+            'kind': active.kind,
+            'name': active.name,
+            'started': datetime.fromtimestamp(active.wall_time).isoformat(),
+            'duration_ms': round(duration_ms, 3),
+            'slow': slow,
+            'sampled': active.profiler is not None,
+            'error': str(error) if error is not None else None,
+            'info': active.info,
+            'stages': stages,
+            'stage_totals_ms': stage_totals,
+            'unstaged_ms': round(duration_ms - sum(stage_totals.values()), 3),
+            'cprofile': None,
+            'stack_samples': sum(active.stacks.values()) if active.stacks else 0,
+            'stacks': None
+        }
+        if active.profiler is not None:
+            out = io.StringIO()
+            pstats.Stats(active.profiler, stream=out).sort_stats('cumulative').print_stats(self.top)
+            record['cprofile'] = out.getvalue()
+        if active.stacks:
+            record['stacks'] = dict(sorted(active.stacks.items(), key=lambda item: -item[1]))
+        return record
+
+    def _write(self, record, profiler):
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, record['id'])
+        if profiler is not None:
+            profiler.dump_stats(base + '.prof')
+        with open(base + '.json.tmp', 'w', encoding='utf-8') as f:
+            json.dump(record, f, default=str)
+        os.replace(base + '.json.tmp', base + '.json')
+        with self._lock:
+            self.written += 1
+            self._rotate()
+        print(f"🔬 Profile saved: {record['id']} ({record['duration_ms']:.0f} ms)")
+
+    def _rotate(self):
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith('.json'))
+        for name in names[:max(0, len(names) - self.keep)]:
+            base = os.path.join(self.directory, name[:-len('.json')])
+            for path in (base + '.json', base + '.prof'):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def recent(self, limit=20, slow_only=False):
+        """Summaries of the newest kept profiles, newest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        summaries = []
+        for name in sorted((name for name in os.listdir(self.directory) if name.endswith('.json')), reverse=True):
+            record = self.load(name[:-len('.json')])
+            if record is None or (slow_only and not record['slow']):
+                continue
+            summaries.append({key: record[key] for key in (
+                'id', 'kind', 'name', 'started', 'duration_ms', 'slow', 'sampled', 'error', 'stage_totals_ms'
+            )})
+            if len(summaries) >= limit:
+                break
+        return summaries
+
+    def load(self, profile_id):
+        """The full record of a kept profile, or None."""
+        if not PROFILE_ID.match(profile_id):
+            return None
+        try:
+            with open(os.path.join(self.directory, profile_id + '.json'), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def pstats_path(self, profile_id):
+        """Path of the raw cProfile dump (for snakeviz / pstats), or None."""
+        if not PROFILE_ID.match(profile_id):
+            return None
+        path = os.path.join(self.directory, profile_id + '.prof')
+        return path if os.path.exists(path) else None
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'sample_percent': self.sample_rate * 100,
+            'slow_ms': self.slow_ms or None,
+            'directory': self.directory,
+            'written': self.written,
+            'write_errors': self.write_errors
+        }
+
+
+class _ProfileContext:
+    __slots__ = ('profiler', 'kind', 'name', 'info', 'active')
+
+    def __init__(self, profiler, kind, name, info):
+        self.profiler = profiler
+        self.kind = kind
+        self.name = name
+        self.info = info
+
+    def __enter__(self):
+        self.active = self.profiler.start(self.kind, self.name, **self.info)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler.finish(self.active, error=exc)
+        return False
+
+
+profiler = RequestProfiler.from_env()
+
+
+def instrument_flask(app, methods=('POST',)):
+    """Profile a Flask app's requests with the given methods (the analysis endpoints)."""
+    if not profiler.enabled:
+        return
+    from flask import g, request
+
+    @app.before_request
+    def _start_profile():
+        if request.method in methods:
+            name = request.url_rule.rule if request.url_rule is not None else request.path
+            g.request_profile = profiler.start('http', name, method=request.method,
+                                               content_length=request.content_length)
+
+    @app.teardown_request
+    def _finish_profile(error=None):
+        active = g.pop('request_profile', None)
+        if active is not None:
+            profiler.finish(active, error=error)
+
+
+def admin_authorized(headers):
+    """True if the request carries FAD_ADMIN_TOKEN (X-Admin-Token or a Bearer token); False without a token set."""
+    token = os.environ.get('FAD_ADMIN_TOKEN')
+    if not token:
+        return False
+    offered = headers.get('X-Admin-Token') or ''
+    authorization = headers.get('Authorization') or ''
+    if not offered and authorization.startswith('Bearer '):
+        offered = authorization[len('Bearer '):]
+    return hmac.compare_digest(offered.encode('utf-8'), token.encode('utf-8'))
+
+
+def admin_profiles_response(args, headers):
+    """(body, status, headers) for GET /admin/profiles; ?slow=1 keeps slow requests only, ?limit= caps the list."""
+    if not admin_authorized(headers):
+        return {'success': False, 'error': 'Not found'}, 404, {}
+    try:
+        limit = max(1, min(int(args.get('limit', 20)), 500))
+    except ValueError:
+        return {'success': False, 'error': 'limit must be an integer'}, 400, {}
+    slow_only = args.get('slow', '0') not in ('', '0', 'false', 'no')
+    return {
+        'success': True,
+        'profiler': profiler.stats(),
+        'profiles': profiler.recent(limit=limit, slow_only=slow_only)
+    }, 200, {}
+
+
+def admin_profile_response(profile_id, args, headers):
+    """(body, status, headers) for GET /admin/profiles/<id>; ?format=pstats returns the raw .prof, collapsed the stacks."""
+    if not admin_authorized(headers):
+        return {'success': False, 'error': 'Not found'}, 404, {}
+    record = profiler.load(profile_id)
+    if record is None:
+        return {'success': False, 'error': 'Unknown profile'}, 404, {}
+    output = args.get('format', 'json')
+    if output == 'collapsed':
+        lines = [f'{stack} {count}' for stack, count in (record['stacks'] or {}).items()]
+        return '\n'.join(lines) + '\n', 200, {'Content-Type': 'text/plain; charset=utf-8'}
+    if output == 'pstats':
+        path = profiler.pstats_path(profile_id)
+        if path is None:
+            return {'success': False, 'error': 'Profile was not sampled with cProfile'}, 404, {}
+        with open(path, 'rb') as f:
+            return f.read(), 200, {
+                'Content-Type': 'application/octet-stream',
+                'Content-Disposition': f'attachment; filename="{profile_id}.prof"'
+            }
+    return {'success': True, 'profile': record}, 200, {}
@@ -0,0 +1,225 @@
+"""
+EmotionFAD - Report Fusion
+Keeps the latest facial, text and voice analysis per session and pushes an updated comprehensive report when one changes
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from risk_scoring import (
+    facial_report_component, text_report_component, voice_report_component, assess_risk
+)
+
+
+# Sent first on every stream: browsers reconnect after this many milliseconds
+SSE_PREAMBLE = 'retry: 3000\n\n'
+# Comment line that keeps idle streams open through proxies
+SSE_KEEPALIVE = ': keep-alive\n\n'
+
+
+def sse_event(report):
+    """A report as a server-sent 'report' event."""
+    return f"event: report\nid: {report['sequence']}\ndata: {json.dumps(report)}\n\n"
+
+
+def session_token(secret, session_id):
+    """Token handed to the owner of session_id; subscribing to its reports requires it."""
+    return hmac.new(secret.encode('utf-8'), session_id.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def valid_session_token(secret, session_id, token):
+    return bool(token) and hmac.compare_digest(session_token(secret, session_id), token)
+
+
+class Mailbox:
+    """Single-slot, latest-wins hand-off of reports to one blocking listener (e.g. an SSE stream).
+
+    A slow listener never backs up the publisher: a newer report simply
+    replaces one that hasn't been read yet, and each report is complete.
+    """
+
+    def __init__(self):
+        self._report = None
+        self._condition = threading.Condition()
+
+    def put(self, report):
+        with self._condition:
+            self._report = report
+            self._condition.notify()
+
+    def get(self, timeout=None):
+        """Next report, or None if none arrived within timeout."""
+        with self._condition:
+            if self._report is None:
+                self._condition.wait(timeout)
+            report, self._report = self._report, None
+            return report
+
+
+class _SessionState:
+    __slots__ = ('facial', 'text', 'voice', 'facial_part', 'text_part', 'voice_part', 'sequence', 'report', 'last_seen')
+
+    def __init__(self):
+        self.facial = None
+        self.text = None
+        self.voice = None
+        self.facial_part = (0, [])
+        self.text_part = (0, [])
+        self.voice_part = (0, [])
+        self.sequence = 0
+        self.report = None
+        self.last_seen = time.monotonic()
+
+
+class ReportFusion:
+    """Session-keyed comprehensive reports, recomputed incrementally.
+
+    Each input keeps its own (risk contribution, risk factors) from
+    risk_scoring; a new facial result only rescores the facial part,
+    a new text result only the text part (likewise voice), and the overall
+    risk is their sum. Reports carry only the compact scores, not the analyses themselves.
+    """
+
+    def __init__(self, max_sessions=1000, idle_seconds=300):
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self._sessions = OrderedDict()
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self.published = 0
+
+    @classmethod
+    def from_env(cls):
+        """Fusion sized like the session timelines (FAD_SESSION_MAX / FAD_SESSION_IDLE_SECONDS)."""
+        return cls(
+            max_sessions=int(os.environ.get('FAD_SESSION_MAX', 1000)),
+            idle_seconds=float(os.environ.get('FAD_SESSION_IDLE_SECONDS', 300))
+        )
+
+    def update_facial(self, session_id, result):
+        """Fold in a facial result (with its 'temporal' view, if any) and publish the new report."""
+        if not session_id or not result.get('success'):
+            return None
+        temporal = result.get('temporal')
+        scores = temporal or result
+        facial = {
+            'dominant_emotion': result.get('dominant_emotion'),
+            'stress_level': float(scores['stress_level']),
+            'deception_risk': float(scores['deception_risk']),
+            'mental_health_score': float(scores['mental_health_score']),
+            'smoothed': temporal is not None,
+            'sudden_changes': temporal['sudden_changes'] if temporal else 0
+        }
+        part = facial_report_component(result, temporal)
+        return self._update(session_id, 'facial', facial, part)
+
+    def update_text(self, session_id, result):
+        """Fold in a text result and publish the new report."""
+        if not session_id or not result.get('success'):
+            return None
+        text = {
+            'fraud_risk_score': float(result['fraud_risk_score']),
+            'sentiment_category': result['sentiment_category'],
+            'is_suspicious': bool(result['is_suspicious'])
+        }
+        part = text_report_component(result)
+        return self._update(session_id, 'text', text, part)
+
+    def update_voice(self, session_id, result):
+        """Fold in a voice_analysis result (vocal stress) and publish the new report."""
+        if not session_id or not result.get('success'):
+            return None
+        voice = {
+            'stress_level': result['stress_level'],
+            'calibrated': result['calibrated'],
+            'pitch_hz': result['features']['pitch_hz'],
+            'speaking_rate': result['features']['speaking_rate']
+        }
+        part = voice_report_component(result)
+        return self._update(session_id, 'voice', voice, part)
+
+    def _update(self, session_id, source, summary, part):
+        with self._lock:
+            self._evict_idle()
+            state = self._sessions.get(session_id)
+            if state is None:
+                if len(self._sessions) >= self.max_sessions:
+                    self._sessions.popitem(last=False)
+                state = self._sessions[session_id] = _SessionState()
+            else:
+                self._sessions.move_to_end(session_id)
+
+            if source == 'facial':
+                state.facial, state.facial_part = summary, part
+            elif source == 'voice':
+                state.voice, state.voice_part = summary, part
+            else:
+                state.text, state.text_part = summary, part
+            state.sequence += 1
+            state.last_seen = time.monotonic()
+
+            overall_risk = float(state.facial_part[0] + state.text_part[0] + state.voice_part[0])
+            risk_level, recommendation = assess_risk(overall_risk)
+            state.report = {
+                'success': True,
+                'session_id': session_id,
+                'sequence': state.sequence,
+                'updated': source,
+                'overall_risk_score': overall_risk,
+                'risk_level': risk_level,
+                'risk_factors': state.facial_part[1] + state.text_part[1] + state.voice_part[1],
+                'recommendation': recommendation,
+                'facial': state.facial,
+                'text': state.text,
+                'voice': state.voice,
+                'timestamp': datetime.now().isoformat()
+            }
+            report = state.report
+            subscribers = list(self._subscribers.get(session_id, {}).values())
+            self.published += 1
+
+        for deliver in subscribers:
+            deliver(report)
+        return report
+
+    def latest(self, session_id):
+        with self._lock:
+            state = self._sessions.get(session_id)
+            return state.report if state is not None else None
+
+    def subscribe(self, session_id, deliver):
+        """Call deliver(report) (from the publishing thread) on every new report; returns a token."""
+        token = object()
+        with self._lock:
+            self._subscribers.setdefault(session_id, {})[token] = deliver
+        return token
+
+    def unsubscribe(self, session_id, token):
+        with self._lock:
+            subscribers = self._subscribers.get(session_id)
+            if subscribers is not None:
+                subscribers.pop(token, None)
+                if not subscribers:
+                    del self._subscribers[session_id]
+
+    def _evict_idle(self):
+        cutoff = time.monotonic() - self.idle_seconds
+        while self._sessions:
+            session_id, state = next(iter(self._sessions.items()))
+            if state.last_seen >= cutoff:
+                break
+            del self._sessions[session_id]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'subscribers': sum(len(subscribers) for subscribers in self._subscribers.values()),
+                'published': self.published
+            }
@@ -0,0 +1,131 @@
+"""
+EmotionFAD - Risk Scoring
+Emotion scores (stress, deception risk, mental health) and the comprehensive report's risk components
+
+Plain functions with no imports from the engine or the analyzers, so every
+analyzer, the report fusion and the engine can share them.
+"""
+
+STRESS_WEIGHTS = {
+    'angry': 0.8,
+    'fear': 0.9,
+    'sad': 0.6,
+    'disgust': 0.7,
+    'surprise': 0.3,
+    'neutral': 0.1,
+    'happy': 0.0
+}
+
+
+def as_percentages(emotions):
+    """Scale emotion scores to 0-100.
+
+    DeepFace reports percentages and FER fractions; a distribution summing to
+    about 1 is taken to be fractions.
+    """
+    emotions = {label: float(score) for label, score in emotions.items()}
+    if sum(emotions.values()) <= 1.5:
+        return {label: score * 100 for label, score in emotions.items()}
+    return emotions
+
+
+def stress_level(emotions):
+    """Stress level (0-1) from emotion percentages"""
+    stress = sum(emotions.get(emotion, 0) * weight
+                 for emotion, weight in STRESS_WEIGHTS.items())
+    return min(stress / 100, 1.0)
+
+
+def deception_risk(emotions):
+    """Deception risk (0-1) from emotion percentages"""
+    fear = emotions.get('fear', 0)
+    happy = emotions.get('happy', 0)
+    surprise = emotions.get('surprise', 0)
+    angry = emotions.get('angry', 0)
+
+    deception_score = (fear * 0.4 + surprise * 0.2 + angry * 0.3 - happy * 0.1) / 100
+    return max(0, min(deception_score, 1.0))
+
+
+def mental_health_score(emotions):
+    """Mental health score (0-100, higher is better) from emotion percentages"""
+    positive_emotions = emotions.get('happy', 0) + emotions.get('neutral', 0) * 0.5
+    negative_emotions = (emotions.get('sad', 0) + emotions.get('angry', 0) +
+                         emotions.get('fear', 0) + emotions.get('disgust', 0))
+
+    score = (positive_emotions - negative_emotions * 0.5)
+    return max(0, min(score, 100))
+
+
+def score_emotions(emotions):
+    """All three scores for one emotion distribution (percentages or fractions)"""
+    emotions = as_percentages(emotions)
+    return {
+        'stress_level': stress_level(emotions),
+        'deception_risk': deception_risk(emotions),
+        'mental_health_score': mental_health_score(emotions)
+    }
+
+
+def facial_report_component(facial_data, temporal=None):
+    """Facial share of the overall risk and its risk factors; smoothed session scores win over one frame"""
+    risk_factors = []
+    scores = temporal
+    if scores is None and facial_data and facial_data.get('success'):
+        scores = facial_data
+    if scores is None:
+        return 0, risk_factors
+
+    facial_risk = (scores['deception_risk'] * 0.4 +
+                   scores['stress_level'] * 0.3)
+
+    if scores['deception_risk'] > 0.6:
+        risk_factors.append('High deception indicators in facial expression')
+    if scores['stress_level'] > 0.7:
+        risk_factors.append('Elevated stress levels detected')
+    if scores['mental_health_score'] < 40:
+        risk_factors.append('Poor mental health indicators')
+    if temporal is not None and temporal['sudden_changes'] > 0:
+        risk_factors.append(
+            f"Sudden emotional shift detected ({temporal['sudden_changes']} in the last "
+            f"{temporal['frames']} frames, latest: {temporal['last_change']['emotion']})"
+        )
+    return facial_risk * 0.5, risk_factors
+
+
+def text_report_component(text_data):
+    """Text share of the overall risk and its risk factors"""
+    risk_factors = []
+    if not (text_data and text_data.get('success')):
+        return 0, risk_factors
+
+    if text_data['fraud_keywords_found']:
+        risk_factors.append(f"Fraud-related keywords detected: {', '.join(text_data['fraud_keywords_found'][:3])}")
+    if text_data['suspicious_patterns_count'] > 0:
+        risk_factors.append('Suspicious communication patterns detected')
+    if text_data['sentiment_polarity'] < -0.5:
+        risk_factors.append('Highly negative sentiment detected')
+    return text_data['fraud_risk_score'] * 0.5, risk_factors
+
+
+def voice_report_component(voice_data):
+    """Voice stress share of the overall risk and its risk factors (nothing while the voice is uncalibrated)"""
+    risk_factors = []
+    if not (voice_data and voice_data.get('success')) or voice_data.get('stress_level') is None:
+        return 0, risk_factors
+
+    stress = voice_data['stress_level']
+    if stress > 0.6:
+        raised = [name.replace('_', ' ') for name, value in voice_data.get('stress_components', {}).items()
+                  if value > 0.5]
+        risk_factors.append('Elevated vocal stress' + (f" ({', '.join(raised)})" if raised else ''))
+    return stress * 0.15, risk_factors
+
+
+def assess_risk(overall_risk):
+    """Risk level and recommendation for an overall risk score"""
+    if overall_risk > 0.7:
+        return 'HIGH', '🚨 ALERT: High fraud risk detected. Immediate investigation recommended.'
+    if overall_risk > 0.4:
+        return 'MEDIUM', '⚠️ WARNING: Moderate fraud risk. Monitor closely and verify information.'
+    return 'LOW', '✅ Low fraud risk. Continue normal interaction.'
@@ -0,0 +1,246 @@
+"""
+EmotionFAD - Offline Fraud Scoring CLI
+Streams NDJSON/CSV message archives through FraudDetectionSystem in bounded memory
+
+Usage:
+    python score_cli.py messages.ndjson -o reports.ndjson --workers 4
+    python score_cli.py messages.csv -o reports.ndjson --checkpoint run.ckpt --resume
+
+Each input record may carry `text` (or `message`), an optional base64 `image`
+(or `frame`) and an optional `id`. One report per record is written in the
+shape returned by FraudDetectionSystem.generate_comprehensive_report.
+"""
+
+import argparse
+import contextlib
+import csv
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+TEXT_FIELDS = ('text', 'message')
+IMAGE_FIELDS = ('image', 'frame')
+
+# Per-process scoring engine, created once by _init_worker
+_fds = None
+
+
+def iter_ndjson(path, start_offset=0):
+    """Yield (end_offset, record) for every non-blank line of an NDJSON file."""
+    with open(path, 'rb') as f:
+        f.seek(start_offset)
+        offset = start_offset
+        for line in f:
+            offset += len(line)
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    record = {'text': record}
+            except ValueError as e:
+                record = {'_error': f'Invalid JSON at byte {offset - len(line)}: {str(e)}'}
+            yield offset, record
+
+
+def iter_csv(path, start_offset=0):
+    """Yield (end_offset, record) for every row of a CSV file with a header line.
+
+    Lines are read in binary so byte offsets stay exact; a row is complete once
+    it holds an even number of quote characters, which keeps quoted fields that
+    span several lines intact.
+    """
+    with open(path, 'rb') as f:
+        header_line = f.readline()
+        header = next(csv.reader([header_line.decode('utf-8-sig')]))
+        offset = max(start_offset, len(header_line))
+        f.seek(offset)
+
+        pending = b''
+        for line in f:
+            offset += len(line)
+            pending += line
+            if pending.count(b'"') % 2:
+                continue
+            row_bytes, pending = pending, b''
+            if not row_bytes.strip():
+                continue
+            row = next(csv.reader([row_bytes.decode('utf-8')]), [])
+            yield offset, dict(zip(header, row))
+
+        if pending.strip():
+            yield offset, {'_error': f'Unterminated quoted field in the row at byte {offset - len(pending)}'}
+
+
+def iter_chunks(records, chunk_size):
+    """Group (offset, record) pairs into (last_offset, [records]) chunks."""
+    chunk = []
+    offset = None
+    for offset, record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield offset, chunk
+            chunk = []
+    if chunk:
+        yield offset, chunk
+
+
+def _first_field(record, names):
+    for name in names:
+        value = record.get(name)
+        if value:
+            return value
+    return None
+
+
+def _init_worker():
+    global _fds
+    from engine import engine
+
+    with contextlib.redirect_stdout(sys.stderr):
+        _fds = engine.fraud
+
+
+def score_chunk(records):
+    """Score a chunk of records and return the serialized NDJSON lines."""
+    if _fds is None:
+        _init_worker()
+
+    # FraudDetectionSystem reports progress with print; keep stdout for reports only
+    with contextlib.redirect_stdout(sys.stderr):
+        texts = [_first_field(record, TEXT_FIELDS) for record in records]
+        text_results = _fds.analyze_text_batch([text or '' for text in texts])
+
+        lines = []
+        for record, text, text_data in zip(records, texts, text_results):
+            if '_error' in record:
+                report = {'success': False, 'error': record['_error']}
+            else:
+                image = _first_field(record, IMAGE_FIELDS)
+                facial_data = _fds.analyze_facial_expression(image) if image else None
+                report = _fds.generate_comprehensive_report(facial_data, text_data if text else None)
+            if record.get('id') is not None:
+                report['id'] = record['id']
+            lines.append(json.dumps(report, default=str))
+
+    return ''.join(line + '\n' for line in lines)
+
+
+def load_checkpoint(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(path, input_path, offset, records, output_offset=None):
+    """Atomically record how far into the input (and the output file) the output is complete."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'input': os.path.abspath(input_path), 'offset': offset, 'records': records,
+                   'output_offset': output_offset}, f)
+    os.replace(tmp_path, path)
+
+
+def open_output(path, append, output_offset=None):
+    """Open the report file for binary writes.
+
+    When appending, a known output_offset (from the checkpoint) cuts off
+    anything written after the last checkpointed chunk, such as a chunk
+    whose checkpoint was never saved or a partly written line, so resuming
+    neither duplicates nor corrupts reports.
+    """
+    if not append or not os.path.exists(path):
+        return open(path, 'wb')
+    out = open(path, 'r+b')
+    if output_offset is None:
+        out.seek(0, os.SEEK_END)
+    else:
+        out.seek(output_offset)
+        out.truncate()
+    return out
+
+
+def detect_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    return 'csv' if ext == '.csv' else 'ndjson'
+
+
+def run(args):
+    start_offset = args.start_offset
+    records_done = 0
+    output_offset = None
+    if args.resume and args.checkpoint:
+        checkpoint = load_checkpoint(args.checkpoint)
+        if checkpoint:
+            if checkpoint.get('input') != os.path.abspath(args.input):
+                print(f"Checkpoint {args.checkpoint} belongs to {checkpoint.get('input')}, not "
+                      f"{os.path.abspath(args.input)}; refusing to resume", file=sys.stderr)
+                return 2
+            start_offset = checkpoint['offset']
+            records_done = checkpoint.get('records', 0)
+            output_offset = checkpoint.get('output_offset')
+            print(f"Resuming from byte {start_offset} ({records_done} records already scored)", file=sys.stderr)
+
+    fmt = args.format if args.format != 'auto' else detect_format(args.input)
+    reader = iter_csv if fmt == 'csv' else iter_ndjson
+    chunks = iter_chunks(reader(args.input, start_offset), args.chunk_size)
+
+    if args.output == '-':
+        out = sys.stdout.buffer
+    else:
+        out = open_output(args.output, bool(start_offset), output_offset)
+
+    def write_chunk(offset, count, body):
+        nonlocal records_done
+        out.write(body.encode('utf-8'))
+        out.flush()
+        records_done += count
+        if args.checkpoint:
+            save_checkpoint(args.checkpoint, args.input, offset, records_done,
+                            out.tell() if out is not sys.stdout.buffer else None)
+
+    try:
+        if args.workers <= 1:
+            for offset, chunk in chunks:
+                write_chunk(offset, len(chunk), score_chunk(chunk))
+        else:
+            # Keep a bounded window of chunks in flight and write them back in input order
+            max_in_flight = args.workers * 2
+            with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as pool:
+                in_flight = deque()
+                for offset, chunk in chunks:
+                    in_flight.append((offset, len(chunk), pool.submit(score_chunk, chunk)))
+                    if len(in_flight) >= max_in_flight:
+                        done_offset, count, future = in_flight.popleft()
+                        write_chunk(done_offset, count, future.result())
+                while in_flight:
+                    done_offset, count, future = in_flight.popleft()
+                    write_chunk(done_offset, count, future.result())
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+
+    print(f"Scored {records_done} records", file=sys.stderr)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Score NDJSON/CSV message archives for fraud risk.')
+    parser.add_argument('input', help='NDJSON or CSV file of messages')
+    parser.add_argument('-o', '--output', default='-', help='NDJSON report file (default: stdout)')
+    parser.add_argument('--format', choices=['auto', 'ndjson', 'csv'], default='auto')
+    parser.add_argument('--chunk-size', type=int, default=500, help='records scored per chunk')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='scoring processes (1 scores inline)')
+    parser.add_argument('--checkpoint', help='file tracking the last fully written input offset')
+    parser.add_argument('--resume', action='store_true', help='continue from --checkpoint')
+    parser.add_argument('--start-offset', type=int, default=0, help='byte offset to start reading from')
+    return parser
+
+
+if __name__ == '__main__':
+    sys.exit(run(build_parser().parse_args()))
@@ -3,8 +3,9 @@ Simple EmotionFAD - Minimal Implementation
 A simplified version with basic WebSocket functionality
 """
 
-from flask import Flask, render_template
+from flask import Flask, render_template, request
 from flask_socketio import SocketIO, emit
+from engine import engine
 import os
 import logging
 
@@ -19,6 +20,9 @@ socketio = SocketIO(app,
                    logger=True,
                    engineio_logger=True)
 
+# Messages are also scored by the shared analysis engine (TextBlob); the echo works without it
+engine.require('text')
+
 # Routes
 @app.route('/')
 def index():
@@ -37,7 +41,10 @@ def handle_disconnect():
 @socketio.on('message')
 def handle_message(message):
     print('Received message:', message)
-    emit('response', {'data': 'Message received: ' + str(message)})
+    response = {'data': 'Message received: ' + str(message)}
+    if isinstance(message, str) and message and engine.available('text'):
+        response['analysis'] = engine.analyze_text(message, session_id=request.sid)
+    emit('response', response)
 
 if __name__ == '__main__':
     print("\nStarting Simple EmotionFAD server...")
@@ -12,18 +12,47 @@ class FADApp {
         this.analysisInterval = null;
         this.lastFacialData = null;
         this.lastTextData = null;
+        this.reportEvents = null;
+        this.lastRiskLevel = null;
         
         this.API_BASE = window.location.origin;
         
+        // Scopes the server's frame cache, facial history and pushed reports to this page
+        this.sessionId = (window.crypto && crypto.randomUUID)
+            ? crypto.randomUUID()
+            : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+        
         console.log('🛡️ FAD System initializing...');
         this.init();
     }
     
     init() {
         this.setupEventListeners();
+        this.subscribeToReports();
         console.log('✅ FAD System ready');
     }
     
+    async subscribeToReports() {
+        // The server fuses this session's latest facial and text results and pushes the report
+        if (!window.EventSource) return;
+        try {
+            // Only the holder of a server-issued session's token may subscribe to its reports
+            const response = await fetch(`${this.API_BASE}/sessions`, { method: 'POST' });
+            const session = await response.json();
+            if (!session.success) return;
+            this.sessionId = session.session_id;
+            const token = encodeURIComponent(session.events_token);
+            this.reportEvents = new EventSource(
+                `${this.API_BASE}/events/${encodeURIComponent(this.sessionId)}?token=${token}`
+            );
+            this.reportEvents.addEventListener('report', (event) => {
+                this.displayReport(JSON.parse(event.data));
+            });
+        } catch (error) {
+            console.error('Report subscription error:', error);
+        }
+    }
+    
     setupEventListeners() {
         // Permission button
         document.getElementById('grantPermissionBtn').addEventListener('click', () => {
@@ -183,7 +212,7 @@ class FADApp {
                 headers: {
                     'Content-Type': 'application/json'
                 },
-                body: JSON.stringify({ image: imageData })
+                body: JSON.stringify({ image: imageData, session_id: this.sessionId })
             });
             
             const result = await response.json();
@@ -191,7 +220,8 @@ class FADApp {
             if (result.success) {
                 console.log('✅ Facial analysis complete:', result.dominant_emotion);
                 this.lastFacialData = result;
-                this.updateFacialMetrics(result);
+                // Session-smoothed scores when the server keeps a history, else this frame's
+                this.updateFacialMetrics(result.temporal || result);
                 this.displayEmotion(result.emotions, result.dominant_emotion);
                 
                 // Generate comprehensive report if we have text data
@@ -279,14 +309,14 @@ class FADApp {
         console.log('💬 Sending message:', text);
         
         // Display user message
-        this.addMessage(text, 'user');
+        const messageDiv = this.addMessage(text, 'user');
         this.chatInput.value = '';
         
         // Analyze text
-        await this.analyzeText(text);
+        await this.analyzeText(text, messageDiv);
     }
     
-    async analyzeText(text) {
+    async analyzeText(text, messageDiv = null) {
         this.showLoading(true);
         
         try {
@@ -297,7 +327,7 @@ class FADApp {
                 headers: {
                     'Content-Type': 'application/json'
                 },
-                body: JSON.stringify({ text })
+                body: JSON.stringify({ text, session_id: this.sessionId })
             });
             
             const result = await response.json();
@@ -306,6 +336,11 @@ class FADApp {
                 console.log('✅ Text analysis complete:', result.sentiment_category);
                 this.lastTextData = result;
                 
+                if (messageDiv) {
+                    // Offsets refer to the server's normalized copy of the text
+                    this.highlightMatches(messageDiv, result.text || text, result);
+                }
+                
                 // Generate bot response
                 let botResponse = this.generateBotResponse(result);
                 this.addMessage(botResponse, 'bot');
@@ -358,6 +393,9 @@ class FADApp {
     }
     
     async generateComprehensiveReport() {
+        // Only needed when the browser can't receive pushed reports
+        if (this.reportEvents && this.reportEvents.readyState !== EventSource.CLOSED) return;
+        
         try {
             console.log('📊 Generating comprehensive report...');
             
@@ -368,30 +406,36 @@ class FADApp {
                 },
                 body: JSON.stringify({
                     facial_data: this.lastFacialData,
-                    text_data: this.lastTextData
+                    text_data: this.lastTextData,
+                    session_id: this.sessionId
                 })
             });
             
             const result = await response.json();
             
             if (result.success) {
-                console.log('✅ Comprehensive report generated:', result.risk_level);
-                
-                // Update overall fraud risk
-                const overallRisk = Math.round(result.overall_risk_score * 100);
-                document.getElementById('fraudValue').textContent = overallRisk + '%';
-                document.getElementById('fraudBar').style.width = overallRisk + '%';
-                
-                // Show alert for high risk
-                if (result.risk_level === 'HIGH') {
-                    this.showAlert('🚨 HIGH FRAUD RISK DETECTED!', 'danger');
-                }
+                this.displayReport(result);
             }
         } catch (error) {
             console.error('❌ Comprehensive report error:', error);
         }
     }
     
+    displayReport(result) {
+        console.log('✅ Comprehensive report:', result.risk_level);
+        
+        // Update overall fraud risk
+        const overallRisk = Math.round(result.overall_risk_score * 100);
+        document.getElementById('fraudValue').textContent = overallRisk + '%';
+        document.getElementById('fraudBar').style.width = overallRisk + '%';
+        
+        // Show alert when the risk becomes high
+        if (result.risk_level === 'HIGH' && this.lastRiskLevel !== 'HIGH') {
+            this.showAlert('🚨 HIGH FRAUD RISK DETECTED!', 'danger');
+        }
+        this.lastRiskLevel = result.risk_level;
+    }
+    
     addMessage(text, type) {
         const messageDiv = document.createElement('div');
         messageDiv.className = `message ${type}-message`;
@@ -399,6 +443,28 @@ class FADApp {
         
         this.chatMessages.appendChild(messageDiv);
         this.chatMessages.scrollTop = this.chatMessages.scrollHeight;
+        return messageDiv;
+    }
+    
+    highlightMatches(messageDiv, text, textData) {
+        const spans = [...(textData.keyword_matches || []), ...(textData.pattern_matches || [])]
+            .sort((a, b) => a.start - b.start);
+        if (spans.length === 0) return;
+        
+        // Offsets are in code points, so index an array of characters rather than the UTF-16 string
+        const chars = Array.from(text);
+        messageDiv.textContent = '';
+        let cursor = 0;
+        for (const span of spans) {
+            if (span.start < cursor) continue;
+            messageDiv.appendChild(document.createTextNode(chars.slice(cursor, span.start).join('')));
+            const mark = document.createElement('mark');
+            mark.className = 'fraud-match';
+            mark.textContent = chars.slice(span.start, span.end).join('');
+            messageDiv.appendChild(mark);
+            cursor = span.end;
+        }
+        messageDiv.appendChild(document.createTextNode(chars.slice(cursor).join('')));
     }
     
     async startVoiceInput() {
@@ -0,0 +1,9 @@
+"""
+EmotionFAD - Test configuration
+Server modules imported by tests use the stub models and load them on demand
+"""
+
+import os
+
+os.environ.setdefault('FAD_MODEL_BACKEND', 'stub')
+os.environ.setdefault('FAD_PRELOAD_MODELS', '0')
@@ -0,0 +1,145 @@
+"""
+EmotionFAD - ASGI Server tests
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+np = pytest.importorskip('numpy')
+pytest.importorskip('textblob')
+pytest.importorskip('a2wsgi')
+
+import asgi
+
+
+def _request(method, path, body=b'', content_type='application/json'):
+    """Send one HTTP request through the ASGI app; returns (status, headers, body)."""
+    path, _, query = path.partition('?')
+
+    async def exchange():
+        sent = []
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            await asyncio.sleep(3600)
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(), 'root_path': '',
+            'headers': [(b'host', b'testserver'), (b'content-type', content_type.encode()),
+                        (b'content-length', str(len(body)).encode())],
+            'client': ('127.0.0.1', 50000), 'server': ('testserver', 80)
+        }
+        await asgi.application(scope, receive, send)
+        start = next(message for message in sent if message['type'] == 'http.response.start')
+        headers = {key.decode(): value.decode() for key, value in start['headers']}
+        return start['status'], headers, b''.join(message.get('body', b'') for message in sent
+                                                   if message['type'] == 'http.response.body')
+    return asyncio.run(exchange())
+
+
+@pytest.fixture(autouse=True)
+def fast_stubs(monkeypatch):
+    monkeypatch.setenv('FAD_STUB_LATENCY_MS', '0')
+
+
+def test_health_includes_the_inference_pool():
+    status, headers, body = _request('GET', '/health')
+    health = json.loads(body)
+    assert status == 200
+    assert health['inference']['threads'] == asgi.INFERENCE_THREADS
+    assert 'frame_scheduler' in health and 'report_fusion' in health
+
+
+def test_analysis_routes_are_the_flask_routes():
+    status, _, body = _request('POST', '/analyze/text', json.dumps({'text': 'Buy gift card now, urgent!'}).encode())
+    result = json.loads(body)
+    assert status == 200 and result['success']
+    assert 'gift card' in result['fraud_keywords_found']
+    assert asgi.inference.stats()['completed'] >= 1
+
+    image = np.random.default_rng(0).integers(0, 255, (120, 160, 3), dtype=np.uint8)
+    status, _, body = _request('POST', '/api/analyze', cv2.imencode('.png', image)[1].tobytes(), 'image/png')
+    assert status == 200 and json.loads(body)['status'] == 'success'
+
+    status, _, _ = _request('POST', '/analyze/text', b'{}')
+    assert status == 400
+
+
+def test_saturated_inference_is_turned_away_but_health_answers(monkeypatch):
+    monkeypatch.setattr(asgi.inference, 'in_flight', asgi.inference.threads + asgi.inference.max_pending)
+    status, headers, body = _request('POST', '/analyze/text', json.dumps({'text': 'hello'}).encode())
+    assert status == 503
+    assert int(headers['retry-after']) >= 1
+    assert json.loads(body)['success'] is False
+
+    status, _, _ = _request('GET', '/health')
+    assert status == 200
+
+
+def test_event_streams_check_the_session_token(monkeypatch):
+    streamed = []
+
+    async def stream(session_id, receive, send):
+        streamed.append(session_id)
+        await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    monkeypatch.setattr(asgi, 'stream_session_events', stream)
+    _, _, body = _request('POST', '/sessions')
+    owner = json.loads(body)
+    other = json.loads(_request('POST', '/sessions')[2])
+
+    assert _request('GET', f"/events/{owner['session_id']}")[0] == 403
+    assert _request('GET', f"/events/{owner['session_id']}?token={other['events_token']}")[0] == 403
+    assert streamed == []
+
+    status, _, _ = _request('GET', f"/events/{owner['session_id']}?token={owner['events_token']}")
+    assert status == 200
+    assert streamed == [owner['session_id']]
+
+
+def test_socketio_events_share_app_emotions_handlers(monkeypatch):
+    emitted = []
+
+    async def emit(event, data, to=None):
+        emitted.append((event, data, to))
+
+    monkeypatch.setattr(asgi.sio, 'emit', emit)
+
+    async def session():
+        await asgi.connect('sid-1', {}, {'frame_formats': ['binary']})
+        await asgi.start_analysis('sid-1', {'detector': 'bogus'})
+        await asgi.start_analysis('sid-1', {'detector': 'haar', 'overlay': 'webp'})
+        await asgi.disconnect('sid-1')
+    asyncio.run(session())
+
+    events = [(event, to) for event, _, to in emitted]
+    assert events == [('connection_response', 'sid-1'), ('analysis_error', 'sid-1'), ('analysis_started', 'sid-1')]
+    assert emitted[0][1]['frame_format'] == 'binary'
+    assert emitted[2][1]['detector'] == 'haar' and emitted[2][1]['overlay']['format'] == 'webp'
+
+
+def test_text_requests_load_only_the_text_analyzer_in_both_entry_points():
+    code = '\n'.join([
+        'import json, asgi, app',
+        'from engine import engine',
+        'from tests.test_asgi import _request',
+        "status, _, _ = _request('POST', '/analyze/text', json.dumps({'text': 'hello'}).encode())",
+        "flask_status = app.app.test_client().post('/analyze/text', json={'text': 'hi'}).status_code",
+        'print(status, flask_status, engine._text is not None, engine._fraud is None)'
+    ])
+    env = dict(os.environ, FAD_MODEL_BACKEND='stub', FAD_PRELOAD_MODELS='0', FAD_STUB_LATENCY_MS='0')
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, env=env, check=True).stdout
+    assert output.split()[-4:] == ['200', '200', 'True', 'True']
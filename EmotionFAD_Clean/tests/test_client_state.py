@@ -0,0 +1,54 @@
+"""
+EmotionFAD - Client State tests
+"""
+
+import time
+
+import pytest
+
+pytest.importorskip('cv2')
+
+from client_state import AnalysisSessions, MemoryStateStore
+
+
+def test_sequence_continues_on_another_worker():
+    store = MemoryStateStore()
+    owner, other = AnalysisSessions(store), AnalysisSessions(store)
+    owner.connect('sid')
+    assert owner.next_sequence('sid') == 1
+    assert owner.next_sequence('sid') == 2
+    # A frame that reaches a worker without the socket continues the count
+    assert other.next_sequence('sid') == 3
+    assert owner.next_sequence('sid') == 4
+
+
+def test_start_video_restarts_the_sequence_and_keeps_options_shared():
+    store = MemoryStateStore()
+    owner, other = AnalysisSessions(store), AnalysisSessions(store)
+    owner.connect('sid')
+    owner.next_sequence('sid')
+    owner.start('sid', tracking=True, detect_every=5, detector='haar', overlay=None)
+    assert owner.next_sequence('sid') == 1
+
+    session = other.get('sid')
+    assert session['detector'] == 'haar'
+    assert session['tracker'].detect_every == 5
+    assert other.local_count() == 0
+
+
+def test_remove_forgets_the_socket():
+    store = MemoryStateStore()
+    sessions = AnalysisSessions(store)
+    sessions.connect('sid')
+    sessions.next_sequence('sid')
+    sessions.remove('sid')
+    assert store.get('sid') is None
+    assert sessions.count() == 0
+
+
+def test_memory_store_entries_expire():
+    store = MemoryStateStore(ttl=0.05)
+    store.update('sid', sequence=3)
+    time.sleep(0.1)
+    assert store.get('sid') is None
+    assert store.increment('sid', 'sequence') == 1
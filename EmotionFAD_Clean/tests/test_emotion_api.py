@@ -0,0 +1,62 @@
+"""
+EmotionFAD - Emotion API tests
+"""
+
+import base64
+
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+np = pytest.importorskip('numpy')
+flask = pytest.importorskip('flask')
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv('FAD_STUB_LATENCY_MS', '0')
+    import emotion_api
+    app = flask.Flask(__name__)
+    app.register_blueprint(emotion_api.api)
+    return app.test_client()
+
+
+def _jpeg():
+    image = np.full((240, 320, 3), 90, np.uint8)
+    cv2.circle(image, (160, 120), 60, (170, 180, 200), -1)
+    return cv2.imencode('.jpg', image)[1].tobytes()
+
+
+def _overlay_image(response):
+    encoded = response.get_json()['frame_with_boxes'].split(',', 1)[1]
+    return cv2.imdecode(np.frombuffer(base64.b64decode(encoded), np.uint8), cv2.IMREAD_COLOR)
+
+
+def test_no_overlay_by_default(client):
+    response = client.post('/api/analyze', data=_jpeg(), content_type='image/jpeg')
+    assert response.status_code == 200
+    assert response.get_json()['faces_detected'] == 1
+    assert 'frame_with_boxes' not in response.get_json()
+
+
+def test_overlay_query_format_quality_and_scale(client):
+    response = client.post('/api/analyze?overlay=webp&overlay_quality=40&overlay_scale=0.5',
+                           data=_jpeg(), content_type='image/jpeg')
+    assert response.status_code == 200
+    assert response.get_json()['frame_with_boxes'].startswith('data:image/webp;base64,')
+    assert _overlay_image(response).shape[:2] == (120, 160)
+
+    response = client.post('/api/analyze?overlay=1', data=_jpeg(), content_type='image/jpeg')
+    assert response.get_json()['frame_with_boxes'].startswith('data:image/jpeg;base64,')
+    assert _overlay_image(response).shape[:2] == (240, 320)
+
+    response = client.post('/api/analyze?overlay=0', data=_jpeg(), content_type='image/jpeg')
+    assert 'frame_with_boxes' not in response.get_json()
+
+
+def test_unknown_overlay_format_is_rejected(client):
+    response = client.post('/api/analyze?overlay=gif', data=_jpeg(), content_type='image/jpeg')
+    assert response.status_code == 400
+    assert "Unknown overlay format 'gif'" in response.get_json()['error']
+
+    response = client.post('/api/analyze', json={'image': base64.b64encode(_jpeg()).decode(), 'overlay': 'png'})
+    assert response.status_code == 400
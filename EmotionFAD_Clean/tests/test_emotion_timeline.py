@@ -0,0 +1,64 @@
+"""
+EmotionFAD - Emotion Timeline tests
+"""
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from emotion_timeline import EMOTION_LABELS, EmotionTimeline, SessionTimelines
+
+CALM = {'neutral': 90.0, 'happy': 10.0}
+AFRAID = {'fear': 95.0, 'neutral': 5.0}
+
+
+def test_window_statistics_stay_exact_after_wrapping():
+    timeline = EmotionTimeline(capacity=4)
+    rng = np.random.default_rng(0)
+    frames = rng.random((10, len(EMOTION_LABELS))).astype(np.float32) * 100
+    for index, frame in enumerate(frames):
+        timeline.add(frame, float(index))
+
+    window = frames[-4:].astype(np.float64)
+    assert timeline.count == 4
+    assert np.allclose(timeline.variance, window.var(axis=0), atol=1e-3)
+    assert timeline.window_seconds() == 3.0
+
+
+def test_sudden_change_is_flagged_against_the_baseline():
+    timelines = SessionTimelines(capacity=20)
+    for second in range(6):
+        summary = timelines.update('s1', CALM, timestamp=float(second))
+    assert summary['sudden_change'] is False
+
+    summary = timelines.update('s1', AFRAID, timestamp=6.0)
+    assert summary['sudden_change'] is True
+    assert summary['last_change']['emotion'] in ('fear', 'neutral')
+    assert summary['sudden_changes'] == 1
+
+
+def test_first_frames_never_count_as_sudden():
+    timelines = SessionTimelines()
+    timelines.update('s1', CALM)
+    assert timelines.update('s1', AFRAID)['sudden_change'] is False
+
+
+def test_sessions_are_separate_and_bounded():
+    timelines = SessionTimelines(max_sessions=2)
+    timelines.update('s1', CALM)
+    timelines.update('s2', AFRAID)
+    timelines.update('s3', CALM)
+    assert timelines.snapshot('s1') is None
+    assert timelines.snapshot('s2')['smoothed_emotions']['fear'] == 95.0
+    assert timelines.stats()['evictions'] == 1
+
+
+def test_comprehensive_request_without_session_id_is_not_keyed_by_address():
+    pytest.importorskip('flask')
+    import app as fad_app
+    from engine import engine
+    engine.fraud.session_data.update('203.0.113.9', AFRAID)
+    response = fad_app.app.test_client().post('/analyze/comprehensive', json={'facial_data': None},
+                                              environ_base={'REMOTE_ADDR': '203.0.113.9'})
+    assert response.status_code == 200
+    assert response.get_json()['temporal_analysis'] is None
@@ -0,0 +1,43 @@
+"""
+EmotionFAD - Analysis Engine tests
+"""
+
+import pytest
+
+pytest.importorskip('textblob')
+pytest.importorskip('cv2')
+
+import text_analysis
+from engine import AnalysisEngine
+from model_manager import ModelManager
+
+
+def test_text_capability_does_not_build_the_deepface_system():
+    engine = AnalysisEngine(models=ModelManager())
+    engine.require('text')
+
+    assert engine.available('text')
+    result = engine.analyze_text('Send me money via gift card, urgent!', session_id='s1')
+    assert result['success'] and 'gift card' in result['fraud_keywords_found']
+    assert engine.fusion.latest('s1')['text']['fraud_risk_score'] == result['fraud_risk_score']
+    assert engine._fraud is None
+
+
+def test_failed_text_load_is_not_retried_on_every_call(monkeypatch):
+    attempts = []
+
+    def broken_analyzer():
+        attempts.append(1)
+        raise ImportError('textblob corpora missing')
+
+    monkeypatch.setattr(text_analysis, 'TextAnalyzer', broken_analyzer)
+    engine = AnalysisEngine(models=ModelManager(retry_seconds=60))
+    engine.require('text')
+
+    assert [engine.available('text') for _ in range(5)] == [False] * 5
+    assert len(attempts) == 1
+
+
+def test_deepface_system_shares_the_text_analyzer():
+    engine = AnalysisEngine(models=ModelManager())
+    assert engine.fraud.text is engine.text
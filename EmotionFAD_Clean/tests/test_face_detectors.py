@@ -0,0 +1,97 @@
+"""
+EmotionFAD - Face Detector tests
+"""
+
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+np = pytest.importorskip('numpy')
+
+from face_detectors import CascadeDetector
+
+FACE = (200, 120, 100, 120)
+
+
+class _Fixed:
+    """Detector returning fixed boxes and recording the images it was given."""
+
+    def __init__(self, boxes):
+        self.boxes = boxes
+        self.calls = []
+
+    def detect(self, image):
+        self.calls.append(image.shape)
+        return list(self.boxes)
+
+
+class _RecordingDeepFace:
+    def __init__(self):
+        self.calls = []
+
+    def analyze(self, img_path, actions=('emotion',), detector_backend='opencv', **kwargs):
+        self.calls.append((img_path.shape, detector_backend))
+        emotion = {'happy': 80.0, 'neutral': 15.0, 'sad': 5.0}
+        return [{'emotion': emotion, 'dominant_emotion': 'happy'}]
+
+
+def _png(image):
+    return cv2.imencode('.png', image)[1].tobytes()
+
+
+def _frame():
+    image = np.full((480, 640, 3), 90, np.uint8)
+    cv2.rectangle(image, FACE[:2], (FACE[0] + FACE[2], FACE[1] + FACE[3]), (170, 180, 200), -1)
+    return image
+
+
+def test_cascade_only_confirms_around_gate_hits():
+    gate, confirm = _Fixed([]), _Fixed([(5, 5, 40, 40)])
+    cascade = CascadeDetector(gate, confirm, margin=0.5)
+    assert cascade.detect(_frame()) == []
+    assert confirm.calls == []
+
+    gate.boxes = [FACE]
+    assert cascade.detect(_frame()) == [(150 + 5, 60 + 5, 40, 40)]
+    # The expensive detector only sees the gate's hit plus its margin
+    assert confirm.calls == [(240, 200, 3)]
+
+
+@pytest.fixture
+def fds(monkeypatch):
+    monkeypatch.setenv('FAD_STUB_LATENCY_MS', '0')
+    monkeypatch.delenv('FAD_MICROBATCH_WINDOW_MS', raising=False)
+    import fraud_detection
+    deepface = _RecordingDeepFace()
+    monkeypatch.setattr(fraud_detection, 'DeepFace', deepface)
+    system = fraud_detection.FraudDetectionSystem()
+    system.frame_cache = None
+    system.deepface = deepface
+    return system
+
+
+def test_cascade_gate_skips_deepface_without_a_face(fds):
+    fds.face_detectors._detectors['haar'] = _Fixed([])
+
+    result = fds.analyze_facial_expression(_png(_frame()), detector='cascade')
+
+    assert result['success'] is False
+    assert result['error'] == 'No face detected'
+    assert fds.deepface.calls == []
+
+
+def test_cascade_classifies_the_haar_crop_without_detecting_again(fds):
+    fds.face_detectors._detectors['haar'] = _Fixed([(10, 10, 40, 40), FACE])
+
+    result = fds.analyze_facial_expression(_png(_frame()), detector='cascade')
+
+    assert result['success'] is True
+    assert result['dominant_emotion'] == 'happy'
+    # Largest Haar hit with a 20% margin, and no second face search
+    assert fds.deepface.calls == [((168, 140, 3), 'skip')]
+
+
+def test_other_detectors_hand_deepface_the_whole_frame(fds):
+    result = fds.analyze_facial_expression(_png(_frame()), detector='haar')
+
+    assert result['success'] is True
+    assert fds.deepface.calls == [((480, 640, 3), 'opencv')]
@@ -0,0 +1,81 @@
+"""
+EmotionFAD - Face Tracker tests
+"""
+
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+np = pytest.importorskip('numpy')
+
+from face_tracker import FaceTracker
+
+BOX = (120, 80, 100, 100)
+
+
+def _frame(dx=0):
+    """A textured patch (the face) on a plain background, shifted right by dx."""
+    image = np.full((320, 480, 3), 60, np.uint8)
+    patch = np.random.default_rng(3).integers(0, 255, (100, 100, 3), dtype=np.uint8)
+    patch = cv2.GaussianBlur(patch, (5, 5), 0)
+    x, y = BOX[0] + dx, BOX[1]
+    image[y:y + 100, x:x + 100] = patch
+    return image
+
+
+class _Detector:
+    def __init__(self, boxes):
+        self.boxes = boxes
+        self.calls = 0
+
+    def __call__(self, image):
+        self.calls += 1
+        return list(self.boxes)
+
+
+def test_detects_every_n_frames_and_tracks_in_between():
+    tracker = FaceTracker(detect_every=3, backend='flow')
+    detect = _Detector([BOX])
+
+    detected = [tracker.update(_frame(dx=2 * n), detect)[1] for n in range(7)]
+
+    assert detected == [True, False, False, True, False, False, True]
+    assert detect.calls == 3
+    assert (tracker.full_detections, tracker.tracked_frames) == (3, 4)
+
+
+def test_tracked_box_follows_the_face():
+    tracker = FaceTracker(detect_every=10, backend='flow')
+    tracker.update(_frame(), _Detector([BOX]))
+
+    boxes, detected = tracker.update(_frame(dx=6), _Detector([]))
+
+    assert detected is False
+    (x, y, w, h), = boxes
+    assert abs(x - (BOX[0] + 6)) <= 2 and abs(y - BOX[1]) <= 2
+    assert abs(w - BOX[2]) <= 3 and abs(h - BOX[3]) <= 3
+
+
+def test_lost_track_falls_back_to_detection():
+    tracker = FaceTracker(detect_every=10, backend='flow')
+    detect = _Detector([BOX])
+    tracker.update(_frame(), detect)
+
+    # Covered camera: the flow loses its points, so this frame is detected early
+    boxes, detected = tracker.update(np.zeros((320, 480, 3), np.uint8), detect)
+
+    assert detected is True
+    assert tracker.losses == 1
+    assert detect.calls == 2
+
+
+def test_frames_without_faces_are_detected_every_time():
+    tracker = FaceTracker(detect_every=5, backend='flow')
+    detect = _Detector([])
+
+    for _ in range(3):
+        assert tracker.update(_frame(), detect) == ([], True)
+    assert detect.calls == 3
+
+    tracker.reset()
+    detect.boxes = [BOX]
+    assert tracker.update(_frame(), detect)[1] is True
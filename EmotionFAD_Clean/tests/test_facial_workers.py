@@ -0,0 +1,55 @@
+"""
+EmotionFAD - Facial worker pool tests
+"""
+
+import base64
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+np = pytest.importorskip('numpy')
+pytest.importorskip('textblob')
+
+from facial_workers import FacialWorkerPool, WorkerCrashed
+
+
+def _image(seed):
+    # Distinct frames, so none is answered from the frame cache
+    image = np.random.default_rng(seed).integers(0, 255, (120, 120, 3), dtype=np.uint8)
+    return 'data:image/jpeg;base64,' + base64.b64encode(cv2.imencode('.jpg', image)[1].tobytes()).decode()
+
+
+def _wait_for(condition, timeout=60):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+
+
+def test_crashed_worker_fails_its_request_and_is_replaced(monkeypatch):
+    monkeypatch.setenv('FAD_STUB_LATENCY_MS', '1500')
+    pool = FacialWorkerPool(num_workers=1, timeout=60, check_interval=0.1)
+    pool.start()
+    try:
+        _wait_for(lambda: pool.ready_workers == 1)
+        assert pool.analyze(_image(1), detector='none')['success']
+
+        first = pool._workers[0]
+        # Kill the worker once it has picked up the request, long before the 60 s timeout
+        killer = threading.Timer(0.5, os.kill, (first.pid, signal.SIGKILL))
+        killer.start()
+        started = time.monotonic()
+        with pytest.raises(WorkerCrashed):
+            pool.analyze(_image(2), detector='none')
+        assert time.monotonic() - started < 10
+        assert pool.stats()['crashed'] == 1
+
+        _wait_for(lambda: pool.ready_workers == 1)
+        assert pool._workers[0].pid != first.pid
+        assert pool.analyze(_image(3), detector='none')['success']
+    finally:
+        pool.stop()
@@ -0,0 +1,168 @@
+"""
+EmotionFAD - Frame Cache tests
+"""
+
+import time
+
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+np = pytest.importorskip('numpy')
+
+from frame_cache import FrameCache, dhash, face_key, frame_key, hamming
+
+FACE = (260, 160, 120, 160)
+
+
+def _frame(smile=True, background=90):
+    image = np.full((480, 640, 3), background, np.uint8)
+    cv2.ellipse(image, (320, 240), (60, 80), 0, 0, 360, (170, 180, 200), -1)
+    cv2.circle(image, (295, 215), 8, (40, 40, 40), -1)
+    cv2.circle(image, (345, 215), 8, (40, 40, 40), -1)
+    if smile:
+        cv2.ellipse(image, (320, 270), (28, 14), 0, 0, 180, (40, 40, 120), 4)
+    else:
+        cv2.ellipse(image, (320, 290), (28, 14), 0, 180, 360, (40, 40, 120), 4)
+    return image
+
+
+def test_changed_expression_misses():
+    smile, frown = _frame(smile=True), _frame(smile=False)
+    # The whole-frame hash cannot tell them apart; the face crop can
+    assert hamming(dhash(smile, 8), dhash(frown, 8)) == 0
+
+    cache = FrameCache()
+    cache.put('s1', cache.face_key(smile, [FACE]), {'dominant_emotion': 'happy'})
+    assert cache.get('s1', cache.face_key(frown, [FACE])) is None
+    assert cache.get('s1', cache.face_key(smile, [FACE])) == {'dominant_emotion': 'happy'}
+
+
+def test_same_face_hits_when_the_background_changes():
+    cache = FrameCache()
+    cache.put('s1', face_key(_frame(), [FACE]), {'dominant_emotion': 'happy'})
+    assert cache.get('s1', face_key(_frame(background=30), [FACE])) == {'dominant_emotion': 'happy'}
+    assert cache.stats()['hits'] == 1
+
+
+def test_face_count_and_session_scope_must_match():
+    image = _frame()
+    cache = FrameCache()
+    cache.put('s1', face_key(image, [FACE]), {'faces': 1})
+    assert cache.get('s1', face_key(image, [FACE, FACE])) is None
+    assert cache.get('s1', face_key(image, [])) is None
+    assert cache.get('s2', face_key(image, [FACE])) is None
+
+
+def test_frame_keys_only_match_exact_frames():
+    image = _frame()
+    nudged = image.copy()
+    nudged[0, 0] += 1
+    cache = FrameCache()
+    cache.put('s1', frame_key(image), {'faces': 1})
+    assert cache.get('s1', frame_key(image.copy())) == {'faces': 1}
+    assert cache.get('s1', frame_key(nudged)) is None
+
+
+def test_entries_expire():
+    cache = FrameCache(ttl=0.05)
+    key = face_key(_frame(), [FACE])
+    cache.put('s1', key, {'faces': 1})
+    time.sleep(0.1)
+    assert cache.get('s1', key) is None
+    assert cache.stats()['expirations'] == 1
+
+
+class _CountingTracker:
+    def __init__(self):
+        self.updates = 0
+
+    def update(self, image, detect_fn):
+        self.updates += 1
+        return [FACE], self.updates == 1
+
+
+def test_tracker_keeps_running_on_cache_hits(monkeypatch):
+    monkeypatch.setenv('FAD_STUB_LATENCY_MS', '0')
+    from emotion_analysis import EmotionAnalyzer
+    analyzer = EmotionAnalyzer()
+    tracker = _CountingTracker()
+
+    first = analyzer.analyze_emotions(_frame(), tracker=tracker, detector='haar', session_id='s1')
+    again = analyzer.analyze_emotions(_frame(), tracker=tracker, detector='haar', session_id='s1')
+    changed = analyzer.analyze_emotions(_frame(smile=False), tracker=tracker, detector='haar', session_id='s1')
+
+    assert (first['cached'], again['cached'], changed['cached']) == (False, True, False)
+    assert again['detection'] == 'tracked'
+    assert tracker.updates == 3
+
+
+def test_requests_without_a_session_are_not_cached(monkeypatch):
+    monkeypatch.setenv('FAD_STUB_LATENCY_MS', '0')
+    from emotion_analysis import EmotionAnalyzer
+    analyzer = EmotionAnalyzer()
+
+    first = analyzer.analyze_emotions(_frame(), detector='haar')
+    again = analyzer.analyze_emotions(_frame(), detector='haar')
+
+    assert (first['cached'], again['cached']) == (False, False)
+    assert analyzer.frame_cache.stats()['entries'] == 0
+
+
+class _FixedHaar:
+    def detect(self, image):
+        return [FACE]
+
+
+def _noised(image, amplitude=3, seed=0):
+    noise = np.random.default_rng(seed).integers(-amplitude, amplitude + 1, image.shape)
+    return np.clip(image.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+
+def test_noised_webcam_frame_hits_on_the_default_config(monkeypatch):
+    monkeypatch.setenv('FAD_STUB_LATENCY_MS', '0')
+    monkeypatch.delenv('FAD_FACE_DETECTOR', raising=False)
+    monkeypatch.delenv('FAD_MICROBATCH_WINDOW_MS', raising=False)
+    from emotion_analysis import EmotionAnalyzer
+    analyzer = EmotionAnalyzer()
+    # Haar cannot find a drawn face; stand in for it with the face's box
+    analyzer.face_detectors._detectors['haar'] = _FixedHaar()
+    assert (analyzer.default_detector, analyzer.batcher) == ('mtcnn', None)
+
+    first = analyzer.analyze_emotions(_frame(), session_id='s1')
+    noised = analyzer.analyze_emotions(_noised(_frame()), session_id='s1')
+    frown = analyzer.analyze_emotions(_frame(smile=False), session_id='s1')
+
+    assert (first['cached'], noised['cached'], frown['cached']) == (False, True, False)
+    assert noised['analysis'] == first['analysis']
+    assert analyzer.frame_cache.stats()['near_hits'] == 1
+
+
+def _png(image):
+    return cv2.imencode('.png', image)[1].tobytes()
+
+
+def test_noised_facial_image_hits_on_the_default_config(monkeypatch):
+    monkeypatch.setenv('FAD_STUB_LATENCY_MS', '0')
+    monkeypatch.delenv('FAD_FACE_DETECTOR', raising=False)
+    monkeypatch.delenv('FAD_MICROBATCH_WINDOW_MS', raising=False)
+    from fraud_detection import FraudDetectionSystem
+    fds = FraudDetectionSystem()
+    fds.face_detectors._detectors['haar'] = _FixedHaar()
+
+    first = fds.analyze_facial_expression(_png(_frame()), session_id='s1')
+    noised = fds.analyze_facial_expression(_png(_noised(_frame())), session_id='s1')
+
+    assert first['success'] and not first['cached']
+    assert noised['cached'] and noised['emotions'] == first['emotions']
+
+
+def test_frames_without_a_face_only_match_exact_repeats(monkeypatch):
+    monkeypatch.setenv('FAD_STUB_LATENCY_MS', '0')
+    from fraud_detection import FraudDetectionSystem
+    fds = FraudDetectionSystem()
+    # The real Haar detector finds no face in the drawn frame
+    first = fds.analyze_facial_expression(_png(_frame()), session_id='s1')
+    noised = fds.analyze_facial_expression(_png(_noised(_frame())), session_id='s1')
+    again = fds.analyze_facial_expression(_png(_frame()), session_id='s1')
+
+    assert (first['cached'], noised['cached'], again['cached']) == (False, False, True)
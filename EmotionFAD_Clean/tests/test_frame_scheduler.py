@@ -0,0 +1,67 @@
+"""
+EmotionFAD - Frame Scheduler tests
+"""
+
+import time
+
+from frame_scheduler import FrameScheduler
+
+
+def test_latest_frame_wins_and_counts_dropped():
+    scheduler = FrameScheduler(max_fps=0)
+    scheduler.offer('a', 'frame-1')
+    scheduler.offer('a', 'frame-2')
+    client_id, frame, _ = scheduler.next_frame()
+    assert (client_id, frame) == ('a', 'frame-2')
+    assert scheduler.dropped('a') == 1
+    assert scheduler.next_frame() == (None, None, None)
+
+
+def test_clients_are_served_round_robin():
+    scheduler = FrameScheduler(max_fps=0)
+    scheduler.offer('a', 'a1')
+    scheduler.offer('b', 'b1')
+    served = []
+    for _ in range(4):
+        client_id, frame, _ = scheduler.next_frame()
+        served.append(frame)
+        scheduler.done(client_id)
+        scheduler.offer(client_id, client_id + str(len(served) + 1))
+    assert served == ['a1', 'b1', 'a2', 'b3']
+
+
+def test_fps_limit_reports_wait():
+    scheduler = FrameScheduler(max_fps=10)
+    scheduler.offer('a', 'a1')
+    assert scheduler.next_frame()[0] == 'a'
+    scheduler.done('a')
+    scheduler.offer('a', 'a2')
+    client_id, frame, wait = scheduler.next_frame()
+    assert client_id is None and 0 < wait <= 0.1
+    time.sleep(wait)
+    assert scheduler.next_frame()[1] == 'a2'
+
+
+def test_busy_client_is_skipped_until_done():
+    scheduler = FrameScheduler(max_fps=0)
+    scheduler.offer('a', 'a1')
+    assert scheduler.next_frame()[1] == 'a1'
+    scheduler.offer('a', 'a2')
+    scheduler.offer('b', 'b1')
+    # a's first frame is still being analyzed, so b goes first and a waits
+    assert scheduler.next_frame()[1] == 'b1'
+    assert scheduler.next_frame() == (None, None, None)
+    assert scheduler.stats()['in_flight'] == 2
+    scheduler.done('a')
+    assert scheduler.next_frame()[1] == 'a2'
+
+
+def test_remove_forgets_busy_client():
+    scheduler = FrameScheduler(max_fps=0)
+    scheduler.offer('a', 'a1')
+    scheduler.next_frame()
+    scheduler.remove('a')
+    scheduler.offer('a', 'a2')
+    assert scheduler.next_frame()[1] == 'a2'
+    scheduler.done('a')
+    assert scheduler.stats()['in_flight'] == 0
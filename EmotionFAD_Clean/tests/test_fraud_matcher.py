@@ -0,0 +1,48 @@
+"""
+EmotionFAD - Fraud Matcher tests
+"""
+
+import re
+
+from fraud_matcher import FraudMatcher
+
+
+def test_keywords_respect_word_boundaries():
+    matcher = FraudMatcher(['scam', 'gift card'], [])
+    result = matcher.match('No scammer here, but this Gift Card is a scam.')
+    assert result['keywords_found'] == ['scam', 'gift card']
+    assert [m['keyword'] for m in result['keyword_matches']] == ['gift card', 'scam']
+
+
+def test_patterns_report_first_match_in_list_order():
+    patterns = [r'\bact\s+now\b', r'\bsend\s+me\s+money']
+    matcher = FraudMatcher([], patterns)
+    result = matcher.match('Please SEND me money, act now!')
+    assert result['patterns_found'] == patterns
+    assert [m['pattern'] for m in result['pattern_matches']] == [patterns[1], patterns[0]]
+
+
+def test_offsets_index_the_original_text():
+    # 'İ' lowercases to two characters, shifting every later offset of text.lower()
+    text = 'İİ wire transfer to a fraud account'
+    assert len(text.lower()) != len(text)
+    matcher = FraudMatcher(['wire transfer', 'fraud'], [r'fraud\s+account'])
+    result = matcher.match(text)
+    for match in result['keyword_matches']:
+        assert text[match['start']:match['end']].lower() == match['keyword']
+    (pattern,) = result['pattern_matches']
+    assert re.fullmatch(pattern['pattern'], text[pattern['start']:pattern['end']].lower())
+
+
+def test_update_rebuilds_and_changes_version():
+    keywords = ['scam']
+    matcher = FraudMatcher(keywords, [])
+    version = matcher.version
+
+    # Editing the caller's list does not affect the matcher until update()
+    keywords.append('bribe')
+    assert matcher.match('a bribe')['keywords_found'] == []
+
+    matcher.update(keywords=keywords)
+    assert matcher.match('a bribe')['keywords_found'] == ['bribe']
+    assert matcher.version != version
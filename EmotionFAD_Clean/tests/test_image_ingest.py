@@ -0,0 +1,78 @@
+"""
+EmotionFAD - Image Ingest tests
+"""
+
+import base64
+import io
+
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+np = pytest.importorskip('numpy')
+Image = pytest.importorskip('PIL.Image')
+
+from image_ingest import EXIF_ORIENTATION_TAG, ImageDecoder, probe
+
+RED, BLUE = (255, 0, 0), (0, 0, 255)
+
+
+def _encode(img, fmt, **params):
+    out = io.BytesIO()
+    img.save(out, fmt, **params)
+    return out.getvalue()
+
+
+def _halves(width=200, height=100):
+    """RGB image whose left half is red and right half blue."""
+    img = Image.new('RGB', (width, height), BLUE)
+    img.paste(RED, (0, 0, width // 2, height))
+    return img
+
+
+def test_exif_orientation_is_applied():
+    exif = Image.Exif()
+    exif[EXIF_ORIENTATION_TAG] = 6
+    data = _encode(_halves(), 'JPEG', quality=95, exif=exif)
+    assert probe(data) == (200, 100, False, 6)
+
+    image = ImageDecoder(max_side=0).decode(data)
+
+    # Rotated 90 degrees clockwise for display: the red left half ends up on top
+    assert image.shape == (200, 100, 3)
+    assert image[40, 50, 2] > 200 and image[40, 50, 0] < 50
+    assert image[160, 50, 0] > 200 and image[160, 50, 2] < 50
+
+
+def test_transparency_is_composited_onto_white():
+    img = Image.new('RGBA', (40, 20), (0, 0, 0, 0))
+    img.paste((0, 0, 255, 255), (20, 0, 40, 20))
+    image = ImageDecoder(max_side=0).decode(_encode(img, 'PNG'))
+
+    assert image.shape == (20, 40, 3)
+    assert tuple(image[10, 5]) == (255, 255, 255)
+    assert tuple(image[10, 30]) == (255, 0, 0)
+
+
+def test_half_transparent_pixels_blend_with_the_background():
+    img = Image.new('RGBA', (10, 10), (0, 0, 0, 128))
+    image = ImageDecoder(max_side=0, background=(255, 255, 255)).decode(_encode(img, 'PNG'))
+    assert tuple(image[5, 5]) == (127, 127, 127)
+
+
+@pytest.mark.parametrize('fmt', ['JPEG', 'PNG'])
+def test_large_images_are_downscaled_to_max_side(fmt):
+    data = _encode(_halves(2000, 1000), fmt)
+    image = ImageDecoder(max_side=500).decode(data)
+
+    assert image.shape == (250, 500, 3)
+    assert image[125, 100, 2] > 200 and image[125, 400, 0] > 200
+
+
+def test_base64_data_urls_and_garbage():
+    data = _encode(_halves(), 'PNG')
+    decoder = ImageDecoder()
+    url = 'data:image/png;base64,' + base64.b64encode(data).decode()
+
+    assert decoder.decode(url).shape == (100, 200, 3)
+    assert decoder.decode(base64.b64encode(data).decode()).shape == (100, 200, 3)
+    assert decoder.decode(b'not an image') is None
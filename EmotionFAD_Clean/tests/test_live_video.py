@@ -0,0 +1,93 @@
+"""
+EmotionFAD - Live Video tests
+"""
+
+import threading
+import time
+
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+np = pytest.importorskip('numpy')
+pytest.importorskip('textblob')
+
+from client_state import AnalysisSessions, MemoryStateStore
+from engine import engine
+from live_video import LiveVideo, parse_frame
+
+
+@pytest.fixture(autouse=True)
+def fer(monkeypatch):
+    monkeypatch.setenv('FAD_STUB_LATENCY_MS', '0')
+    # As the servers do at import
+    engine.require('fer')
+
+
+class _FakeSocketIO:
+    """Background tasks as daemon threads; emits are recorded."""
+
+    def __init__(self):
+        self.emitted = []
+        self._lock = threading.Lock()
+
+    def start_background_task(self, target):
+        threading.Thread(target=target, daemon=True).start()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def emit(self, event, data, to=None):
+        with self._lock:
+            self.emitted.append((event, data, to))
+
+    def events(self, sid, event=None):
+        with self._lock:
+            return [data for name, data, to in self.emitted if to == sid and event in (None, name)]
+
+
+def _jpeg(seed):
+    image = np.random.default_rng(seed).integers(0, 255, (160, 160, 3), dtype=np.uint8)
+    return cv2.imencode('.jpg', image)[1].tobytes()
+
+
+def _wait_for(condition, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+
+
+def test_payloads_are_binary_or_dicts():
+    assert parse_frame(b'jpeg') == (b'jpeg', None)
+    assert parse_frame({'image': 'abc', 'frame_id': 7}) == ('abc', 7)
+
+
+def test_frames_are_answered_with_compact_results_in_order():
+    socketio = _FakeSocketIO()
+    sessions = AnalysisSessions(MemoryStateStore())
+    sessions.connect('sid')
+    live_video = LiveVideo(socketio, sessions, max_fps=0, workers=2)
+
+    assert live_video.offer('sid', {}) == 'No frame provided'
+    for frame_id in range(3):
+        assert live_video.offer('sid', {'frame': _jpeg(frame_id), 'frame_id': frame_id}) is None
+        _wait_for(lambda: len(socketio.events('sid', 'processed_frame')) > frame_id)
+
+    replies = socketio.events('sid', 'processed_frame')
+    assert [reply['frame_id'] for reply in replies] == [0, 1, 2]
+    assert [reply['sequence'] for reply in replies] == [1, 2, 3]
+    assert 'frame' not in replies[0]
+
+
+def test_failures_send_a_generic_error_and_free_the_client():
+    class _BrokenSessions:
+        def get(self, sid):
+            raise RuntimeError('state store unreachable at redis://secret-host')
+
+    socketio = _FakeSocketIO()
+    live_video = LiveVideo(socketio, _BrokenSessions(), max_fps=0)
+    live_video.offer('sid', _jpeg(0))
+    _wait_for(lambda: socketio.events('sid', 'error'))
+
+    assert socketio.events('sid', 'error') == [{'error': 'Failed to process video frame'}]
+    _wait_for(lambda: live_video.scheduler.stats()['in_flight'] == 0)
@@ -0,0 +1,70 @@
+"""
+EmotionFAD - Message Queue tests
+"""
+
+import time
+
+import pytest
+
+socketio = pytest.importorskip('socketio')
+
+from message_queue import LocalBroker, MemoryManager, create_client_manager, create_emitter, get_broker
+
+
+class _Server(socketio.Server):
+    """A threading Server that records the events it sends to its connected clients."""
+
+    def __init__(self, url):
+        super().__init__(async_mode='threading', client_manager=create_client_manager(url))
+        self.sent = []
+        self.manager.initialize()
+
+    def connect_client(self, eio_sid):
+        return self.manager.connect(eio_sid, '/')
+
+    def _send_packet(self, eio_sid, pkt):
+        self.sent.append((eio_sid, pkt.data))
+
+    def _send_eio_packet(self, eio_sid, eio_pkt):
+        # Newer releases encode an event once and send it to every recipient
+        self._send_packet(eio_sid, self.packet_class(encoded_packet=eio_pkt.data))
+
+    def wait_for_event(self, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        while not self.sent and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self.sent
+
+
+def test_broker_delivers_to_every_subscriber():
+    broker = LocalBroker()
+    first, second = broker.subscribe('c'), broker.subscribe('c')
+    other = broker.subscribe('other')
+    assert broker.publish('c', 'hello') == 2
+    assert (first.get_nowait(), second.get_nowait()) == ('hello', 'hello')
+    assert other.empty()
+    assert get_broker('memory://a') is get_broker('memory://a') is not get_broker('memory://b')
+
+
+def test_emit_reaches_a_client_connected_to_another_server():
+    url = 'memory://test-emit'
+    server = _Server(url)
+    assert isinstance(server.manager, MemoryManager)
+    sid = server.connect_client('eio-1')
+
+    # A second manager on the same broker, e.g. another worker or a script
+    create_emitter(url).emit('processed_frame', {'sequence': 1}, to=sid)
+
+    assert server.wait_for_event() == [('eio-1', ['processed_frame', {'sequence': 1}])]
+
+
+def test_other_clients_and_servers_do_not_get_the_event():
+    url = 'memory://test-rooms'
+    first, second = _Server(url), _Server(url)
+    sid = first.connect_client('eio-1')
+    second.connect_client('eio-2')
+
+    second.emit('risk_report', {'risk': 0.1}, to=sid)
+
+    assert first.wait_for_event() == [('eio-1', ['risk_report', {'risk': 0.1}])]
+    assert second.sent == []
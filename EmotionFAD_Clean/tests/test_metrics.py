@@ -0,0 +1,111 @@
+"""
+EmotionFAD - Metrics tests
+"""
+
+import pytest
+
+from metrics import Histogram, Registry, stage_trace
+
+
+def _samples(text):
+    """{'name{labels}': value} for every sample line of a rendered registry."""
+    return dict(line.rsplit(' ', 1) for line in text.splitlines() if line and not line.startswith('#'))
+
+
+def test_stages_are_timed_and_errors_counted():
+    registry = Registry(enabled=True)
+    with registry.stage('decode'):
+        pass
+    with pytest.raises(ValueError):
+        with registry.stage('classify'):
+            raise ValueError('boom')
+
+    samples = _samples(registry.render())
+    assert samples['fad_stage_seconds_count{stage="decode"}'] == '1'
+    assert samples['fad_stage_seconds_bucket{stage="decode",le="+Inf"}'] == '1'
+    assert samples['fad_stage_seconds_count{stage="classify"}'] == '1'
+    assert samples['fad_stage_errors_total{stage="classify"}'] == '1'
+    assert 'fad_stage_errors_total{stage="decode"}' not in samples
+
+
+def test_disabled_registry_records_nothing():
+    registry = Registry(enabled=False)
+    with registry.stage('decode'):
+        pass
+    registry.counter('fad_things_total', 'Things').inc()
+
+    assert _samples(registry.render()) == {}
+
+
+def test_profiled_requests_trace_stages_while_disabled():
+    registry = Registry(enabled=False)
+    trace = []
+    token = stage_trace.set(trace)
+    try:
+        with registry.stage('detect'):
+            pass
+    finally:
+        stage_trace.reset(token)
+
+    assert [(name, failed) for name, _, failed in trace] == [('detect', False)]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram((1, 5))
+    for value in (0.5, 1, 3, 9):
+        histogram.observe(value)
+
+    assert histogram.cumulative() == [(1, 2), (5, 3), (float('inf'), 4)]
+    assert histogram.snapshot() == {'buckets': {'1': 2, '5': 3, '+Inf': 4}, 'count': 4, 'sum': 13.5, 'mean': 3.375}
+
+    registry = Registry(enabled=True)
+    family = registry.histogram('fad_faces', 'Faces', (1, 5), ('engine',))
+    for value in (0.5, 1, 3, 9):
+        family.observe(value, engine='fer')
+    samples = _samples(registry.render())
+    assert samples['fad_faces_bucket{engine="fer",le="1"}'] == '2'
+    assert samples['fad_faces_bucket{engine="fer",le="+Inf"}'] == '4'
+    assert samples['fad_faces_sum{engine="fer"}'] == '13.5'
+
+
+def test_label_values_are_escaped():
+    registry = Registry(enabled=True)
+    registry.counter('fad_requests_total', 'Requests', ('route',)).inc(route='/a"b\\c')
+    assert 'fad_requests_total{route="/a\\"b\\\\c"} 1' in registry.render()
+
+
+def test_component_stats_are_exported_at_scrape_time():
+    registry = Registry(enabled=True)
+    histogram = Histogram((1, 4))
+    histogram.observe(3)
+    state = {'hits': 5, 'entries': 2, 'hit_rate': 0.5, 'batch_size': histogram.snapshot()}
+    registry.register_stats('cache', lambda: state, counters=('hits', 'missing'),
+                            gauges=('entries', 'hit_rate'), histograms=('batch_size',))
+    registry.register_stats('off', lambda: None, gauges=('entries',))
+    registry.register_stats('broken', lambda: 1 / 0, gauges=('entries',))
+
+    samples = _samples(registry.render())
+    assert samples['fad_cache_hits_total'] == '5'
+    assert samples['fad_cache_entries'] == '2'
+    assert samples['fad_cache_hit_rate'] == '0.5'
+    assert samples['fad_cache_batch_size_bucket{le="1"}'] == '0'
+    assert samples['fad_cache_batch_size_bucket{le="4"}'] == '1'
+    assert samples['fad_cache_batch_size_count'] == '1'
+    assert not any(name.startswith(('fad_cache_missing', 'fad_off', 'fad_broken')) for name in samples)
+
+    # Read again on the next scrape
+    state['hits'] = 6
+    assert _samples(registry.render())['fad_cache_hits_total'] == '6'
+
+
+def test_metrics_endpoint_is_off_by_default(monkeypatch):
+    import metrics
+    monkeypatch.setattr(metrics.metrics, 'enabled', False)
+    body, status, _ = metrics.metrics_response()
+    assert status == 404 and 'FAD_METRICS=1' in body
+
+    monkeypatch.setattr(metrics.metrics, 'enabled', True)
+    body, status, headers = metrics.metrics_response()
+    assert status == 200
+    assert headers['Content-Type'] == metrics.CONTENT_TYPE
+    assert '# TYPE fad_stage_seconds histogram' in body
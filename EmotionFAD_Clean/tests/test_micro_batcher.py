@@ -0,0 +1,150 @@
+"""
+EmotionFAD - Micro-batcher tests
+"""
+
+import threading
+import time
+
+import pytest
+
+from micro_batcher import MicroBatcher
+
+
+class _Recorder:
+    """batch_fn that records every batch it is called with."""
+
+    def __init__(self, release=None):
+        self.batches = []
+        self.release = release
+
+    def __call__(self, items):
+        if self.release is not None:
+            self.release.wait(5)
+        self.batches.append(list(items))
+        return [item * 2 for item in items]
+
+
+def test_items_submitted_together_share_a_batch():
+    record = _Recorder()
+    batcher = MicroBatcher(record, max_batch_size=16, max_wait_ms=200)
+    try:
+        futures = [batcher.submit(n) for n in range(5)]
+        assert [future.result(timeout=5) for future in futures] == [0, 2, 4, 6, 8]
+        assert record.batches == [[0, 1, 2, 3, 4]]
+    finally:
+        batcher.stop()
+
+
+def test_a_partial_batch_is_flushed_after_max_wait():
+    record = _Recorder()
+    batcher = MicroBatcher(record, max_batch_size=16, max_wait_ms=50)
+    try:
+        started = time.perf_counter()
+        assert batcher.process(3, timeout=5) == 6
+        waited = time.perf_counter() - started
+        assert 0.04 <= waited < 2
+        assert record.batches == [[3]]
+    finally:
+        batcher.stop()
+
+
+def test_batches_are_capped_at_max_batch_size():
+    release = threading.Event()
+    record = _Recorder(release)
+    batcher = MicroBatcher(record, max_batch_size=4, max_wait_ms=200)
+    try:
+        futures = [batcher.submit(n) for n in range(10)]
+        release.set()
+        assert [future.result(timeout=5) for future in futures] == [n * 2 for n in range(10)]
+        assert [len(batch) for batch in record.batches] == [4, 4, 2]
+    finally:
+        batcher.stop()
+
+
+def test_batch_errors_reach_every_caller():
+    def fail(items):
+        raise ValueError('model exploded')
+
+    batcher = MicroBatcher(fail, max_wait_ms=50)
+    try:
+        futures = [batcher.submit(n) for n in range(3)]
+        for future in futures:
+            with pytest.raises(ValueError, match='model exploded'):
+                future.result(timeout=5)
+        assert batcher.stats()['errors'] == 1
+        # The worker keeps serving after a failed batch
+        batcher.batch_fn = _Recorder()
+        assert batcher.process(1, timeout=5) == 2
+    finally:
+        batcher.stop()
+
+
+def test_a_wrong_result_count_fails_the_batch():
+    batcher = MicroBatcher(lambda items: items[:-1], max_wait_ms=50, name='short')
+    try:
+        futures = [batcher.submit(n) for n in range(2)]
+        for future in futures:
+            with pytest.raises(RuntimeError, match='short returned 1 results for 2 items'):
+                future.result(timeout=5)
+    finally:
+        batcher.stop()
+
+
+def test_stats_histograms():
+    batcher = MicroBatcher(_Recorder(), max_batch_size=8, max_wait_ms=100)
+    try:
+        futures = [batcher.submit(n) for n in range(3)]
+        [future.result(timeout=5) for future in futures]
+        stats = batcher.stats()
+    finally:
+        batcher.stop()
+
+    assert stats['batch_size']['count'] == 1
+    assert stats['batch_size']['sum'] == 3
+    assert stats['batch_size']['buckets']['2'] == 0
+    assert stats['batch_size']['buckets']['4'] == 1
+    assert stats['batch_size']['buckets']['+Inf'] == 1
+    assert stats['queue_latency_ms']['count'] == 3
+    assert stats['pending'] == 0
+
+
+def test_from_env_is_off_by_default(monkeypatch):
+    monkeypatch.delenv('FAD_MICROBATCH_WINDOW_MS', raising=False)
+    assert MicroBatcher.from_env(_Recorder()) is None
+
+    monkeypatch.setenv('FAD_MICROBATCH_WINDOW_MS', '5')
+    monkeypatch.setenv('FAD_MICROBATCH_SIZE', '3')
+    batcher = MicroBatcher.from_env(_Recorder(), name='fer')
+    try:
+        assert batcher.max_batch_size == 3
+        assert batcher.max_wait == pytest.approx(0.005)
+    finally:
+        batcher.stop()
+
+
+def test_batched_scores_match_unbatched(monkeypatch):
+    cv2 = pytest.importorskip('cv2')
+    np = pytest.importorskip('numpy')
+    monkeypatch.setenv('FAD_STUB_LATENCY_MS', '0')
+    from emotion_analysis import EmotionAnalyzer
+
+    rng = np.random.default_rng(7)
+    image = rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    image = cv2.GaussianBlur(image, (9, 9), 0)
+    # Faces near the edges, of different sizes, so crops and offsets differ
+    boxes = [(0, 0, 90, 110), (250, 150, 160, 160), (560, 380, 80, 100), (40, 300, 120, 140)]
+
+    analyzer = EmotionAnalyzer()
+    unbatched = analyzer._classify_boxes(image, boxes)
+
+    analyzer.batcher = MicroBatcher(analyzer.classify_faces_batch, max_batch_size=16, max_wait_ms=50, name='fer')
+    try:
+        batched = analyzer._classify_boxes(image, boxes)
+    finally:
+        analyzer.batcher.stop()
+
+    assert [face['box'] for face in batched] == [face['box'] for face in unbatched]
+    for plain, grouped in zip(unbatched, batched):
+        assert grouped['emotions'].keys() == plain['emotions'].keys()
+        for label, score in plain['emotions'].items():
+            assert grouped['emotions'][label] == pytest.approx(score, abs=0.01)
@@ -0,0 +1,78 @@
+"""
+EmotionFAD - Model manager tests
+"""
+
+import threading
+import time
+
+import model_manager
+from model_manager import ModelManager
+
+
+class FlakyLoader:
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError('weights missing')
+        return 'model'
+
+
+def test_failed_load_is_not_retried_until_backoff(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(model_manager.time, 'monotonic', lambda: clock[0])
+    loader = FlakyLoader(failures=2)
+    manager = ModelManager(retry_seconds=10)
+    manager.register('m', loader)
+
+    assert manager.get('m') is None
+    assert manager.get('m') is None
+    assert loader.calls == 1
+    assert manager.status()['m']['retry_in_seconds'] == 10
+
+    clock[0] += 10
+    assert manager.get('m') is None
+    assert loader.calls == 2
+    # Backoff doubles after each failure
+    assert manager.status()['m']['retry_in_seconds'] == 20
+
+    clock[0] += 20
+    assert manager.get('m') == 'model'
+    assert manager.is_ready('m') and manager.healthy
+
+
+def test_force_load_skips_backoff():
+    loader = FlakyLoader(failures=1)
+    manager = ModelManager(retry_seconds=60)
+    manager.register('m', loader)
+    assert manager.load('m') is None
+    assert manager.load('m', force=True) == 'model'
+
+
+def test_slow_load_does_not_block_other_models():
+    release = threading.Event()
+    manager = ModelManager()
+    manager.register('slow', lambda: release.wait(5) and 'slow')
+    manager.register('fast', lambda: 'fast')
+
+    loading = threading.Thread(target=manager.get, args=('slow',))
+    loading.start()
+    time.sleep(0.05)
+    started = time.perf_counter()
+    assert manager.get('fast') == 'fast'
+    assert manager.status()['slow']['state'] == 'loading'
+    assert time.perf_counter() - started < 1
+    release.set()
+    loading.join()
+    assert manager.ready
+
+
+def test_preload_is_deferred_to_workers_after_fork(monkeypatch):
+    monkeypatch.delenv('FAD_PRELOAD_MODELS', raising=False)
+    monkeypatch.delenv('FAD_LOAD_MODELS_AFTER_FORK', raising=False)
+    assert model_manager.preload_enabled()
+    monkeypatch.setenv('FAD_LOAD_MODELS_AFTER_FORK', '1')
+    assert not model_manager.preload_enabled()
@@ -0,0 +1,114 @@
+"""
+EmotionFAD - Request Profiling tests
+"""
+
+import os
+import time
+
+import pytest
+
+import profiling
+from metrics import stage
+from profiling import RequestProfiler
+
+
+def _slow_model_call(seconds):
+    time.sleep(seconds)
+
+
+def _kept(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith('.json'))
+
+
+def test_off_by_default(tmp_path):
+    profiler = RequestProfiler(directory=str(tmp_path))
+    assert profiler.enabled is False
+    assert profiler.start('http', '/analyze/text') is None
+    with profiler.profile('http', '/analyze/text'):
+        pass
+    assert os.listdir(tmp_path) == []
+
+
+def test_sampled_request_keeps_cprofile_and_stage_timings(tmp_path):
+    profiler = RequestProfiler(directory=str(tmp_path), sample_rate=1.0)
+    with profiler.profile('http', '/analyze/text', method='POST'):
+        with stage('text_features'):
+            pass
+        with stage('score'):
+            pass
+
+    (name,) = _kept(tmp_path)
+    record = profiler.load(name[:-len('.json')])
+    assert record['sampled'] is True and record['slow'] is False
+    assert [item['stage'] for item in record['stages']] == ['text_features', 'score']
+    assert record['info'] == {'method': 'POST'}
+    assert 'cumulative' in record['cprofile']
+    assert profiler.pstats_path(record['id']) is not None
+
+
+def test_only_slow_requests_keep_their_stacks(tmp_path):
+    profiler = RequestProfiler(directory=str(tmp_path), slow_ms=50, interval_ms=2)
+    with profiler.profile('socketio', 'video_frame'):
+        pass
+    assert _kept(tmp_path) == []
+
+    profiler.call('socketio', 'video_frame', _slow_model_call, 0.2)
+
+    (name,) = _kept(tmp_path)
+    record = profiler.load(name[:-len('.json')])
+    assert record['slow'] is True and record['sampled'] is False
+    assert record['duration_ms'] >= 200
+    assert record['stack_samples'] > 0
+    assert any('_slow_model_call' in stack for stack in record['stacks'])
+
+
+def test_errors_are_recorded(tmp_path):
+    profiler = RequestProfiler(directory=str(tmp_path), sample_rate=1.0)
+    with pytest.raises(RuntimeError):
+        with profiler.profile('http', '/analyze/facial'):
+            raise RuntimeError('model failed')
+
+    (record,) = profiler.recent()
+    assert record['error'] == 'model failed'
+
+
+def test_oldest_profiles_are_rotated_out(tmp_path):
+    profiler = RequestProfiler(directory=str(tmp_path), sample_rate=1.0, keep=2)
+    ids = []
+    for _ in range(3):
+        with profiler.profile('http', '/analyze/text'):
+            pass
+        ids.append(profiler.recent(limit=1)[0]['id'])
+        time.sleep(0.002)
+
+    assert [record['id'] for record in profiler.recent()] == ids[:0:-1]
+    assert profiler.pstats_path(ids[0]) is None
+    assert profiler.written == 3
+
+
+def test_profile_ids_cannot_leave_the_directory(tmp_path):
+    profiler = RequestProfiler(directory=str(tmp_path), sample_rate=1.0)
+    assert profiler.load('../secrets') is None
+    assert profiler.pstats_path('../secrets') is None
+
+
+def test_admin_routes_need_the_admin_token(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, 'profiler', RequestProfiler(directory=str(tmp_path), slow_ms=1, interval_ms=1))
+    profiling.profiler.call('http', '/analyze/facial', _slow_model_call, 0.05)
+    profile_id = profiling.profiler.recent()[0]['id']
+
+    monkeypatch.delenv('FAD_ADMIN_TOKEN', raising=False)
+    assert profiling.admin_profiles_response({}, {'X-Admin-Token': ''})[1] == 404
+
+    monkeypatch.setenv('FAD_ADMIN_TOKEN', 'let-me-in')
+    assert profiling.admin_profiles_response({}, {'X-Admin-Token': 'wrong'})[1] == 404
+    body, status, _ = profiling.admin_profiles_response({'slow': '1'}, {'Authorization': 'Bearer let-me-in'})
+    assert status == 200
+    assert [record['id'] for record in body['profiles']] == [profile_id]
+
+    body, status, headers = profiling.admin_profile_response(profile_id, {'format': 'collapsed'},
+                                                             {'X-Admin-Token': 'let-me-in'})
+    assert status == 200 and headers['Content-Type'].startswith('text/plain')
+    assert '_slow_model_call' in body
+    assert profiling.admin_profile_response(profile_id, {'format': 'pstats'},
+                                            {'X-Admin-Token': 'let-me-in'})[1] == 404
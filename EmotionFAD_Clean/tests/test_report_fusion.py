@@ -0,0 +1,99 @@
+"""
+EmotionFAD - Report Fusion tests
+"""
+
+import pytest
+
+pytest.importorskip('textblob')
+
+from report_fusion import Mailbox, ReportFusion, sse_event
+from text_analysis import TextAnalyzer
+
+
+@pytest.fixture(scope='module')
+def text():
+    return TextAnalyzer()
+
+
+def _facial(stress=0.5, deception=0.2):
+    return {'success': True, 'dominant_emotion': 'fear', 'stress_level': stress,
+            'deception_risk': deception, 'mental_health_score': 40.0}
+
+
+def test_reports_combine_the_latest_input_of_each_kind(text):
+    fusion = ReportFusion()
+    facial = fusion.update_facial('s1', _facial())
+    report = fusion.update_text('s1', text.analyze_text_sentiment('Send the gift card now, act now!'))
+
+    assert (facial['sequence'], report['sequence']) == (1, 2)
+    assert report['updated'] == 'text'
+    assert report['facial']['stress_level'] == 0.5
+    assert report['text']['fraud_risk_score'] > 0
+    assert report['overall_risk_score'] > facial['overall_risk_score']
+    assert fusion.latest('s1') is report
+
+
+def test_subscribers_only_get_their_own_session():
+    fusion = ReportFusion()
+    received = []
+    token = fusion.subscribe('s1', received.append)
+    fusion.update_facial('s1', _facial())
+    fusion.update_facial('s2', _facial())
+    fusion.unsubscribe('s1', token)
+    fusion.update_facial('s1', _facial())
+
+    assert [report['session_id'] for report in received] == ['s1']
+    assert fusion.stats()['subscribers'] == 0
+
+
+def test_results_without_a_session_are_not_fused(text):
+    fusion = ReportFusion()
+    assert fusion.update_facial(None, _facial()) is None
+    assert fusion.update_text('', text.analyze_text_sentiment('hello')) is None
+    assert fusion.stats()['sessions'] == 0
+
+
+def test_oldest_session_is_evicted_at_capacity():
+    fusion = ReportFusion(max_sessions=2)
+    for session_id in ('s1', 's2', 's3'):
+        fusion.update_facial(session_id, _facial())
+    assert fusion.latest('s1') is None
+    assert fusion.latest('s3') is not None
+
+
+def test_mailbox_keeps_only_the_newest_report():
+    mailbox = Mailbox()
+    mailbox.put({'sequence': 1})
+    mailbox.put({'sequence': 2})
+    assert mailbox.get(timeout=0) == {'sequence': 2}
+    assert mailbox.get(timeout=0.01) is None
+    assert sse_event({'sequence': 3}).startswith('event: report\nid: 3\n')
+
+
+def test_text_request_without_session_id_is_not_keyed_by_address():
+    pytest.importorskip('flask')
+    import app as fad_app
+    response = fad_app.app.test_client().post('/analyze/text', json={'text': 'send the gift card now'},
+                                              environ_base={'REMOTE_ADDR': '203.0.113.7'})
+    assert response.status_code == 200
+    assert fad_app.fusion.latest('203.0.113.7') is None
+
+
+def test_events_stream_only_serves_the_session_owner():
+    pytest.importorskip('flask')
+    import app as fad_app
+    client = fad_app.app.test_client()
+    owner = client.post('/sessions').get_json()
+    other = client.post('/sessions').get_json()
+    assert owner['session_id'] != other['session_id']
+
+    assert client.get(f"/events/{owner['session_id']}").status_code == 403
+    assert client.get(f"/events/{owner['session_id']}?token={other['events_token']}").status_code == 403
+    assert client.get(f"/events/{owner['session_id']}?token=not-a-token").status_code == 403
+
+    response = client.get(f"/events/{owner['session_id']}?token={owner['events_token']}", buffered=False)
+    try:
+        assert response.status_code == 200
+        assert response.mimetype == 'text/event-stream'
+    finally:
+        response.close()
@@ -0,0 +1,56 @@
+"""
+EmotionFAD - Risk Scoring tests
+"""
+
+import pytest
+
+from risk_scoring import (
+    as_percentages, assess_risk, facial_report_component, score_emotions, text_report_component,
+    voice_report_component
+)
+
+
+def test_fractions_and_percentages_score_the_same():
+    fractions = {'fear': 0.5, 'angry': 0.2, 'happy': 0.3}
+    percentages = {'fear': 50.0, 'angry': 20.0, 'happy': 30.0}
+    assert as_percentages(fractions) == pytest.approx(percentages)
+    assert score_emotions(fractions) == pytest.approx(score_emotions(percentages))
+
+
+def test_scores_stay_in_range():
+    scores = score_emotions({emotion: 100.0 for emotion in ('fear', 'angry', 'sad', 'disgust', 'surprise')})
+    assert scores['stress_level'] == 1.0
+    assert 0 <= scores['deception_risk'] <= 1.0
+    assert score_emotions({'happy': 100.0})['mental_health_score'] == 100
+    assert score_emotions({'sad': 100.0})['mental_health_score'] == 0
+
+
+def test_smoothed_session_scores_win_over_one_frame():
+    frame = {'success': True, 'deception_risk': 0.9, 'stress_level': 0.9, 'mental_health_score': 20}
+    temporal = {'deception_risk': 0.1, 'stress_level': 0.1, 'mental_health_score': 80,
+                'sudden_changes': 1, 'frames': 30, 'last_change': {'emotion': 'fear'}}
+    risk, factors = facial_report_component(frame, temporal)
+    assert risk == pytest.approx((0.1 * 0.4 + 0.1 * 0.3) * 0.5)
+    assert factors == ['Sudden emotional shift detected (1 in the last 30 frames, latest: fear)']
+
+
+def test_missing_or_failed_inputs_add_no_risk():
+    assert facial_report_component(None) == (0, [])
+    assert text_report_component({'success': False}) == (0, [])
+    # An uncalibrated voice has no stress level yet
+    assert voice_report_component({'success': True, 'stress_level': None}) == (0, [])
+
+
+def test_risk_levels():
+    assert assess_risk(0.8)[0] == 'HIGH'
+    assert assess_risk(0.5)[0] == 'MEDIUM'
+    assert assess_risk(0.4)[0] == 'LOW'
+
+
+def test_scoring_has_no_engine_or_analyzer_imports():
+    import sys
+    import subprocess
+    code = ('import sys, risk_scoring; '
+            'print(sorted(m for m in ("engine", "fraud_detection", "text_analysis") if m in sys.modules))')
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    assert output.strip() == '[]'
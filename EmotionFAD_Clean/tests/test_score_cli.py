@@ -0,0 +1,98 @@
+"""
+EmotionFAD - Offline scoring CLI tests
+"""
+
+import json
+
+import pytest
+
+import score_cli
+
+pytest.importorskip('textblob')
+
+
+def _run(*argv):
+    return score_cli.run(score_cli.build_parser().parse_args([str(arg) for arg in argv]))
+
+
+def _write_ndjson(path, texts):
+    path.write_text(''.join(json.dumps({'id': i, 'text': text}) + '\n' for i, text in enumerate(texts)))
+
+
+def test_iter_csv_keeps_multiline_fields(tmp_path):
+    path = tmp_path / 'messages.csv'
+    path.write_bytes(b'id,text\n1,"two\nlines"\n2,plain\n')
+    records = [record for _, record in score_cli.iter_csv(str(path))]
+    assert records == [{'id': '1', 'text': 'two\nlines'}, {'id': '2', 'text': 'plain'}]
+
+
+def test_iter_csv_reports_unterminated_quote(tmp_path):
+    path = tmp_path / 'messages.csv'
+    path.write_bytes(b'id,text\n1,ok\n2,"never closed\n')
+    records = [record for _, record in score_cli.iter_csv(str(path))]
+    assert records[0] == {'id': '1', 'text': 'ok'}
+    assert 'Unterminated' in records[1]['_error']
+
+
+def test_iter_ndjson_offsets_resume_after_a_record(tmp_path):
+    path = tmp_path / 'messages.ndjson'
+    _write_ndjson(path, ['a', 'b', 'c'])
+    offsets = [offset for offset, _ in score_cli.iter_ndjson(str(path))]
+    resumed = [record['id'] for _, record in score_cli.iter_ndjson(str(path), offsets[0])]
+    assert resumed == [1, 2]
+
+
+def test_resume_continues_from_checkpoint(tmp_path):
+    source = tmp_path / 'messages.ndjson'
+    _write_ndjson(source, ['hello', 'send me money', 'gift card', 'bye'])
+    output, checkpoint = tmp_path / 'out.ndjson', tmp_path / 'run.ckpt'
+
+    first_line = len(source.read_bytes().splitlines(keepends=True)[0])
+    score_cli.save_checkpoint(str(checkpoint), str(source), first_line, 1)
+    output.write_text('{"id": 0}\n')
+
+    assert _run(source, '-o', output, '--workers', 1, '--checkpoint', checkpoint, '--resume') == 0
+    ids = [json.loads(line)['id'] for line in output.read_text().splitlines()]
+    assert ids == [0, 1, 2, 3]
+    assert json.loads(checkpoint.read_text())['records'] == 4
+
+
+def test_resume_after_a_crash_between_write_and_checkpoint(tmp_path, monkeypatch):
+    source = tmp_path / 'messages.ndjson'
+    _write_ndjson(source, ['hello', 'send me money', 'gift card', 'bye'])
+    output, checkpoint = tmp_path / 'out.ndjson', tmp_path / 'run.ckpt'
+
+    save_checkpoint = score_cli.save_checkpoint
+    saves = []
+
+    def crash_on_second_save(*args, **kwargs):
+        saves.append(args)
+        if len(saves) == 2:
+            raise KeyboardInterrupt
+        save_checkpoint(*args, **kwargs)
+
+    monkeypatch.setattr(score_cli, 'save_checkpoint', crash_on_second_save)
+    with pytest.raises(KeyboardInterrupt):
+        _run(source, '-o', output, '--workers', 1, '--chunk-size', 1, '--checkpoint', checkpoint)
+    monkeypatch.setattr(score_cli, 'save_checkpoint', save_checkpoint)
+
+    # The second report was written but not checkpointed; a third was cut off mid-line
+    with open(output, 'a') as f:
+        f.write('{"id": 2, "succ')
+    assert json.loads(checkpoint.read_text())['records'] == 1
+
+    assert _run(source, '-o', output, '--workers', 1, '--checkpoint', checkpoint, '--resume') == 0
+    ids = [json.loads(line)['id'] for line in output.read_text().splitlines()]
+    assert ids == [0, 1, 2, 3]
+
+
+def test_resume_refuses_a_different_input(tmp_path):
+    original, other = tmp_path / 'a.ndjson', tmp_path / 'b.ndjson'
+    _write_ndjson(original, ['one', 'two'])
+    _write_ndjson(other, ['three', 'four'])
+    output, checkpoint = tmp_path / 'out.ndjson', tmp_path / 'run.ckpt'
+    score_cli.save_checkpoint(str(checkpoint), str(original), 10, 1)
+    output.write_text('kept\n')
+
+    assert _run(other, '-o', output, '--workers', 1, '--checkpoint', checkpoint, '--resume') == 2
+    assert output.read_text() == 'kept\n'
@@ -0,0 +1,42 @@
+"""
+EmotionFAD - /analyze/text/batch tests
+"""
+
+import json
+
+import pytest
+
+pytest.importorskip('flask')
+pytest.importorskip('textblob')
+
+import app as fad_app
+
+
+@pytest.fixture
+def client():
+    return fad_app.app.test_client()
+
+
+def test_bad_ndjson_line_only_fails_its_own_slot(client):
+    body = '{"id": 1, "text": "hello there"}\n{not json}\n\n"send the gift card now"\n'
+    response = client.post('/analyze/text/batch', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert len(results) == 3
+    assert results[0]['success'] and results[0]['id'] == 1
+    assert results[1]['success'] is False
+    assert 'line 2' in results[1]['error']
+    assert results[2]['success'] and 'gift card' in results[2]['fraud_keywords_found']
+
+
+def test_json_array_batch_keeps_order_and_ids(client):
+    items = [{'id': 'a', 'text': 'wire transfer please'}, '', 'nice weather']
+    response = client.post('/analyze/text/batch', data=json.dumps(items), content_type='application/json')
+    results = response.get_json()['results']
+    assert [r.get('id') for r in results] == ['a', None, None]
+    assert [r['success'] for r in results] == [True, False, True]
+
+
+def test_empty_batch_is_rejected(client):
+    response = client.post('/analyze/text/batch', data='\n\n', content_type='application/x-ndjson')
+    assert response.status_code == 400
@@ -0,0 +1,90 @@
+"""
+EmotionFAD - Text Result Cache tests
+"""
+
+import pytest
+
+from text_cache import TextResultCache, normalize_text, text_key
+
+
+def test_composed_and_decomposed_text_share_a_key():
+    assert text_key(normalize_text('caf\u00e9')) == text_key(normalize_text('cafe\u0301'))
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TextResultCache(max_entries=2)
+    cache.put('a', 'v1', {'text': 'a'})
+    cache.put('b', 'v1', {'text': 'b'})
+    assert cache.get('a', 'v1') == {'text': 'a'}
+    cache.put('c', 'v1', {'text': 'c'})
+    assert cache.get('b', 'v1') is None
+    assert cache.get('a', 'v1') == {'text': 'a'}
+
+
+def test_new_version_drops_memory_and_disk_entries(tmp_path):
+    path = str(tmp_path / 'text.sqlite')
+    cache = TextResultCache(path=path)
+    cache.put('a', 'v1', {'text': 'a'})
+    assert cache.get('a', 'v2') is None
+    assert cache.stats()['invalidations'] == 1
+    assert cache.stats()['disk_entries'] == 0
+
+
+def test_disk_tier_is_shared_between_caches(tmp_path):
+    path = str(tmp_path / 'text.sqlite')
+    TextResultCache(path=path).put('a', 'v1', {'text': 'a'})
+    other = TextResultCache(path=path)
+    assert other.get('a', 'v1') == {'text': 'a'}
+    assert other.stats()['disk_hits'] == 1
+
+
+def test_case_and_whitespace_variants_share_a_key():
+    key = text_key(normalize_text('Send me  the money\tnow'))
+    assert text_key(normalize_text(' send ME the money\nnow ')) == key
+    assert text_key(normalize_text('send me the money later')) != key
+
+
+def test_disk_entries_are_counted_without_querying(tmp_path):
+    path = str(tmp_path / 'text.sqlite')
+    cache = TextResultCache(path=path)
+    cache.put('a', 'v1', {'text': 'a'})
+    cache.put('a', 'v1', {'text': 'a'})
+    cache.put('b', 'v1', {'text': 'b'})
+    assert cache.stats()['disk_entries'] == 2
+    # A new connection starts from the rows already on disk
+    assert TextResultCache(path=path).stats()['disk_entries'] == 2
+
+    statements = []
+    cache._conn.set_trace_callback(statements.append)
+    cache.stats()
+    assert statements == []
+
+
+def test_disk_tier_drops_its_oldest_rows(tmp_path):
+    path = str(tmp_path / 'text.sqlite')
+    cache = TextResultCache(max_entries=1, path=path, max_disk_rows=10)
+    for n in range(11):
+        cache.put(f'k{n}', 'v1', {'n': n})
+
+    stats = cache.stats()
+    assert stats['disk_entries'] == 9
+    assert stats['disk_evictions'] == 2
+    assert cache.get('k0', 'v1') is None
+    assert cache.get('k1', 'v1') is None
+    assert cache.get('k2', 'v1') == {'n': 2}
+
+
+def test_case_variant_is_served_from_cache_with_its_own_text(monkeypatch):
+    pytest.importorskip('textblob')
+    monkeypatch.delenv('FAD_TEXT_CACHE_PATH', raising=False)
+    from text_analysis import TextAnalyzer
+    analyzer = TextAnalyzer()
+
+    first = analyzer.analyze_text_sentiment('Send the money  now, it is URGENT')
+    again = analyzer.analyze_text_sentiment('send the money now, it is urgent')
+
+    assert (first['cached'], again['cached']) == (False, True)
+    assert first['text'] == 'Send the money now, it is URGENT'
+    assert again['text'] == 'send the money now, it is urgent'
+    assert again['fraud_risk_score'] == first['fraud_risk_score']
+    assert again['keyword_matches'] == first['keyword_matches']
@@ -0,0 +1,80 @@
+"""
+EmotionFAD - Voice Analysis tests
+"""
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from voice_analysis import RingBuffer, VoiceStream, decode_audio_chunk
+
+RATE = 16000
+
+
+def _voice(pitch_hz, seconds, amplitude=0.3):
+    t = np.arange(int(RATE * seconds)) / RATE
+    # A few harmonics, like a voiced vowel
+    wave = sum(np.sin(2 * np.pi * pitch_hz * k * t) / k for k in (1, 2, 3))
+    return (amplitude * wave / 1.8).astype(np.float32)
+
+
+def _pcm16(samples):
+    return (np.clip(samples, -1, 1) * 32767).astype('<i2').tobytes()
+
+
+def test_ring_buffer_reads_across_the_wrap():
+    ring = RingBuffer(5)
+    ring.write(np.arange(4, dtype=np.float32))
+    ring.write(np.arange(4, 7, dtype=np.float32))
+    assert ring.latest(5).tolist() == [2, 3, 4, 5, 6]
+    with pytest.raises(IndexError):
+        ring.read(0, 3)
+
+
+def test_stereo_pcm16_is_mixed_down():
+    stereo = np.array([[0.5, -0.5], [0.25, 0.25]], dtype=np.float32).reshape(-1)
+    samples, rate = decode_audio_chunk({'audio': _pcm16(stereo), 'channels': 2, 'sample_rate': 8000})
+    assert rate == 8000
+    assert np.allclose(samples, [0.0, 0.25], atol=1e-4)
+
+
+def test_pitch_of_a_steady_voice():
+    stream = VoiceStream(sample_rate=RATE)
+    stream.push(_voice(180, 1.0))
+    features = stream.features()
+    assert features['pitch_hz'] == pytest.approx(180, rel=0.02)
+    assert features['voiced_ratio'] > 0.9
+
+
+def test_chunk_size_does_not_change_the_features():
+    audio = _voice(150, 1.5)
+    whole, chunked = VoiceStream(sample_rate=RATE), VoiceStream(sample_rate=RATE)
+    whole.push(audio)
+    for start in range(0, len(audio), 333):
+        chunked.push(audio[start:start + 333])
+    assert whole.features() == chunked.features()
+
+
+def test_silence_has_no_pitch_or_stress():
+    stream = VoiceStream(sample_rate=RATE, calibration_seconds=0.5)
+    result = stream.process_chunk(_pcm16(np.zeros(RATE, dtype=np.float32)))
+    assert result['features']['pitch_hz'] is None
+    assert result['stress_level'] is None
+    assert result['calibrated'] is False
+
+
+def test_raised_pitch_after_calibration_scores_as_stress():
+    stream = VoiceStream(sample_rate=RATE, window_seconds=1.0, calibration_seconds=1.0)
+    for _ in range(4):
+        calm = stream.process_chunk(_pcm16(_voice(120, 0.5)))
+    assert calm['calibrated'] is True
+    for _ in range(4):
+        raised = stream.process_chunk(_pcm16(_voice(190, 0.5, amplitude=0.6)))
+    assert raised['stress_level'] > 0.5
+    assert raised['stress_components']['pitch'] == 1.0
+
+
+def test_sample_rate_change_mid_stream_is_refused():
+    stream = VoiceStream(sample_rate=RATE)
+    with pytest.raises(ValueError):
+        stream.process_chunk({'audio': _pcm16(_voice(150, 0.1)), 'sample_rate': 8000})
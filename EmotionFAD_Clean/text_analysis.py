@@ -0,0 +1,195 @@
+"""
+EmotionFAD - Text Analysis
+Sentiment, fraud keyword/pattern matching and text fraud risk, without any facial model
+"""
+
+import numpy as np
+from datetime import datetime
+from textblob import TextBlob
+from fraud_matcher import FraudMatcher
+from text_cache import TextResultCache, normalize_text, text_key
+from metrics import stage
+
+# Fraud detection keywords and patterns
+FRAUD_KEYWORDS = [
+    'steal', 'hack', 'fraud', 'scam', 'cheat', 'lie', 'deceive', 'manipulate',
+    'fake', 'forge', 'embezzle', 'launder', 'bribe', 'extort', 'blackmail',
+    'phishing', 'identity theft', 'credit card', 'bank account', 'password',
+    'social security', 'illegal', 'crime', 'criminal', 'money transfer',
+    'wire transfer', 'western union', 'gift card', 'bitcoin', 'cryptocurrency'
+]
+
+SUSPICIOUS_PATTERNS = [
+    r'\b(give|send|transfer)\s+(me|us)\s+(money|cash|bitcoin|crypto)',
+    r'\b(bank|credit\s+card|account)\s+(details|number|info)',
+    r'\b(urgent|emergency|immediately|right\s+now)\b.*\b(money|payment)',
+    r'\b(secret|don\'t\s+tell|keep\s+quiet|confidential)\b',
+    r'\b(guaranteed|100%|risk-free)\s+(profit|return|money)',
+    r'\b(act\s+now|limited\s+time|expires\s+soon)\b',
+]
+
+# Bump when text scoring changes so memoized text results are invalidated
+TEXT_SCORING_VERSION = 1
+
+class TextAnalyzer:
+    """Text half of fraud detection: TextBlob sentiment plus the compiled fraud matcher.
+
+    Needs only TextBlob, so text-only servers load this rather than the whole
+    FraudDetectionSystem, which shares one instance (and its text cache) when
+    both are used.
+    """
+
+    def __init__(self, keywords=None, patterns=None, fraud_threshold=0.6):
+        self.fraud_threshold = fraud_threshold
+        # Compiled once here; call self.matcher.update(keywords, patterns) after changing the lists
+        self.matcher = FraudMatcher(FRAUD_KEYWORDS if keywords is None else keywords,
+                                    SUSPICIOUS_PATTERNS if patterns is None else patterns)
+        # Templated messages repeat constantly; identical texts reuse their result
+        self.text_cache = TextResultCache.from_env()
+    
+    def analyze_text_sentiment(self, text):
+        """Analyze text for sentiment and fraud indicators"""
+        try:
+            print(f"🔍 Analyzing text: {text[:50]}...")
+            
+            text = normalize_text(text)
+            cached = self._cached_text_result(text)
+            if cached is not None:
+                print(f"✅ Text analysis cached: {cached['sentiment_category']}, risk: {cached['fraud_risk_score']:.2f}")
+                return cached
+            
+            polarity, subjectivity, matches = self._extract_text_features(text)
+            
+            # Calculate fraud risk score
+            fraud_risk = self._calculate_fraud_risk(
+                polarity,
+                len(matches['keywords_found']),
+                len(matches['patterns_found']),
+                subjectivity
+            )
+            
+            result = self._build_text_result(text, polarity, subjectivity, matches, fraud_risk)
+            self._store_text_result(result)
+            print(f"✅ Text analysis complete: {result['sentiment_category']}, risk: {fraud_risk:.2f}")
+            return result
+        except Exception as e:
+            print(f"❌ Text analysis error: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def analyze_text_batch(self, texts):
+        """Analyze many texts at once, scoring the whole batch in one vectorized step.
+        
+        Results are returned in input order; an item that fails carries its own
+        error without affecting the rest of the batch.
+        """
+        results = [None] * len(texts)
+        rows = []
+        
+        for index, text in enumerate(texts):
+            if not isinstance(text, str) or not text:
+                results[index] = {'success': False, 'error': 'No text provided'}
+                continue
+            try:
+                text = normalize_text(text)
+                cached = self._cached_text_result(text)
+                if cached is not None:
+                    results[index] = cached
+                    continue
+                rows.append((index, text) + self._extract_text_features(text))
+            except Exception as e:
+                results[index] = {'success': False, 'error': str(e)}
+        
+        if rows:
+            polarity = np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows))
+            subjectivity = np.fromiter((row[3] for row in rows), dtype=np.float64, count=len(rows))
+            keyword_counts = np.fromiter((len(row[4]['keywords_found']) for row in rows), dtype=np.float64, count=len(rows))
+            pattern_counts = np.fromiter((len(row[4]['patterns_found']) for row in rows), dtype=np.float64, count=len(rows))
+            
+            risks = self._calculate_fraud_risk_batch(polarity, keyword_counts, pattern_counts, subjectivity)
+            timestamp = datetime.now().isoformat()
+            
+            for (index, text, row_polarity, row_subjectivity, matches), risk in zip(rows, risks.tolist()):
+                results[index] = self._build_text_result(
+                    text, row_polarity, row_subjectivity, matches, risk, timestamp
+                )
+                self._store_text_result(results[index])
+        
+        cached_count = sum(1 for result in results if result.get('cached'))
+        print(f"✅ Batch text analysis complete: {len(rows) + cached_count}/{len(texts)} scored ({cached_count} cached)")
+        return results
+    
+    def _text_cache_version(self):
+        """Everything a text result depends on besides the text itself"""
+        return f"{self.matcher.version}:{self.fraud_threshold}:{TEXT_SCORING_VERSION}"
+    
+    def _cached_text_result(self, text):
+        """Memoized result for an already-normalized text, or None"""
+        if self.text_cache is None:
+            return None
+        cached = self.text_cache.get(text_key(text), self._text_cache_version())
+        if cached is None:
+            return None
+        # The key ignores case, so report this request's own text
+        return dict(cached, text=text, cached=True, timestamp=datetime.now().isoformat())
+    
+    def _store_text_result(self, result):
+        if self.text_cache is not None:
+            payload = {key: value for key, value in result.items() if key != 'timestamp'}
+            self.text_cache.put(text_key(result['text']), self._text_cache_version(), payload)
+    
+    def _extract_text_features(self, text):
+        """Sentiment plus keyword/pattern matches for a single text"""
+        with stage('text_features'):
+            blob = TextBlob(text)
+            sentiment = blob.sentiment
+            matches = self.matcher.match(text)
+        return sentiment.polarity, sentiment.subjectivity, matches
+    
+    def _build_text_result(self, text, polarity, subjectivity, matches, fraud_risk, timestamp=None):
+        """Assemble the text analysis response"""
+        # Determine sentiment category
+        if polarity > 0.3:
+            sentiment_category = 'positive'
+        elif polarity < -0.3:
+            sentiment_category = 'negative'
+        else:
+            sentiment_category = 'neutral'
+        
+        return {
+            'success': True,
+            'text': text,
+            'sentiment_polarity': polarity,
+            'sentiment_subjectivity': subjectivity,
+            'sentiment_category': sentiment_category,
+            'fraud_keywords_found': matches['keywords_found'],
+            'suspicious_patterns_count': len(matches['patterns_found']),
+            'keyword_matches': matches['keyword_matches'],
+            'pattern_matches': matches['pattern_matches'],
+            'fraud_risk_score': fraud_risk,
+            'is_suspicious': fraud_risk > self.fraud_threshold,
+            'cached': False,
+            'timestamp': timestamp or datetime.now().isoformat()
+        }
+    
+    def _calculate_fraud_risk(self, sentiment, keyword_count, pattern_count, subjectivity):
+        """Calculate overall fraud risk score"""
+        keyword_score = min(keyword_count * 0.2, 0.5)
+        pattern_score = min(pattern_count * 0.25, 0.4)
+        sentiment_score = max(0, -sentiment * 0.3)
+        subjectivity_score = subjectivity * 0.1
+        
+        total_risk = keyword_score + pattern_score + sentiment_score + subjectivity_score
+        return min(total_risk, 1.0)
+    
+    def _calculate_fraud_risk_batch(self, sentiment, keyword_count, pattern_count, subjectivity):
+        """Vectorized _calculate_fraud_risk over NumPy arrays"""
+        keyword_score = np.minimum(keyword_count * 0.2, 0.5)
+        pattern_score = np.minimum(pattern_count * 0.25, 0.4)
+        sentiment_score = np.maximum(0, -sentiment * 0.3)
+        subjectivity_score = subjectivity * 0.1
+        
+        total_risk = keyword_score + pattern_score + sentiment_score + subjectivity_score
+        return np.minimum(total_risk, 1.0)
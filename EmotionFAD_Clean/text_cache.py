@@ -0,0 +1,189 @@
+"""
+EmotionFAD - Text Result Memoization
+Content-addressed cache of text analysis results with an optional SQLite tier
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    """Canonical form used for analysis and cache keys (Unicode NFC, runs of whitespace as one space)."""
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+
+def text_key(text):
+    """Content address of an already-normalized text.
+
+    Analysis is case-insensitive, so texts differing only in case share a
+    key; the length is part of it so cached match offsets still index the text.
+    """
+    return hashlib.sha256(f'{len(text)}:{text.casefold()}'.encode('utf-8')).hexdigest()
+
+
+class TextResultCache:
+    """Bounded in-memory LRU in front of an optional SQLite store.
+
+    Every lookup carries the current analysis version (keyword/pattern set,
+    threshold, scoring revision). When it changes, the memory tier is cleared
+    and rows stored under older versions are deleted, so stale results are
+    never served. The SQLite tier keeps at most max_disk_rows rows (0 for no
+    limit), dropping the oldest when it grows past that.
+    """
+
+    def __init__(self, max_entries=10000, path=None, max_disk_rows=100000):
+        self.max_entries = max_entries
+        self.path = path
+        self.max_disk_rows = max_disk_rows
+        self._memory = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+        # Rows in the SQLite tier, counted once per connection and kept up to date
+        # (other processes sharing the file make it approximate until the next trim)
+        self._disk_rows = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.disk_evictions = 0
+
+    @classmethod
+    def from_env(cls):
+        """Build a cache from FAD_TEXT_CACHE_SIZE / _PATH / _DISK_ROWS, or None if the size is 0."""
+        max_entries = int(os.environ.get('FAD_TEXT_CACHE_SIZE', 10000))
+        if max_entries <= 0:
+            return None
+        return cls(max_entries=max_entries, path=os.environ.get('FAD_TEXT_CACHE_PATH') or None,
+                   max_disk_rows=int(os.environ.get('FAD_TEXT_CACHE_DISK_ROWS', 100000)))
+
+    @property
+    def _db(self):
+        """SQLite connection for this process (never shared across a fork), or None."""
+        if not self.path:
+            return None
+        if self._conn is None or self._conn_pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS text_results ('
+                'key TEXT PRIMARY KEY, version TEXT NOT NULL, payload TEXT NOT NULL, created REAL NOT NULL)'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS text_results_created ON text_results (created)')
+            self._conn.commit()
+            self._conn_pid = os.getpid()
+            self._disk_rows = self._conn.execute('SELECT COUNT(*) FROM text_results').fetchone()[0]
+        return self._conn
+
+    def _check_version(self, version):
+        if version == self._version:
+            return
+        if self._version is not None:
+            self.invalidations += 1
+        self._memory.clear()
+        db = self._db
+        if db is not None:
+            deleted = db.execute('DELETE FROM text_results WHERE version != ?', (version,)).rowcount
+            db.commit()
+            self._disk_rows = max(0, self._disk_rows - deleted)
+        self._version = version
+
+    def get(self, key, version):
+        """Return the stored result for key under this version, or None."""
+        with self._lock:
+            self._check_version(version)
+            result = self._memory.get(key)
+            if result is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return result
+
+            db = self._db
+            if db is not None:
+                row = db.execute(
+                    'SELECT payload FROM text_results WHERE key = ? AND version = ?', (key, version)
+                ).fetchone()
+                if row is not None:
+                    result = json.loads(row[0])
+                    self._remember(key, result)
+                    self.disk_hits += 1
+                    return result
+
+            self.misses += 1
+            return None
+
+    def put(self, key, version, result):
+        with self._lock:
+            self._check_version(version)
+            self._remember(key, result)
+            db = self._db
+            if db is not None:
+                payload, created = json.dumps(result), time.time()
+                inserted = db.execute(
+                    'INSERT OR IGNORE INTO text_results (key, version, payload, created) VALUES (?, ?, ?, ?)',
+                    (key, version, payload, created)
+                ).rowcount
+                if inserted:
+                    self._disk_rows += 1
+                else:
+                    db.execute(
+                        'UPDATE text_results SET version = ?, payload = ?, created = ? WHERE key = ?',
+                        (version, payload, created, key)
+                    )
+                if self.max_disk_rows and self._disk_rows > self.max_disk_rows:
+                    self._trim_disk(db)
+                db.commit()
+
+    def _trim_disk(self, db):
+        """Delete the oldest rows, leaving the table 10% under max_disk_rows."""
+        self._disk_rows = db.execute('SELECT COUNT(*) FROM text_results').fetchone()[0]
+        excess = self._disk_rows - int(self.max_disk_rows * 0.9)
+        if excess <= 0:
+            return
+        deleted = db.execute(
+            'DELETE FROM text_results WHERE key IN (SELECT key FROM text_results ORDER BY created LIMIT ?)',
+            (excess,)
+        ).rowcount
+        self._disk_rows -= deleted
+        self.disk_evictions += deleted
+
+    def _remember(self, key, result):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            db = self._db
+            if db is not None:
+                db.execute('DELETE FROM text_results')
+                db.commit()
+                self._disk_rows = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            stats = {
+                'version': self._version,
+                'memory_entries': len(self._memory),
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else None,
+                'invalidations': self.invalidations,
+                'disk_path': self.path
+            }
+            if self._db is not None:
+                stats['disk_entries'] = self._disk_rows
+                stats['disk_evictions'] = self.disk_evictions
+            return stats
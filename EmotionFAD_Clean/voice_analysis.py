@@ -0,0 +1,349 @@
+"""
+EmotionFAD - Voice Analysis
+Streaming prosody (pitch, energy, jitter, speaking rate) and voice stress from chunked PCM/Opus audio
+"""
+
+import base64
+import os
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+AUDIO_FORMATS = ('pcm16', 'float32', 'opus')
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+# Weights of each prosodic deviation in the stress score
+STRESS_WEIGHTS = {'pitch': 0.3, 'energy': 0.2, 'jitter': 0.2, 'speaking_rate': 0.15, 'pitch_variability': 0.15}
+
+
+def _payload_bytes(audio):
+    if isinstance(audio, str):
+        # Base64, optionally as a data URL
+        return base64.b64decode(audio.split(',', 1)[1] if audio.startswith('data:') else audio)
+    return bytes(audio)
+
+
+class OpusDecoder:
+    """Stateful decoder for raw Opus packets (one per audio_data chunk or a list of them); needs opuslib."""
+
+    def __init__(self, sample_rate, channels=1):
+        try:
+            import opuslib
+        except ImportError:
+            raise ImportError('Opus audio needs the opuslib package (pip install opuslib); or send pcm16')
+        if sample_rate not in OPUS_SAMPLE_RATES:
+            raise ValueError(f'Opus sample_rate must be one of {", ".join(map(str, OPUS_SAMPLE_RATES))}')
+        self.decoder = opuslib.Decoder(sample_rate, channels)
+        self.channels = channels
+        # Longest Opus frame is 120 ms
+        self.max_frame = sample_rate * 120 // 1000
+
+    def decode(self, packets):
+        pcm = b''.join(self.decoder.decode(packet, self.max_frame) for packet in packets)
+        return np.frombuffer(pcm, dtype='<i2')
+
+
+def decode_audio_chunk(data, sample_rate=16000, audio_format='pcm16', channels=1, opus_decoder=None):
+    """Mono float32 samples in [-1, 1] and their sample rate from one audio_data payload.
+
+    The payload is raw bytes (binary Socket.IO attachment) in the stream's
+    format, or a dict with 'audio' (bytes or base64; a list of packets for
+    Opus) and optional 'format', 'sample_rate' and 'channels' overriding the
+    stream's. Opus packets go through opus_decoder, which keeps state
+    between chunks.
+    """
+    if isinstance(data, dict):
+        audio = data.get('audio')
+        audio_format = data.get('format') or audio_format
+        sample_rate = int(data.get('sample_rate') or sample_rate)
+        channels = int(data.get('channels') or channels)
+    else:
+        audio = data
+    if audio is None:
+        raise ValueError('No audio data provided')
+    if audio_format not in AUDIO_FORMATS:
+        raise ValueError(f'Unknown audio format, choose from {", ".join(AUDIO_FORMATS)}')
+
+    if audio_format == 'opus':
+        if opus_decoder is None:
+            raise ValueError("Opus audio needs a decoder; send format 'opus' in start_audio")
+        packets = audio if isinstance(audio, list) else [audio]
+        samples = opus_decoder.decode([_payload_bytes(packet) for packet in packets]).astype(np.float32) / 32768.0
+        channels = opus_decoder.channels
+    elif audio_format == 'pcm16':
+        raw = _payload_bytes(audio)
+        samples = np.frombuffer(raw[:len(raw) - len(raw) % 2], dtype='<i2').astype(np.float32) / 32768.0
+    else:
+        raw = _payload_bytes(audio)
+        samples = np.frombuffer(raw[:len(raw) - len(raw) % 4], dtype='<f4')
+
+    if channels > 1:
+        samples = samples[:len(samples) - len(samples) % channels].reshape(-1, channels).mean(axis=1)
+    return np.ascontiguousarray(samples, dtype=np.float32), sample_rate
+
+
+class RingBuffer:
+    """Fixed-capacity float array addressed by absolute position (items written since the start).
+
+    Writes copy only the new items (at most two slices around the wrap), so
+    appending a chunk is O(chunk) however long the stream has run.
+    """
+
+    __slots__ = ('capacity', 'data', 'total')
+
+    def __init__(self, capacity, dtype=np.float32):
+        self.capacity = capacity
+        self.data = np.zeros(capacity, dtype=dtype)
+        self.total = 0
+
+    def write(self, values):
+        if len(values) > self.capacity:
+            # Only the tail survives; the positions of the rest still count
+            self.total += len(values) - self.capacity
+            values = values[-self.capacity:]
+        start = self.total % self.capacity
+        first = min(len(values), self.capacity - start)
+        self.data[start:start + first] = values[:first]
+        self.data[:len(values) - first] = values[first:]
+        self.total += len(values)
+
+    def read(self, start, stop):
+        """Items [start, stop) by absolute position; they must still be in the buffer."""
+        if start < self.total - self.capacity or stop > self.total:
+            raise IndexError('Range is no longer (or not yet) in the ring buffer')
+        begin = start % self.capacity
+        end = begin + (stop - start)
+        if end <= self.capacity:
+            return self.data[begin:end].copy()
+        return np.concatenate((self.data[begin:], self.data[:end - self.capacity]))
+
+    def latest(self, count):
+        count = min(count, self.total, self.capacity)
+        return self.read(self.total - count, self.total)
+
+
+class VoiceStream:
+    """One client's audio stream: ring buffers of samples and per-frame prosody, plus a stress baseline.
+
+    Each pushed chunk is cut into frame_ms analysis frames every hop_ms,
+    and only frames not analyzed yet are computed, all at once: an FFT
+    autocorrelation (normalized by the window's own, as in Boersma's method)
+    gives pitch and voicing, the RMS gives energy. Window statistics read
+    the last window_seconds of frame features, so a chunk costs O(chunk +
+    window) however long the session has run.
+
+    The first calibration_seconds of speech set the speaker's baseline;
+    the stress score then measures how far pitch, loudness, jitter, speaking
+    rate and pitch variability have risen above it (0-1).
+    """
+
+    def __init__(self, sample_rate=16000, audio_format='pcm16', channels=1, frame_ms=40, hop_ms=10, window_seconds=4.0, calibration_seconds=10.0,
+                 fmin=75.0, fmax=400.0, voicing_threshold=0.45, silence_db=-45.0):
+        if audio_format not in AUDIO_FORMATS:
+            raise ValueError(f'Unknown audio format, choose from {", ".join(AUDIO_FORMATS)}')
+        self.sample_rate = sample_rate
+        self.audio_format = audio_format
+        self.channels = channels
+        self.frame_length = int(sample_rate * frame_ms / 1000)
+        self.hop = int(sample_rate * hop_ms / 1000)
+        self.hop_seconds = self.hop / sample_rate
+        self.min_lag = max(2, int(sample_rate / fmax))
+        self.max_lag = min(self.frame_length // 2, int(np.ceil(sample_rate / fmin)))
+        self.voicing_threshold = voicing_threshold
+        self.silence_db = silence_db
+        self.calibration_seconds = calibration_seconds
+
+        self.nfft = 1 << int(np.ceil(np.log2(2 * self.frame_length)))
+        self.window = np.hanning(self.frame_length).astype(np.float32)
+        window_ac = np.fft.irfft(np.abs(np.fft.rfft(self.window, self.nfft)) ** 2)[:self.max_lag + 2]
+        self.window_ac = (window_ac / window_ac[0]).astype(np.float32)
+
+        # Enough audio for the frames of one piece plus the overlap they need
+        self.piece = max(self.hop, sample_rate // 2)
+        self.samples = RingBuffer(self.piece + self.frame_length)
+        self.next_frame = 0
+
+        frames = max(8, int(window_seconds / self.hop_seconds))
+        self.f0 = RingBuffer(frames)
+        self.energy_db = RingBuffer(frames)
+
+        self.baseline = None
+        self._calibration = {}
+        self.speech_seconds = 0.0
+        self.opus_decoder = OpusDecoder(sample_rate, channels) if audio_format == 'opus' else None
+
+    @classmethod
+    def from_env(cls, sample_rate=None, audio_format=None, channels=None):
+        """Stream of the client's format, else FAD_AUDIO_SAMPLE_RATE; FAD_VOICE_WINDOW_SECONDS / _CALIBRATION_SECONDS."""
+        return cls(
+            sample_rate=int(sample_rate or os.environ.get('FAD_AUDIO_SAMPLE_RATE', 16000)),
+            audio_format=audio_format or 'pcm16',
+            channels=int(channels or 1),
+            window_seconds=float(os.environ.get('FAD_VOICE_WINDOW_SECONDS', 4)),
+            calibration_seconds=float(os.environ.get('FAD_VOICE_CALIBRATION_SECONDS', 10))
+        )
+
+    def push(self, samples):
+        """Append mono float32 samples and analyze the frames they complete; returns the number of new frames."""
+        analyzed = 0
+        for start in range(0, len(samples), self.piece):
+            self.samples.write(samples[start:start + self.piece])
+            analyzed += self._analyze_pending()
+        return analyzed
+
+    def _analyze_pending(self):
+        available = self.samples.total - self.next_frame - self.frame_length
+        if available < 0:
+            return 0
+        count = available // self.hop + 1
+        segment = self.samples.read(self.next_frame, self.next_frame + (count - 1) * self.hop + self.frame_length)
+        self.next_frame += count * self.hop
+
+        frames = sliding_window_view(segment, self.frame_length)[::self.hop]
+        frames = frames - frames.mean(axis=1, keepdims=True)
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        energy_db = 20 * np.log10(rms + 1e-10)
+
+        # Autocorrelation of every frame at once: inverse FFT of the power spectrum
+        spectrum = np.fft.rfft(frames * self.window, self.nfft, axis=1)
+        autocorr = np.fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2, self.nfft, axis=1)[:, :self.max_lag + 2]
+        autocorr = autocorr / np.maximum(autocorr[:, :1], 1e-12) / self.window_ac
+
+        lags = np.arange(self.min_lag, self.max_lag + 1)
+        candidates = autocorr[:, self.min_lag:self.max_lag + 1]
+        best = np.argmax(candidates, axis=1)
+        rows = np.arange(count)
+        lag = lags[best]
+        strength = candidates[rows, best]
+
+        # Parabolic interpolation around the peak for sub-sample periods
+        left = autocorr[rows, lag - 1]
+        right = autocorr[rows, lag + 1]
+        curvature = left - 2 * strength + right
+        with np.errstate(divide='ignore', invalid='ignore'):
+            offset = np.where(curvature < 0, 0.5 * (left - right) / curvature, 0.0)
+        period = lag + np.clip(offset, -0.5, 0.5)
+
+        voiced = (strength >= self.voicing_threshold) & (energy_db > self.silence_db)
+        f0 = np.where(voiced, self.sample_rate / period, np.nan).astype(np.float32)
+
+        self.f0.write(f0)
+        self.energy_db.write(energy_db.astype(np.float32))
+        self.speech_seconds += float(np.count_nonzero(energy_db > self.silence_db)) * self.hop_seconds
+        return count
+
+    def features(self):
+        """Prosody over the last window: pitch, energy, jitter, speaking rate; None values where there is no speech."""
+        f0 = self.f0.latest(self.f0.capacity)
+        energy_db = self.energy_db.latest(self.energy_db.capacity)
+        frames = len(f0)
+        voiced = ~np.isnan(f0)
+        speech = energy_db > self.silence_db
+        features = {
+            'window_seconds': round(frames * self.hop_seconds, 3),
+            'voiced_ratio': round(float(voiced.mean()), 3) if frames else 0.0,
+            'pitch_hz': None,
+            'pitch_variability': None,
+            'energy_db': None,
+            'jitter': None,
+            'speaking_rate': None
+        }
+        if np.count_nonzero(voiced) < 3:
+            return features
+
+        pitch = f0[voiced]
+        median = float(np.median(pitch))
+        features['pitch_hz'] = round(median, 2)
+        # Spread in semitones, so it compares across low and high voices
+        features['pitch_variability'] = round(float(np.std(12 * np.log2(pitch / median))), 3)
+        features['energy_db'] = round(float(energy_db[speech].mean()), 2)
+
+        # Relative period perturbation between consecutive voiced frames
+        adjacent = voiced[1:] & voiced[:-1]
+        if np.any(adjacent):
+            periods = 1.0 / f0
+            jumps = np.abs(np.diff(periods))[adjacent]
+            features['jitter'] = round(float(jumps.mean() / np.mean(periods[voiced])), 4)
+
+        # Syllable nuclei: voiced peaks of the smoothed energy contour, at least 100 ms apart
+        reach = max(1, int(round(0.05 / self.hop_seconds)))
+        if frames > 2 * reach:
+            smooth = np.convolve(energy_db, np.ones(3) / 3, mode='same')
+            local_max = sliding_window_view(np.pad(smooth, reach, mode='edge'), 2 * reach + 1).max(axis=1)
+            floor = np.percentile(smooth[speech], 25) if np.any(speech) else self.silence_db
+            peaks = (smooth >= local_max) & voiced & (smooth > floor + 3)
+            speech_seconds = np.count_nonzero(speech) * self.hop_seconds
+            if speech_seconds >= 0.5:
+                features['speaking_rate'] = round(float(np.count_nonzero(peaks) / speech_seconds), 2)
+        return features
+
+    def _calibrate(self, features):
+        for name, value in features.items():
+            if name in STRESS_WEIGHTS and value is not None:
+                total, count = self._calibration.get(name, (0.0, 0))
+                self._calibration[name] = (total + value, count + 1)
+        if self.speech_seconds >= self.calibration_seconds:
+            self.baseline = {name: total / count for name, (total, count) in self._calibration.items()}
+
+    def stress_level(self, features):
+        """0-1 rise of the window's prosody over the speaker's baseline (None while calibrating or silent)."""
+        if self.baseline is None or features['pitch_hz'] is None:
+            return None, {}
+        baseline = self.baseline
+        deviations = {}
+        if 'pitch' in baseline:
+            # 4 semitones above the usual pitch counts as fully raised
+            deviations['pitch'] = 12 * np.log2(features['pitch_hz'] / baseline['pitch']) / 4
+        if 'energy' in baseline:
+            deviations['energy'] = (features['energy_db'] - baseline['energy']) / 10
+        if features['jitter'] is not None and baseline.get('jitter'):
+            deviations['jitter'] = (features['jitter'] - baseline['jitter']) / baseline['jitter']
+        if features['speaking_rate'] is not None and baseline.get('speaking_rate'):
+            deviations['speaking_rate'] = (features['speaking_rate'] - baseline['speaking_rate']) / (
+                0.5 * baseline['speaking_rate'])
+        if 'pitch_variability' in baseline:
+            deviations['pitch_variability'] = (features['pitch_variability'] - baseline['pitch_variability']) / 2
+        if not deviations:
+            return None, {}
+
+        components = {name: float(np.clip(value, 0.0, 1.0)) for name, value in deviations.items()}
+        weight = sum(STRESS_WEIGHTS[name] for name in components)
+        stress = sum(STRESS_WEIGHTS[name] * value for name, value in components.items()) / weight
+        return stress, {name: round(value, 3) for name, value in components.items()}
+
+    def summary(self, update_baseline=False):
+        """Current features and stress score (the voice result fed into reports)."""
+        features = self.features()
+        if update_baseline and self.baseline is None and features['pitch_hz'] is not None:
+            self._calibrate({
+                'pitch': features['pitch_hz'],
+                'energy': features['energy_db'],
+                'jitter': features['jitter'],
+                'speaking_rate': features['speaking_rate'],
+                'pitch_variability': features['pitch_variability']
+            })
+        stress, components = self.stress_level(features)
+        return {
+            'success': True,
+            'features': features,
+            'stress_level': round(stress, 3) if stress is not None else None,
+            'stress_components': components,
+            'calibrated': self.baseline is not None,
+            'speech_seconds': round(self.speech_seconds, 2),
+            'stream_seconds': round(self.samples.total / self.sample_rate, 2)
+        }
+
+    def process_chunk(self, data):
+        """Decode one audio_data payload, analyze it and return summary() (plus the new frame count)."""
+        samples, sample_rate = decode_audio_chunk(
+            data, sample_rate=self.sample_rate, audio_format=self.audio_format, channels=self.channels,
+            opus_decoder=self.opus_decoder
+        )
+        if sample_rate != self.sample_rate:
+            raise ValueError(f'Sample rate changed mid-stream ({self.sample_rate} -> {sample_rate}); send start_audio again')
+        frames = self.push(samples)
+        # A chunk too short to complete a frame leaves the baseline as it was
+        result = self.summary(update_baseline=frames > 0)
+        result['chunk_ms'] = round(len(samples) * 1000 / self.sample_rate, 1)
+        result['frames'] = frames
+        return result